@@ -1,12 +1,30 @@
 from utils.utils import enriquecer_dados_dash, map_cat_correcao
+from utils.dados import (carregar_dataset_dashboard, dataset_disponivel,
+                         CAMINHO_DATASET_DASHBOARD, CAMINHO_CSV_DASHBOARD)
+from utils.cubo import (construir_cubo, carregar_cubo, filtrar_cubo,
+                        painel_cubo, CAMINHO_CUBO_DASHBOARD)
+from utils.cache_agregados import CacheAgregados
+from utils.filtros import IndiceFiltros
+from utils.serie_temporal import IndiceTemporal, ordenar_por_data, janelas_moveis
+from utils.modelo_compacto import CAMINHO_MODELO_COMPACTO, CAMINHO_MODELO_PKL
+from utils.features import derivar_features
+from utils.preprocessamento import Preprocessador, CAMINHO_VOCABULARIO
+from utils.publicacao import ler_publicacao, abrir_colunas, CAMINHO_PUBLICACAO
+from utils.servidor_inferencia import ServidorInferencia
+from utils.guardrails import aplicar_guardrail, carregar_tabela_rotas
+from utils.varredura import varrer, prazo_seguro, MAX_CATEGORIAS_VARREDURA
+from utils.cache_previsao import CachePrevisoes, assinatura_artefatos
+from utils.geo import carregar_geometria, construir_geometria, geometria_disponivel
+from utils.instrumentacao import (Instrumentacao, ARQUIVO_METRICAS_JSON,
+                                  ARQUIVO_METRICAS_PROM)
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import json
-import joblib
+import plotly.graph_objects as go
 import numpy as np
 import os
 import sys
+import time
 
 sys.path.append(os.path.abspath('.'))
 
@@ -57,9 +75,19 @@ st.markdown(f"""
 # ==============================================================================
 
 
-@st.cache_data
-def load_data():
-    """Carrega e trata os dados para o Dashboard."""
+# Os loaders de dados recebem a versão (assinatura dos arquivos): um novo
+# ETL troca a chave e a versão anterior sai do cache (max_entries=1)
+
+
+@st.cache_data(max_entries=1)
+def load_data(versao=None):
+    """Carrega e trata os dados para o Dashboard (ordenados pela data da compra)."""
+    # Caminho rápido: dataset colunar (Parquet) gerado por utils/dados.py
+    if dataset_disponivel(CAMINHO_DATASET_DASHBOARD):
+        return ordenar_por_data(
+            carregar_dataset_dashboard(CAMINHO_DATASET_DASHBOARD))
+
+    # Fallback: CSV bruto do ETL
     caminho_dados = "data/data_dashboard_processed.csv"
 
     if not os.path.exists(caminho_dados):
@@ -68,39 +96,315 @@ def load_data():
 
     df = pd.read_csv(
         caminho_dados,
-        parse_dates=["data_aprovacao", "data_postagem"]
+        parse_dates=["data_compra", "data_aprovacao", "data_postagem"]
     )
 
     # Aplica o tratamento de categorias
     if 'status_simplificado' not in df.columns:
         df = enriquecer_dados_dash(df)
 
-    return df
+    return ordenar_por_data(df)
 
 
-@st.cache_resource
-def load_model():
-    """Carrega o modelo treinado."""
-    caminho_modelo = 'models/modelo_previsao_atraso_olist.pkl'
-    if not os.path.exists(caminho_modelo):
-        st.error("Modelo não encontrado. Verifique a pasta 'models'.")
+@st.cache_resource(max_entries=1)
+def load_data_publicada(caminho, versao=None):
+    """Tabela publicada pelo preparador: memory-map compartilhado entre os workers."""
+    return abrir_colunas(caminho)
+
+
+@st.cache_data(max_entries=1)
+def load_cubo(_df, versao=None, caminho=CAMINHO_CUBO_DASHBOARD):
+    """Carrega o cubo de KPIs (ou o constrói a partir dos dados carregados)."""
+    if os.path.exists(caminho):
+        return carregar_cubo(caminho)
+    if _df.empty:
+        return _df
+    return construir_cubo(_df)
+
+
+@st.cache_resource(max_entries=1)
+def load_indice(_df, versao=None, caminho=None):
+    """Índice de filtros (códigos + bitmaps): o publicado ou construído uma vez por processo."""
+    if caminho is not None and os.path.isdir(caminho):
+        return IndiceFiltros.abrir(caminho)
+    return IndiceFiltros(_df)
+
+
+@st.cache_resource(max_entries=1)
+def load_indice_temporal(_df, versao=None, caminho=None):
+    """Índice da data da compra (busca binária) e medidas por linha."""
+    if caminho is not None and os.path.isdir(caminho):
+        return IndiceTemporal.abrir(caminho)
+    if 'data_compra' not in _df.columns:
         return None
-    return joblib.load(caminho_modelo)
+    return IndiceTemporal(_df)
+
+
+@st.cache_resource
+def load_cache_agregados():
+    """Cache de agregados da Visão Geral por recorte, compartilhado entre sessões."""
+    return CacheAgregados()
+
+
+@st.cache_resource
+def load_servidor():
+    """Serviço de inferência com micro-lotes: uma cópia do modelo para todas as sessões."""
+    return ServidorInferencia(CAMINHO_MODELO_COMPACTO, CAMINHO_MODELO_PKL)
+
+
+@st.cache_resource
+def load_tabela_rotas():
+    """Tabela UF x UF do guardrail (arquivo de configuração ou regra padrão)."""
+    return carregar_tabela_rotas()
 
 
-df = load_data()
-model = load_model()
+@st.cache_resource(max_entries=1)
+def load_preprocessador(versao=None, caminho_vocabulario=CAMINHO_VOCABULARIO):
+    """Vocabulário de categorias do modelo salvo pelo ETL (raras viram 'outros')."""
+    return Preprocessador.carregar(caminho_vocabulario=caminho_vocabulario)
+
+
+@st.cache_resource
+def load_cache_previsoes():
+    """Cache LRU de previsões do Simulador, compartilhado entre sessões."""
+    return CachePrevisoes()
+
+
+@st.cache_resource
+def load_geojson():
+    """Malha simplificada dos estados (gerada do GeoJSON original na primeira vez)."""
+    if not geometria_disponivel():
+        construir_geometria()
+    return carregar_geometria()
+
+
+@st.cache_resource
+def load_mapa_base():
+    """
+    Base do mapa de atrasos, validada uma única vez: a malha dos estados e
+    as propriedades fixas do trace e do layout, já serializadas.
+    """
+    fig = go.Figure(go.Choropleth(
+        featureidkey="properties.sigla",
+        coloraxis="coloraxis",
+        hovertemplate="uf_cliente=%{location}<br>atraso_medio=%{z}<extra></extra>"
+    ))
+    fig.data[0].geojson = load_geojson()
+    fig.update_layout(
+        coloraxis=dict(colorscale="Reds",
+                       colorbar=dict(title=dict(text="atraso_medio"))),
+        title="Média de Dias de Atraso",
+        margin=dict(l=0, r=0, t=30, b=0),
+        height=300,
+        font=dict(color='white'),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    fig.update_geos(fitbounds="locations", visible=False)
+
+    trace = fig.data[0].to_plotly_json()
+    layout = fig.layout.to_plotly_json()
+    # O template padrão é aplicado de novo a cada figura, sem revalidação
+    layout.pop("template", None)
+    return {
+        "geojson": trace.pop("geojson"),
+        "trace": {k: v for k, v in trace.items() if k != "type"},
+        "layout": layout
+    }
+
+
+def montar_mapa(df_geo):
+    """Mapa de atrasos de um recorte: só `locations` e `z` mudam."""
+    base = load_mapa_base()
+    fig = go.Figure(
+        go.Choropleth(locations=df_geo["uf_cliente"], z=df_geo["atraso_medio"],
+                      **base["trace"]),
+        layout=base["layout"]
+    )
+    # Atribuída ao trace já criado, a malha entra por referência: sem
+    # validar nem copiar a geometria
+    fig.data[0].geojson = base["geojson"]
+    return fig
+
+
+@st.cache_resource
+def load_instrumentacao():
+    """Tempos por etapa do App, agregados entre sessões (janela deslizante)."""
+    return Instrumentacao()
+
+
+inst = load_instrumentacao()
+inicio_rerun = time.perf_counter()
+
+# Painel de tempos: ?admin=1 na URL ou OLIST_ADMIN=1 no ambiente
+modo_admin = (os.environ.get("OLIST_ADMIN") == "1" or
+              st.query_params.get("admin") == "1")
+
+# Modo publicado (utils/publicacao.py): um processo preparador grava dados e
+# modelo em versões imutáveis e todos os workers mapeiam os mesmos arquivos.
+# Uma nova versão troca o ponteiro e cada worker a assume no próximo rerun
+publicacao = ler_publicacao(os.environ.get(
+    "OLIST_PUBLICACAO", CAMINHO_PUBLICACAO))
+if publicacao is not None:
+    versao_dados = versao_modelo = publicacao["versao"]
+    caminho_cubo = publicacao["cubo"]
+    caminho_compacto = publicacao["modelo"]
+    caminho_pkl = publicacao["modelo_pkl"]
+    caminho_vocabulario = publicacao["vocabulario"]
+    # Índices gravados na versão: mapeados, sem uma cópia por worker
+    caminho_indice = publicacao["indice_filtros"]
+    caminho_tempo = publicacao["indice_temporal"]
+else:
+    # Um novo ETL muda a assinatura: dados, cubo, índice e agregados são recarregados
+    versao_dados = assinatura_artefatos(
+        CAMINHO_DATASET_DASHBOARD, CAMINHO_CUBO_DASHBOARD, CAMINHO_CSV_DASHBOARD)
+    # Um novo treino ou exportação muda a assinatura: o serviço recarrega o modelo
+    versao_modelo = assinatura_artefatos(
+        CAMINHO_MODELO_COMPACTO, CAMINHO_MODELO_PKL)
+    caminho_cubo = CAMINHO_CUBO_DASHBOARD
+    caminho_compacto = caminho_pkl = None
+    caminho_vocabulario = CAMINHO_VOCABULARIO
+    caminho_indice = caminho_tempo = None
+
+with inst.etapa("carregar_dados"):
+    if publicacao is not None:
+        df = load_data_publicada(publicacao["dataset"], versao_dados)
+    else:
+        df = load_data(versao_dados)
+with inst.etapa("carregar_cubo"):
+    cubo = load_cubo(df, versao_dados, caminho_cubo)
+with inst.etapa("carregar_indice"):
+    indice = load_indice(
+        df, versao_dados, caminho_indice) if not df.empty else None
+    tempo = load_indice_temporal(
+        df, versao_dados, caminho_tempo) if not df.empty else None
+with inst.etapa("sincronizar_agregados"):
+    # Na troca de versão, reaquece os recortes mais usados e os de maior volume
+    cache_agregados = load_cache_agregados()
+    cache_agregados.sincronizar(versao_dados, cubo)
+with inst.etapa("sincronizar_modelo"):
+    servidor = load_servidor()
+    servidor.sincronizar(versao_modelo, caminho_compacto, caminho_pkl)
+if not servidor.disponivel:
+    st.error("Modelo não encontrado. Verifique a pasta 'models'.")
+tabela_rotas = load_tabela_rotas()
+preprocessador = load_preprocessador(
+    assinatura_artefatos(caminho_vocabulario), caminho_vocabulario)
+cache_previsoes = load_cache_previsoes()
+cache_previsoes.sincronizar(versao_modelo)
 
 # ==============================================================================
-# 3. PREPARAÇÃO DE MAPEAMENTOS AUXILIARES
+# 3. MAPEAMENTOS AUXILIARES E PAINEL (CACHED POR RECORTE DOS FILTROS)
 # ==============================================================================
-if not df.empty and 'categoria_label' in df.columns:
-    mapa_reverso_categorias = dict(
-        zip(df['categoria_label'], df['categoria_produto']))
-else:
-    # Fallback caso não tenha a coluna label
-    mapa_reverso_categorias = {
-        cat: cat for cat in df['categoria_produto'].unique()}
+
+
+@st.cache_data(max_entries=1)
+def load_mapa_categorias(_df, versao=None):
+    """Label da categoria -> nome técnico usado pelo modelo (um par por label)."""
+    if _df.empty:
+        return {}
+    if 'categoria_label' not in _df.columns:
+        # Fallback caso não tenha a coluna label
+        return {cat: cat for cat in _df['categoria_produto'].unique()}
+    pares = _df[['categoria_label', 'categoria_produto']].drop_duplicates(
+        subset='categoria_label', keep='last')
+    return dict(zip(pares['categoria_label'], pares['categoria_produto']))
+
+
+def _tema_escuro(fig):
+    fig.update_layout(
+        font=dict(color='white'),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+
+@st.cache_resource(max_entries=64)
+def load_serie_diaria(_tempo, _selecao, _indice, versao, chave):
+    """KPIs por dia (somas prefixadas) de um recorte dos filtros."""
+    mascara = None if _selecao is None else _indice.mascara(_selecao)
+    return _tempo.serie(mascara)
+
+
+@st.cache_resource(max_entries=8)
+def load_cubo_periodo(_df, _tempo, versao, inicio, fim):
+    """Cubo das linhas de um intervalo de datas (fatia da tabela ordenada)."""
+    return construir_cubo(_df.iloc[_tempo.fatiar(inicio, fim)])
+
+
+@st.cache_resource(max_entries=64)
+def load_painel_periodo(_cubo, versao, periodo, chave):
+    """Painel da Visão Geral de um recorte dos filtros dentro de um período."""
+    return painel_cubo(filtrar_cubo(_cubo, *chave))
+
+
+@st.cache_resource(max_entries=64)
+def montar_figuras(_painel, versao, chave):
+    """
+    Figuras Plotly da Visão Geral para um recorte canônico dos filtros.
+
+    Ficam em `cache_resource` (sem cópia a cada leitura): `st.plotly_chart`
+    só serializa as figuras, nunca as altera.
+    """
+    painel = _painel
+    figuras = {}
+
+    fig_status = px.pie(
+        painel["status"],
+        names="Status",
+        values="Pedidos",
+        hole=0.6,
+        color="Status",
+        color_discrete_map={
+            "Aprovado": PRIMARY,
+            "Em Processamento": SECONDARY,
+            "Cancelado": WARNING,
+        }
+    )
+    fig_status.update_layout(
+        legend=dict(orientation="h", yanchor="top",
+                    y=-0.25, xanchor="center", x=0.5),
+        margin=dict(t=60, b=60, l=10, r=10),
+        height=300
+    )
+    fig_status.update_traces(textfont_color='white')
+    figuras["status"] = _tema_escuro(fig_status)
+
+    try:
+        figuras["mapa"] = montar_mapa(painel["atraso_estado"])
+    except Exception:
+        figuras["mapa"] = None
+
+    fig_fat = px.bar(painel["faturamento_estado"], x="uf_cliente",
+                     y="faturamento_pedido", text_auto='.2s')
+    fig_fat.update_traces(marker_color=PRIMARY, textfont_color='white')
+    fig_fat.update_layout(xaxis_title=None, yaxis_title=None)
+    figuras["faturamento_estado"] = _tema_escuro(fig_fat)
+
+    fig_cancel = px.bar(painel["cancelamento_estado"], x="uf_cliente",
+                        y="is_cancel", text_auto='.1%')
+    fig_cancel.update_yaxes(tickformat=".0%")
+    fig_cancel.update_traces(marker_color=WARNING, textfont_color='white')
+    fig_cancel.update_layout(xaxis_title=None, yaxis_title=None)
+    figuras["cancelamento_estado"] = _tema_escuro(fig_cancel)
+
+    fig_sla = px.bar(painel["atraso_categoria"], x="dias_atraso",
+                     y="categoria_label", orientation="h", text_auto='.1f')
+    fig_sla.update_layout(yaxis=dict(autorange="reversed"))
+    fig_sla.update_traces(marker_color=WARNING, textfont_color='white')
+    fig_sla.update_layout(xaxis_title=None, yaxis_title=None)
+    figuras["atraso_categoria"] = _tema_escuro(fig_sla)
+
+    fig_proc_cat = px.bar(painel["processamento_categoria"],
+                          x="tempo_processamento", y="categoria_label",
+                          orientation="h", text_auto='.1f')
+    fig_proc_cat.update_layout(yaxis=dict(autorange="reversed"))
+    fig_proc_cat.update_traces(marker_color=PRIMARY, textfont_color='white')
+    fig_proc_cat.update_layout(xaxis_title=None, yaxis_title=None)
+    figuras["processamento_categoria"] = _tema_escuro(fig_proc_cat)
+
+    return figuras
 
 
 def abreviar_valor(valor):
@@ -124,29 +428,55 @@ st.sidebar.header("Filtros Globais")
 
 # Filtro 1: Status
 if not df.empty:
-    status_options = sorted(df["status_simplificado"].astype(str).unique())
+    status_options = indice.opcoes("status_simplificado")
     status_sel = st.sidebar.multiselect("Status do Pedido", status_options)
 
     # Filtro 2: Estado
-    estados_options = sorted(df["uf_cliente"].unique())
+    estados_options = indice.opcoes("uf_cliente")
     estados_sel = st.sidebar.multiselect("Estado do Cliente", estados_options)
 
     # Filtro 3: Categoria
-    cat_options = sorted(df["categoria_label"].unique())
+    cat_options = indice.opcoes("categoria_label")
     cat_sel = st.sidebar.multiselect("Categoria de Produto", cat_options)
 
-    # Aplicação dos Filtros
-    df_f = df.copy()
-
-    if status_sel:
-        df_f = df_f[df_f["status_simplificado"].isin(status_sel)]
-    if estados_sel:
-        df_f = df_f[df_f["uf_cliente"].isin(estados_sel)]
-    if cat_sel:
-        df_f = df_f[df_f["categoria_label"].isin(cat_sel)]
+    # Filtro 4: Período da compra (a tabela está ordenada pela data)
+    if tempo is not None:
+        periodo_sel = st.sidebar.date_input(
+            "Período da Compra", value=(tempo.inicio, tempo.fim),
+            min_value=tempo.inicio, max_value=tempo.fim, format="DD/MM/YYYY")
+        # Enquanto só a data inicial foi escolhida, vale a base inteira
+        if len(periodo_sel) == 2:
+            periodo = tuple(periodo_sel)
+        else:
+            periodo = (tempo.inicio, tempo.fim)
+        periodo_completo = periodo == (tempo.inicio, tempo.fim)
+    else:
+        periodo, periodo_completo = None, True
+
+    # Contagem pelos bitmaps do índice, sem copiar o DataFrame (o recorte do
+    # cubo é feito, e guardado em cache, pela aba de Visão Geral). Com um
+    # período, a contagem sai das somas prefixadas da série diária do recorte
+    with inst.etapa("filtros"):
+        selecao = indice.selecionar(
+            status_simplificado=status_sel,
+            uf_cliente=estados_sel,
+            categoria_label=cat_sel
+        )
+        chave_recorte = cache_agregados.chave(status_sel, estados_sel, cat_sel)
+        serie = load_serie_diaria(
+            tempo, selecao, indice, versao_dados,
+            chave_recorte) if tempo is not None else None
+        if periodo_completo:
+            total_filtrado = indice.contar(selecao)
+        else:
+            total_filtrado = int(serie.somar(*periodo)['pedidos'])
 else:
     st.sidebar.warning("Sem dados carregados.")
-    df_f = pd.DataFrame()
+    status_sel, estados_sel, cat_sel = [], [], []
+    selecao = None
+    chave_recorte = cache_agregados.chave()
+    serie, periodo, periodo_completo = None, None, True
+    total_filtrado = 0
 
 
 def abreviar(valor):
@@ -157,7 +487,7 @@ def abreviar(valor):
     return f"{valor:.0f}"
 
 
-st.sidebar.info(f"Visualizando {len(df_f)} pedidos filtrados.")
+st.sidebar.info(f"Visualizando {total_filtrado} pedidos filtrados.")
 
 # ==============================================================================
 # 5. ESTRUTURA DE ABAS
@@ -173,12 +503,28 @@ with tab_analise:
 
     col1, col2, col3, col4, col5 = st.columns(5)
 
-    total_pedidos = len(df_f)
-    faturamento = df_f["faturamento_pedido"].sum()
-    taxa_atraso = df_f["flag_atraso"].mean() * 100 if total_pedidos > 0 else 0
-    atraso_medio = df_f.loc[df_f["flag_atraso"], "dias_atraso"].mean()
-    taxa_cancel = (df_f["status_simplificado"] ==
-                   "Cancelado").mean() * 100 if total_pedidos > 0 else 0
+    # KPIs e gráficos vêm da soma de células do cubo e ficam em cache por
+    # recorte: reruns com os mesmos filtros não refazem agregações nem figuras.
+    # O cubo não tem tempo: um período menor que a base agrega só a fatia de
+    # linhas do período (busca binária na tabela ordenada)
+    with inst.etapa("analise.kpis"):
+        if periodo_completo:
+            painel = cache_agregados.obter(cubo, *chave_recorte)
+        else:
+            cubo_periodo = load_cubo_periodo(df, tempo, versao_dados, *periodo)
+            painel = load_painel_periodo(
+                cubo_periodo, versao_dados, periodo, chave_recorte)
+    with inst.etapa("analise.figuras"):
+        figuras = montar_figuras(
+            painel, versao_dados, (chave_recorte, periodo))
+
+    kpis = painel["kpis"]
+
+    total_pedidos = kpis["total_pedidos"]
+    faturamento = kpis["faturamento"]
+    taxa_atraso = kpis["taxa_atraso"]
+    atraso_medio = kpis["atraso_medio"]
+    taxa_cancel = kpis["taxa_cancel"]
 
     col1.metric("📦 Pedidos", abreviar(total_pedidos))
     col2.metric("💰 Faturamento", f"R$ {abreviar(faturamento)}")
@@ -187,70 +533,62 @@ with tab_analise:
         atraso_medio) else "0 dias")
     col5.metric("🚫 Cancelamento", f"{taxa_cancel:.1f}%")
 
+    # Janelas móveis: somas prefixadas da série diária do recorte, encerradas
+    # no fim do período e comparadas com a janela imediatamente anterior
+    if serie is not None:
+        st.divider()
+        st.markdown("### 📈 Janelas Móveis")
+        dias_janela = st.radio(
+            "Janela", janelas_moveis, index=1, horizontal=True,
+            format_func=lambda dias: f"Últimos {dias} dias")
+
+        with inst.etapa("analise.janelas"):
+            atual, anterior = serie.comparar_periodos(periodo[1], dias_janela)
+            movel = serie.movel(dias_janela, *periodo)
+
+        def variacao(chave, percentual=False):
+            if anterior["total_pedidos"] == 0:
+                return None
+            if percentual:
+                if not anterior[chave]:
+                    return None
+                return f"{(atual[chave] / anterior[chave] - 1) * 100:+.1f}%"
+            return f"{atual[chave] - anterior[chave]:+.1f} p.p."
+
+        colJ1, colJ2, colJ3, colJ4 = st.columns(4)
+        colJ1.metric("📦 Pedidos na Janela", abreviar(atual["total_pedidos"]),
+                     variacao("total_pedidos", percentual=True))
+        colJ2.metric("💰 Faturamento na Janela",
+                     f"R$ {abreviar(atual['faturamento'])}",
+                     variacao("faturamento", percentual=True))
+        colJ3.metric("🚨 Atraso na Janela", f"{atual['taxa_atraso']:.1f}%",
+                     variacao("taxa_atraso"), delta_color="inverse")
+        colJ4.metric("🚫 Cancelamento na Janela",
+                     f"{atual['taxa_cancel']:.1f}%",
+                     variacao("taxa_cancel"), delta_color="inverse")
+        st.caption(f"Janela de {dias_janela} dias encerrada em "
+                   f"{periodo[1]:%d/%m/%Y}, comparada com os {dias_janela} "
+                   f"dias anteriores.")
+
+        fig_movel = px.line(movel.reset_index(), x="data", y="taxa_atraso")
+        fig_movel.update_traces(line_color=WARNING)
+        fig_movel.update_layout(xaxis_title=None, yaxis_title="Atraso (%)",
+                                height=250, margin=dict(l=0, r=0, t=10, b=0))
+        st.plotly_chart(_tema_escuro(fig_movel), use_container_width=True)
+
     st.divider()
 
     colA, colB = st.columns([1, 1.5])
 
-    with colA:
+    with colA, inst.etapa("analise.status"):
         st.markdown("##### Status dos Pedidos")
-        df_status = df_f["status_simplificado"].value_counts().reset_index()
-        df_status.columns = ["Status", "Pedidos"]
-
-        fig_status = px.pie(
-            df_status,
-            names="Status",
-            values="Pedidos",
-            hole=0.6,
-            color="Status",
-            color_discrete_map={
-                "Aprovado": PRIMARY,
-                "Em Processamento": SECONDARY,
-                "Cancelado": WARNING,
-            }
-        )
-        fig_status.update_layout(
-            legend=dict(orientation="h", yanchor="top",
-                        y=-0.25, xanchor="center", x=0.5),
-            margin=dict(t=60, b=60, l=10, r=10),
-            height=300,
-            font=dict(color='white'),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)'
-        )
-        fig_status.update_traces(textfont_color='white')
-        st.plotly_chart(fig_status, use_container_width=True)
+        st.plotly_chart(figuras["status"], use_container_width=True)
 
-    with colB:
+    with colB, inst.etapa("analise.mapa"):
         st.markdown("##### Intensidade de Atrasos (Brasil)")
-        try:
-            with open("data/brazil_states.geojson", "r", encoding="utf-8") as f:
-                brazil_geojson = json.load(f)
-
-            df_geo = df_f[df_f["dias_atraso"] > 0].groupby("uf_cliente").agg(
-                pedidos=("pedido_id", "count"),
-                atraso_medio=("dias_atraso", "mean")
-            ).reset_index()
-
-            fig_map = px.choropleth(
-                df_geo,
-                geojson=brazil_geojson,
-                locations="uf_cliente",
-                featureidkey="properties.sigla",
-                color="atraso_medio",
-                color_continuous_scale="Reds",
-                title="Média de Dias de Atraso"
-            )
-            fig_map.update_geos(fitbounds="locations", visible=False)
-            fig_map.update_layout(
-                margin=dict(l=0, r=0, t=30, b=0),
-                height=300,
-                font=dict(color='white'),
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)'
-            )
-            st.plotly_chart(fig_map, use_container_width=True)
-
-        except Exception:
+        if figuras["mapa"] is not None:
+            st.plotly_chart(figuras["mapa"], use_container_width=True)
+        else:
             st.info("Mapa indisponível (GeoJSON não encontrado).")
 
     st.divider()
@@ -258,43 +596,15 @@ with tab_analise:
     # Gráficos Linha 2
     col1, col2 = st.columns(2)
 
-    with col1:
+    with col1, inst.etapa("analise.faturamento_estado"):
         st.markdown("##### Top 10 Estados (Faturamento)")
-        df_fat_estado = df_f.groupby("uf_cliente")["faturamento_pedido"].sum(
-        ).reset_index().sort_values("faturamento_pedido", ascending=False).head(10)
-
-        fig_fat = px.bar(df_fat_estado, x="uf_cliente",
-                         y="faturamento_pedido", text_auto='.2s')
-
-        fig_fat.update_traces(marker_color=PRIMARY, textfont_color='white')
-        fig_fat.update_layout(
-            xaxis_title=None, yaxis_title=None,
-            font=dict(color='white'),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)'
-        )
-        st.plotly_chart(fig_fat, use_container_width=True)
+        st.plotly_chart(figuras["faturamento_estado"],
+                        use_container_width=True)
 
-    with col2:
+    with col2, inst.etapa("analise.cancelamento_estado"):
         st.markdown("##### Taxa de Cancelamento por Estado")
-        df_cancel = df_f.copy()
-        df_cancel['is_cancel'] = (
-            df_cancel["status_simplificado"] == "Cancelado").astype(int)
-
-        df_cancel_estado = df_cancel.groupby(
-            "uf_cliente")["is_cancel"].mean().reset_index()
-
-        fig_cancel = px.bar(df_cancel_estado, x="uf_cliente",
-                            y="is_cancel", text_auto='.1%')
-        fig_cancel.update_yaxes(tickformat=".0%")
-        fig_cancel.update_traces(marker_color=WARNING, textfont_color='white')
-        fig_cancel.update_layout(
-            xaxis_title=None, yaxis_title=None,
-            font=dict(color='white'),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)'
-        )
-        st.plotly_chart(fig_cancel, use_container_width=True)
+        st.plotly_chart(figuras["cancelamento_estado"],
+                        use_container_width=True)
 
     st.divider()
 
@@ -302,52 +612,31 @@ with tab_analise:
 
     colA, colB = st.columns(2)
 
-    with colA:
+    with colA, inst.etapa("analise.atraso_categoria"):
         st.markdown("##### Atraso Médio (Top 10)")
-        df_sla = df_f[df_f["dias_atraso"] > 0].groupby("categoria_label")["dias_atraso"].mean(
-        ).reset_index().sort_values("dias_atraso", ascending=False).head(10)
-
-        fig_sla = px.bar(df_sla, x="dias_atraso",
-                         y="categoria_label", orientation="h", text_auto='.1f')
-        fig_sla.update_layout(yaxis=dict(autorange="reversed"))
-
-        fig_sla.update_traces(marker_color=WARNING, textfont_color='white')
-        fig_sla.update_layout(
-            xaxis_title=None, yaxis_title=None,
-            font=dict(color='white'),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)'
-        )
-        st.plotly_chart(fig_sla, use_container_width=True)
+        st.plotly_chart(figuras["atraso_categoria"], use_container_width=True)
 
-    with colB:
+    with colB, inst.etapa("analise.processamento_categoria"):
         st.markdown("##### Tempo de Processamento (Dias)")
-        df_proc_cat = df_f[df_f["tempo_processamento"] >= 0].groupby("categoria_label")["tempo_processamento"].mean(
-        ).reset_index().sort_values("tempo_processamento", ascending=False).head(10)
-
-        fig_proc_cat = px.bar(df_proc_cat, x="tempo_processamento",
-                              y="categoria_label", orientation="h", text_auto='.1f')
-        fig_proc_cat.update_layout(yaxis=dict(autorange="reversed"))
-
-        fig_proc_cat.update_traces(
-            marker_color=PRIMARY, textfont_color='white')
-        fig_proc_cat.update_layout(
-            xaxis_title=None, yaxis_title=None,
-            font=dict(color='white'),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)'
-        )
-        st.plotly_chart(fig_proc_cat, use_container_width=True)
+        st.plotly_chart(figuras["processamento_categoria"],
+                        use_container_width=True)
 
 # ------------------------------------------------------------------------------
 # ABA 2: SIMULADOR DE PREVISÃO (VERSÃO FINAL COM REGRAS REGIONAIS)
 # ------------------------------------------------------------------------------
-with tab_previsao:
+# Fragmento: o envio do formulário reexecuta só esta função (modelo e
+# guardrail), sem recalcular a Visão Geral; mudar filtros não chama o modelo
+
+
+@st.fragment
+def simulador():
+    mapa_reverso_categorias = load_mapa_categorias(df, versao_dados)
+
     st.markdown("### 🧠 Simulador de Risco de Atraso")
     st.info(
         "Utilize este formulário para simular um novo pedido e prever o risco de entrega.")
 
-    if model is None:
+    if not servidor.disponivel:
         st.error(
             "Modelo não carregado. Verifique se o arquivo .pkl existe na pasta models.")
     else:
@@ -358,6 +647,12 @@ with tab_previsao:
         lista_categorias = sorted(mapa_reverso_categorias.keys(
         )) if mapa_reverso_categorias else ["Outros"]
 
+        # Varredura: todos os destinos x uma faixa de prazos (e até 4
+        # categorias) em um único predict, exibidos como mapa de calor
+        modo_varredura = st.radio(
+            "Modo", ["Pedido único", "Varredura (destinos × prazos)"],
+            horizontal=True) != "Pedido único"
+
         with st.form("simulador_form"):
             st.markdown("#### Dados do Pedido")
             c1, c2, c3 = st.columns(3)
@@ -366,14 +661,27 @@ with tab_previsao:
                 origem = st.selectbox(
                     # BA default
                     "📍 Origem (Vendedor)", TODOS_ESTADOS, index=4)
-                destino = st.selectbox(
-                    # RJ default
-                    "🏠 Destino (Cliente)", TODOS_ESTADOS, index=18)
-                prazo = st.number_input(
-                    "📅 Prazo Prometido (Dias)", min_value=1, max_value=90, value=7)
+                if modo_varredura:
+                    faixa_prazos = st.slider(
+                        "📅 Prazos Prometidos (Dias)", min_value=1,
+                        max_value=90, value=(1, 30))
+                    destino, prazo = None, faixa_prazos[0]
+                else:
+                    destino = st.selectbox(
+                        # RJ default
+                        "🏠 Destino (Cliente)", TODOS_ESTADOS, index=18)
+                    prazo = st.number_input(
+                        "📅 Prazo Prometido (Dias)", min_value=1, max_value=90, value=7)
 
             with c2:
-                cat_label = st.selectbox("📦 Categoria", lista_categorias)
+                if modo_varredura:
+                    cats_label = st.multiselect(
+                        "📦 Categorias", lista_categorias,
+                        default=lista_categorias[:1],
+                        max_selections=MAX_CATEGORIAS_VARREDURA)
+                    cat_label = cats_label[0] if cats_label else lista_categorias[0]
+                else:
+                    cat_label = st.selectbox("📦 Categoria", lista_categorias)
                 peso = st.number_input(
                     "⚖️ Peso (g)", min_value=10, max_value=100000, value=500, step=100)
                 aprovacao = st.number_input(
@@ -388,73 +696,97 @@ with tab_previsao:
                 pickup = st.checkbox("Pickup em Loja?", value=False)
 
             st.write("")
-            btn_calc = st.form_submit_button("🚀 Calcular Previsão")
+            btn_calc = st.form_submit_button(
+                "🚀 Calcular Varredura" if modo_varredura else "🚀 Calcular Previsão")
 
-        if btn_calc:
+        if btn_calc and modo_varredura:
+            try:
+                cats_label = cats_label or [cat_label]
+                categorias = [preprocessador.categoria_modelo(
+                    mapa_reverso_categorias.get(label, label)) for label in cats_label]
+                base = derivar_features(comp, larg, alt, peso, aprovacao,
+                                        prazo, origem, TODOS_ESTADOS[0], pickup,
+                                        categorias[0])
+
+                # Grade inteira em um predict e no guardrail vetorizado
+                with inst.etapa("previsao.varredura"):
+                    resultado = varrer(
+                        servidor, base, TODOS_ESTADOS,
+                        list(range(faixa_prazos[0], faixa_prazos[1] + 1)),
+                        categorias, tabela_rotas)
+
+                st.divider()
+                st.markdown("#### Mapa de Risco (Atraso Estimado em Dias)")
+                matriz = resultado["dias_pred_final"]
+                fig_varredura = px.imshow(
+                    matriz if len(cats_label) > 1 else matriz[0],
+                    x=resultado["prazos"], y=resultado["destinos"],
+                    facet_col=0 if len(cats_label) > 1 else None,
+                    facet_col_wrap=2,
+                    color_continuous_scale="RdYlGn_r",
+                    color_continuous_midpoint=0, aspect="auto",
+                    labels=dict(x="Prazo Prometido (Dias)", y="Destino",
+                                color="Atraso (dias)"))
+                if len(cats_label) > 1:
+                    for anotacao, label in zip(fig_varredura.layout.annotations,
+                                               cats_label):
+                        anotacao.text = label
+                fig_varredura.update_layout(
+                    height=650 if len(cats_label) < 3 else 1100,
+                    margin=dict(l=0, r=0, t=30, b=0))
+                st.plotly_chart(_tema_escuro(fig_varredura),
+                                use_container_width=True)
+
+                ajustados = int(resultado["foi_ajustado"].sum())
+                st.caption(
+                    f"Origem {origem}: {matriz.size} cenários "
+                    f"({len(resultado['destinos'])} destinos × "
+                    f"{len(resultado['prazos'])} prazos × {len(cats_label)} "
+                    f"categoria(s)); {ajustados} ajustados pela regra logística. "
+                    f"Acima de 0 (vermelho) há risco de atraso.")
+
+                with st.expander("Prazo mínimo sem atraso por destino"):
+                    seguros = prazo_seguro(resultado)
+                    seguros.columns = cats_label
+                    seguros.insert(0, "Rota", resultado["tipo_rota"])
+                    st.dataframe(seguros, use_container_width=True)
+
+            except Exception as e:
+                st.error(f"Erro ao processar a varredura: {e}")
+
+        elif btn_calc:
             try:
                 # 1. Preparar Input para o Modelo
-                # Se não encontrar a categoria, usa a própria string (fallback)
-                cat_tecnica = mapa_reverso_categorias.get(cat_label, cat_label)
-
-                vol = comp * larg * alt
-                peso_cub = vol / 6000
-
-                entrada = pd.DataFrame([{
-                    'peso_cubado_kg': peso_cub,
-                    'vol_cm3': vol,
-                    'peso_produto_g': peso,
-                    'tempo_aprovacao': aprovacao,
-                    'prazo_prometido': prazo,
-                    'uf_vendedor': origem,
-                    'uf_cliente': destino,
-                    'flag_pickup': 1 if pickup else 0,
-                    'categoria_produto': cat_tecnica
-                }])
-
-                # 2. O Modelo Estatístico faz a previsão
-                dias_pred_modelo = model.predict(entrada)[0]
+                # Se não encontrar a categoria, usa a própria string (fallback);
+                # categorias fora do vocabulário do treino viram 'outros'
+                cat_tecnica = preprocessador.categoria_modelo(
+                    mapa_reverso_categorias.get(cat_label, cat_label))
+
+                # Mesma derivação das features usada no ETL/treino
+                entrada = derivar_features(comp, larg, alt, peso, aprovacao,
+                                           prazo, origem, destino, pickup,
+                                           cat_tecnica)
+
+                # 2. O Modelo Estatístico faz a previsão (cenários repetidos vêm do cache)
+                with inst.etapa("previsao.modelo"):
+                    dias_pred_modelo = cache_previsoes.prever_registro(
+                        servidor, entrada)
 
                 # ==========================================================
                 # 3. GUARDRAILS (Regras de Negócio e Lógica Física)
                 # ==========================================================
 
-                # Mapeamento de Macro-Regiões
-                regioes_map = {
-                    'AC': 'N', 'AL': 'NE', 'AP': 'N', 'AM': 'N', 'BA': 'NE',
-                    'CE': 'NE', 'DF': 'CO', 'ES': 'SE', 'GO': 'CO', 'MA': 'NE',
-                    'MT': 'CO', 'MS': 'CO', 'MG': 'SE', 'PA': 'N', 'PB': 'NE',
-                    'PR': 'S', 'PE': 'NE', 'PI': 'NE', 'RJ': 'SE', 'RN': 'NE',
-                    'RS': 'S', 'RO': 'N', 'RR': 'N', 'SC': 'S', 'SP': 'SE',
-                    'SE': 'NE', 'TO': 'N'
-                }
-
-                reg_origem = regioes_map.get(origem, 'Outro')
-                reg_destino = regioes_map.get(destino, 'Outro')
-
-                # Definição de Tempo Mínimo de Transporte (SLA Físico)
-                if origem == destino:
-                    tempo_transporte_min = 1
-                    tipo_rota = "Local"
-                elif reg_origem == reg_destino:
-                    tempo_transporte_min = 4
-                    tipo_rota = "Regional"
-                # Se envolve o Norte (AM, AP, etc)
-                elif 'N' in [reg_origem, reg_destino]:
-                    tempo_transporte_min = 12
-                    tipo_rota = "Nacional (Difícil Acesso)"
-                else:
-                    tempo_transporte_min = 5
-                    tipo_rota = "Nacional"
-
-                # Cálculo do Tempo Total Mínimo Realista
-                tempo_total_minimo = aprovacao + tempo_transporte_min
-                atraso_fisico = tempo_total_minimo - prazo
+                # Regra regional vetorizada (compartilhada com o scoring em lote)
+                with inst.etapa("previsao.guardrail"):
+                    guardrail = aplicar_guardrail(
+                        dias_pred_modelo, origem, destino, aprovacao, prazo,
+                        tabela_rotas).iloc[0]
 
-                # A "Previsão Final" é o maior valor entre o que o modelo achou e a física
-                dias_pred_final = max(dias_pred_modelo, atraso_fisico)
+                tipo_rota = guardrail["tipo_rota"]
+                dias_pred_final = guardrail["dias_pred_final"]
 
                 # Verifica se houve intervenção da regra
-                foi_ajustado = dias_pred_final > dias_pred_modelo
+                foi_ajustado = guardrail["foi_ajustado"]
 
                 # ==========================================================
                 # 4. EXIBIÇÃO
@@ -510,5 +842,44 @@ with tab_previsao:
                         l=0, r=0, t=0, b=0), showlegend=False)
                     st.plotly_chart(fig_breakdown, use_container_width=True)
 
+                stats_cache = cache_previsoes.estatisticas()
+                st.caption(
+                    f"Cache de previsões: {stats_cache['acertos']} acertos, "
+                    f"{stats_cache['falhas']} falhas, {stats_cache['despejos']} despejos "
+                    f"({stats_cache['tamanho']}/{stats_cache['capacidade']} entradas).")
+
             except Exception as e:
                 st.error(f"Erro ao processar a previsão: {e}")
+
+
+with tab_previsao:
+    simulador()
+
+# ==============================================================================
+# 6. INSTRUMENTAÇÃO (PAINEL ADMIN E EXPORTAÇÃO)
+# ==============================================================================
+inst.registrar("rerun", time.perf_counter() - inicio_rerun)
+# JSON e texto Prometheus (no máximo a cada 10 s) só com OLIST_METRICAS=<pasta>
+pasta_metricas = os.environ.get("OLIST_METRICAS")
+if pasta_metricas:
+    inst.exportar(os.path.join(pasta_metricas, ARQUIVO_METRICAS_JSON),
+                  os.path.join(pasta_metricas, ARQUIVO_METRICAS_PROM))
+
+if modo_admin:
+    with st.sidebar.expander("⏱️ Tempos por Etapa (admin)", expanded=True):
+        resumo_tempos = inst.resumo()
+        st.dataframe(
+            resumo_tempos[["etapa", "chamadas", "p50_ms", "p95_ms",
+                           "memoria_p95_mb"]].round(2),
+            hide_index=True, use_container_width=True)
+        st.caption(f"Janela: últimas {inst.janela} medições por etapa, "
+                   "todas as sessões.")
+        stats_agregados = cache_agregados.estatisticas()
+        st.caption(
+            f"Cache de agregados: {stats_agregados['tamanho']} recortes, "
+            f"{stats_agregados['bytes'] / 1024:.0f} KB de "
+            f"{stats_agregados['limite_bytes'] / 1024 ** 2:.0f} MB, "
+            f"{stats_agregados['taxa_acerto']:.0%} de acertos, "
+            f"{stats_agregados['despejos']} despejos.")
+        if st.button("Zerar medições"):
+            inst.limpar()
@@ -0,0 +1,125 @@
+"""
+Benchmark do enriquecimento do Dashboard: versão por linha x categórica.
+
+Compara `enriquecer_dados_dash` atual (categorias remapeadas uma vez por
+valor distinto, datas já convertidas preservadas, modo in-place) com a
+implementação anterior, linha a linha, em tabelas sintéticas com o mesmo
+perfil da tabela processada pelo ETL.
+
+Uso:
+    python -m benchmarks.bench_enriquecimento --linhas 1000000 10000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from utils.utils import (enriquecer_dados_dash, map_cat_correcao,
+                         map_status_simplificado)
+
+
+# Implementação anterior (referência), preservada aqui só para comparação
+
+
+def _tratar_categorias_linha(df, col_cat='categoria_produto'):
+    df[col_cat] = df[col_cat].replace(map_cat_correcao)
+    df['categoria_label'] = df[col_cat].astype(
+        str).str.replace('_', ' ').str.title()
+    return df
+
+
+def _tratar_status_linha(df, col_status='status_pedido'):
+    df["status_simplificado"] = df[col_status].map(map_status_simplificado)
+    return df
+
+
+def enriquecer_linha_a_linha(df):
+    df = _tratar_categorias_linha(df)
+    df = _tratar_status_linha(df)
+    df["faturamento_pedido"] = df["preco_produto"] + df["valor_frete"]
+    df["flag_atraso"] = df["dias_atraso"] > 0
+    df['data_postagem'] = pd.to_datetime(df['data_postagem'])
+    df['data_aprovacao'] = pd.to_datetime(df['data_aprovacao'])
+    df["tempo_processamento"] = (
+        df["data_postagem"] - df["data_aprovacao"]).dt.total_seconds() / 86400
+    return df
+
+
+# DADOS SINTÉTICOS
+
+_categorias = ['cama_mesa_banho', 'beleza_saude', 'esporte_lazer',
+               'moveis_decoracao', 'informatica_acessorios',
+               'utilidades_domesticas', 'relogios_presentes', 'telefonia',
+               'ferramentas_jardim', 'automotivo', 'brinquedos', 'pcs',
+               'eletrodomesticos_2', 'casa_conforto_2', 'pc_gamer',
+               'pet_shop', 'papelaria', 'perfumaria', 'bebes', 'desconhecido']
+
+
+def gerar_tabela(n, categorica=False, semente=42):
+    """Tabela sintética com as colunas lidas pelo enriquecimento."""
+    rng = np.random.default_rng(semente)
+    aprovacao = pd.Timestamp('2017-01-01') + pd.to_timedelta(
+        rng.integers(0, 600 * 86400, n), unit='s')
+    df = pd.DataFrame({
+        'categoria_produto': np.array(_categorias, dtype=object)[
+            rng.integers(0, len(_categorias), n)],
+        'status_pedido': np.array(list(map_status_simplificado), dtype=object)[
+            rng.choice(len(map_status_simplificado), n,
+                       p=[.9, .03, .01, .01, .01, .03, .01])],
+        'preco_produto': rng.gamma(2, 60, n).round(2),
+        'valor_frete': rng.gamma(2, 10, n).round(2),
+        'dias_atraso': rng.normal(-11, 9, n).round(),
+        'data_aprovacao': aprovacao,
+        'data_postagem': aprovacao + pd.to_timedelta(
+            rng.exponential(2.5 * 86400, n).astype('int64'), unit='s')
+    })
+    if categorica:
+        for col in ['categoria_produto', 'status_pedido']:
+            df[col] = df[col].astype('category')
+    return df
+
+
+# MEDIÇÃO
+
+
+def medir(funcao, df):
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcao(df)
+    segundos = time.perf_counter() - inicio
+    pico_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    return segundos, pico_mb, resultado.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--linhas", type=int, nargs='+',
+                        default=[1_000_000, 10_000_000])
+    args = parser.parse_args(argv)
+
+    cenarios = {
+        'linha a linha': (enriquecer_linha_a_linha, False),
+        'categórica': (enriquecer_dados_dash, False),
+        'categórica (entrada category, inplace)': (
+            lambda df: enriquecer_dados_dash(df, inplace=True), True)
+    }
+
+    print(f"{'linhas':>11} {'versão':<40} {'tempo (s)':>10} "
+          f"{'pico (MB)':>10} {'resultado (MB)':>15}")
+    for n in args.linhas:
+        for nome, (funcao, categorica) in cenarios.items():
+            df = gerar_tabela(n, categorica)
+            segundos, pico_mb, tamanho_mb = medir(funcao, df)
+            print(f"{n:>11,} {nome:<40} {segundos:>10.2f} {pico_mb:>10.1f} "
+                  f"{tamanho_mb:>15.1f}")
+            del df
+            gc.collect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark da junção do ETL: SQLite em memória x hash joins do pandas.
+
+Mede tempo de parede e pico de memória de `juntar_tabelas_sqlite` (o
+caminho original do notebook) e de `juntar_tabelas` sobre os CSVs da
+Olist e sobre réplicas sintéticas (pedidos, itens e clientes duplicados
+com IDs novos).
+
+Uso:
+    python -m benchmarks.bench_join --origem data --escalas 1 10
+"""
+import argparse
+import multiprocessing as mp
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from utils.etl import (carregar_dimensoes, extrair_pedidos, juntar_tabelas,
+                       juntar_tabelas_sqlite, PASTA_DATA)
+
+
+metodos = {
+    'sqlite': juntar_tabelas_sqlite,
+    'pandas': juntar_tabelas
+}
+
+
+def escalar(pedidos, itens, dimensoes, fator):
+    """Replica pedidos, itens e clientes `fator` vezes, com IDs distintos."""
+    if fator == 1:
+        return pedidos, itens, dimensoes
+
+    def replicar(df, chaves):
+        copias = []
+        for k in range(fator):
+            copia = df.copy()
+            for chave in chaves:
+                copia[chave] = copia[chave] + f'_{k}'
+            copias.append(copia)
+        return pd.concat(copias, ignore_index=True)
+
+    return (replicar(pedidos, ['order_id', 'customer_id']),
+            replicar(itens, ['order_id']),
+            {**dimensoes,
+             'clientes': replicar(dimensoes['clientes'], ['customer_id'])})
+
+
+def _memoria_kb(campo):
+    with open('/proc/self/status') as f:
+        for linha in f:
+            if linha.startswith(campo):
+                return int(linha.split()[1])
+    return None
+
+
+def _executar(metodo, tabelas, fila):
+    """Roda uma junção em processo filho e devolve (segundos, pico em MB)."""
+    try:
+        base = _memoria_kb('VmRSS:')
+        # Zera o pico de RSS (VmHWM) do processo antes da medição
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        usar_proc = True
+    except OSError:
+        tracemalloc.start()
+        usar_proc = False
+
+    inicio = time.perf_counter()
+    metodos[metodo](*tabelas)
+    segundos = time.perf_counter() - inicio
+
+    if usar_proc:
+        pico_mb = (_memoria_kb('VmHWM:') - base) / 1024
+    else:
+        pico_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    fila.put((segundos, pico_mb))
+
+
+def medir(metodo, tabelas):
+    # fork: o filho herda as tabelas já carregadas, sem serializá-las
+    contexto = mp.get_context('fork')
+    fila = contexto.Queue()
+    processo = contexto.Process(target=_executar,
+                                args=(metodo, tabelas, fila))
+    processo.start()
+    resultado = fila.get()
+    processo.join()
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--origem", default=PASTA_DATA,
+                        help="Pasta com os CSVs brutos da Olist")
+    parser.add_argument("--escalas", type=int, nargs='+', default=[1, 10])
+    parser.add_argument("--metodos", nargs='+', default=list(metodos))
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as cache:
+        dimensoes = carregar_dimensoes(args.origem, {}, cache)
+    pedidos, itens, _ = extrair_pedidos(args.origem)
+
+    print(f"{'escala':>6} {'método':>7} {'linhas':>10} {'tempo (s)':>10} "
+          f"{'pico (MB)':>10}")
+    for fator in args.escalas:
+        tabelas = escalar(pedidos, itens, dimensoes, fator)
+        linhas = len(tabelas[1])
+        for metodo in args.metodos:
+            segundos, pico_mb = medir(metodo, tabelas)
+            print(f"{fator:>5}x {metodo:>7} {linhas:>10,} {segundos:>10.2f} "
+                  f"{pico_mb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Suíte de benchmarks de escala sobre a base Olist sintética.
+
+Gera a base em cada escala (`utils.sintetico`), roda o ETL completo e o
+incremental e mede as etapas do Dashboard (leitura do dataset, cubo,
+índice de filtros, filtros, KPIs e agregações dos gráficos) e do modelo
+(scoring em lote com guardrail). Os tempos (mediana das repetições) são
+comparados com um baseline gravado; o comando termina com código 1
+quando alguma etapa regride além da tolerância.
+
+Uso:
+    python -m benchmarks.suite --escalas 1 10
+    python -m benchmarks.suite --escalas 1 10 --salvar-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from utils.cubo import (construir_cubo, filtrar_cubo, kpis_cubo,
+                        pedidos_por_status, atraso_por_estado,
+                        faturamento_por_estado, cancelamento_por_estado,
+                        atraso_por_categoria, processamento_por_categoria)
+from utils.dados import carregar_dataset_dashboard
+from utils.etl import atualizar, PASTA_DATA, CAMINHO_DATASET_ANALISE
+from utils.features import features_modelo
+from utils.filtros import IndiceFiltros
+from utils.instrumentacao import Instrumentacao
+from utils.modelo_compacto import (carregar_modelo, CAMINHO_MODELO_COMPACTO,
+                                   CAMINHO_MODELO_PKL)
+from utils.previsao_lote import prever_bloco
+from utils.sintetico import salvar_olist
+
+
+CAMINHO_BASELINE = "benchmarks/baseline.json"
+
+# Regressão: mais de 25% acima do baseline e pelo menos 50 ms a mais
+TOLERANCIA = 0.25
+PISO_SEGUNDOS = 0.05
+
+# Recortes da sidebar exercitados nas etapas de filtro e de gráficos
+selecoes_filtro = [
+    {},
+    {'uf_cliente': ['SP']},
+    {'uf_cliente': ['SP', 'RJ', 'MG'], 'status_simplificado': ['Aprovado']},
+    {'categoria_label': ['Beleza Saude', 'Cama Mesa Banho', 'Esporte Lazer']},
+    {'status_simplificado': ['Cancelado'], 'uf_cliente': ['BA', 'PE', 'CE']}
+]
+
+# Etapas na ordem do pipeline (ordem do relatório)
+etapas_suite = ['gerar_dados', 'etl_completo', 'etl_incremental', 'load_data',
+                'construir_cubo', 'indice_filtros', 'filtros', 'kpis_graficos',
+                'previsao_lote']
+
+agregacoes_graficos = [pedidos_por_status, atraso_por_estado,
+                       faturamento_por_estado, cancelamento_por_estado,
+                       atraso_por_categoria, processamento_por_categoria]
+
+
+@contextmanager
+def _diretorio(caminho):
+    """O ETL grava em caminhos relativos ('data/...'): roda dentro de `caminho`."""
+    anterior = os.getcwd()
+    os.chdir(caminho)
+    try:
+        yield
+    finally:
+        os.chdir(anterior)
+
+
+def _filtrar(indice, cubo, selecao):
+    bitmap = indice.selecionar(**selecao)
+    indice.contar(bitmap)
+    return filtrar_cubo(cubo, selecao.get('status_simplificado'),
+                        selecao.get('uf_cliente'),
+                        selecao.get('categoria_label'))
+
+
+def executar_escala(escala, pasta, modelo=None, repeticoes=3,
+                    pasta_referencia=PASTA_DATA):
+    """
+    Mede todas as etapas em uma escala.
+
+    Returns
+    -------
+    tuple
+        (dict etapa -> segundos (mediana), DataFrame do resumo completo)
+    """
+    inst = Instrumentacao()
+    origem = os.path.join(pasta, 'olist')
+
+    with inst.etapa('gerar_dados'):
+        salvar_olist(escala, origem, pasta_referencia=pasta_referencia)
+
+    with _diretorio(pasta):
+        with inst.etapa('etl_completo'):
+            atualizar(origem, completo=True)
+        with inst.etapa('etl_incremental'):
+            atualizar(origem)
+
+        for _ in range(repeticoes):
+            with inst.etapa('load_data'):
+                df = carregar_dataset_dashboard()
+            with inst.etapa('construir_cubo'):
+                cubo = construir_cubo(df)
+            with inst.etapa('indice_filtros'):
+                indice = IndiceFiltros(df)
+            with inst.etapa('filtros'):
+                for selecao in selecoes_filtro:
+                    _filtrar(indice, cubo, selecao)
+            with inst.etapa('kpis_graficos'):
+                for selecao in selecoes_filtro:
+                    cubo_f = _filtrar(indice, cubo, selecao)
+                    kpis_cubo(cubo_f)
+                    for agregacao in agregacoes_graficos:
+                        agregacao(cubo_f)
+            del df
+
+        if modelo is not None:
+            # Mesmo recorte da tabela de modelagem (`preparar_modelo`)
+            pedidos = pd.read_parquet(
+                CAMINHO_DATASET_ANALISE,
+                columns=features_modelo + ['cep_vendedor', 'data_entrega'])
+            pedidos = pedidos.dropna(
+                subset=['cep_vendedor', 'data_entrega'])[features_modelo]
+            for _ in range(repeticoes):
+                with inst.etapa('previsao_lote'):
+                    prever_bloco(pedidos, modelo)
+
+    resumo = inst.resumo().set_index('etapa')
+    tempos = {etapa: resumo.loc[etapa, 'p50_ms'] / 1000
+              for etapa in etapas_suite if etapa in resumo.index}
+    return tempos, resumo.reset_index()
+
+
+# BASELINE
+
+
+def ambiente():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def ler_baseline(caminho=CAMINHO_BASELINE):
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def salvar_baseline(resultados, caminho=CAMINHO_BASELINE):
+    """Grava (ou atualiza, por escala) o baseline com os tempos medidos."""
+    baseline = ler_baseline(caminho) or {'escalas': {}}
+    baseline['ambiente'] = ambiente()
+    baseline['gerado_em'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    for escala, tempos in resultados.items():
+        baseline['escalas'][str(escala)] = {
+            etapa: round(segundos, 4) for etapa, segundos in tempos.items()}
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+    return caminho
+
+
+def comparar(resultados, baseline, tolerancia=TOLERANCIA, piso=PISO_SEGUNDOS):
+    """
+    Compara os tempos com o baseline, etapa a etapa.
+
+    Returns
+    -------
+    pd.DataFrame
+        escala, etapa, segundos, baseline, razao e `regressao` (True quando
+        acima de `1 + tolerancia` vezes o baseline e de `piso` segundos)
+    """
+    linhas = []
+    for escala, tempos in resultados.items():
+        referencia = baseline.get('escalas', {}).get(str(escala), {}) \
+            if baseline else {}
+        for etapa, segundos in tempos.items():
+            base = referencia.get(etapa)
+            razao = segundos / base if base else float('nan')
+            linhas.append({
+                'escala': escala,
+                'etapa': etapa,
+                'segundos': segundos,
+                'baseline': base,
+                'razao': razao,
+                'regressao': bool(base) and razao > 1 + tolerancia and
+                segundos - base > piso
+            })
+    return pd.DataFrame(linhas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--escalas", type=float, nargs='+', default=[1, 10])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--referencia", default=PASTA_DATA,
+                        help="Pasta com os CSVs reais de produtos e vendedores")
+    parser.add_argument("--modelo", default=CAMINHO_MODELO_COMPACTO)
+    parser.add_argument("--baseline", default=CAMINHO_BASELINE)
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    parser.add_argument("--salvar-baseline", action="store_true",
+                        help="Grava os tempos medidos como novo baseline")
+    parser.add_argument("--pasta-temporaria", default=None,
+                        help="Onde gerar a base sintética (default: /tmp)")
+    args = parser.parse_args(argv)
+
+    modelo = carregar_modelo(os.path.abspath(args.modelo),
+                             os.path.abspath(CAMINHO_MODELO_PKL))
+    if modelo is None:
+        print("Modelo não encontrado: etapa 'previsao_lote' ignorada.")
+    referencia = os.path.abspath(args.referencia)
+
+    resultados = {}
+    for escala in args.escalas:
+        escala = int(escala) if float(escala).is_integer() else escala
+        print(f"Escala {escala}x...")
+        with tempfile.TemporaryDirectory(dir=args.pasta_temporaria) as pasta:
+            resultados[escala], _ = executar_escala(
+                escala, pasta, modelo, args.repeticoes, referencia)
+
+    baseline = ler_baseline(args.baseline)
+    comparacao = comparar(resultados, baseline, args.tolerancia)
+    print(f"\n{'escala':>6} {'etapa':<16} {'tempo (s)':>10} "
+          f"{'baseline':>10} {'razão':>7}")
+    for linha in comparacao.itertuples(index=False):
+        base = f"{linha.baseline:>10.3f}" if linha.baseline else f"{'-':>10}"
+        razao = f"{linha.razao:>6.2f}x" if linha.baseline else f"{'-':>7}"
+        alerta = "  << REGRESSÃO" if linha.regressao else ""
+        print(f"{str(linha.escala) + 'x':>6} {linha.etapa:<16} "
+              f"{linha.segundos:>10.3f} {base} {razao}{alerta}")
+
+    if args.salvar_baseline:
+        print(f"\nBaseline salvo em: {salvar_baseline(resultados, args.baseline)}")
+        return 0
+    if baseline and baseline.get('ambiente', {}).get('cpus') != os.cpu_count():
+        print("\nAviso: baseline medido em outra máquina "
+              f"({baseline['ambiente'].get('cpus')} CPUs).")
+    return 1 if comparacao['regressao'].any() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import sys
+import threading
+from collections import Counter, OrderedDict
+
+import pandas as pd
+
+from utils.cubo import filtrar_cubo, painel_cubo, somar_por, dimensoes_cubo
+
+
+# CONSTANTES
+
+LIMITE_BYTES_PADRAO = 32 * 1024 ** 2
+
+# Quantos valores de cada dimensão (e combinações já usadas) entram no aquecimento
+TOP_AQUECIMENTO = 10
+
+
+def tamanho_bytes(valor):
+    """Memória ocupada por um painel (DataFrames, Series, dicts e escalares)."""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(index=True, deep=True))
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(
+            sys.getsizeof(k) + tamanho_bytes(v) for k, v in valor.items())
+    return sys.getsizeof(valor)
+
+
+# CACHE DE AGREGADOS POR RECORTE
+
+
+class CacheAgregados:
+    """
+    Cache LRU dos agregados da Visão Geral, limitado em bytes.
+
+    A chave é o recorte canônico dos filtros (status, UFs, categorias):
+    valores ordenados, e uma dimensão com todos os valores marcados
+    equivale a nenhum filtro, desde que ela não tenha células nulas (o
+    `isin` dos filtros exclui os nulos; sem filtro, eles entram). O valor
+    é o painel completo (`painel_cubo`): os cinco KPIs e as tabelas dos
+    gráficos. É seguro entre threads, para ser compartilhado por todas as
+    sessões do Streamlit; os DataFrames devolvidos são compartilhados e
+    não devem ser alterados.
+
+    Parameters
+    ----------
+    limite_bytes : int, optional
+        Memória máxima ocupada pelos painéis (default 32 MB)
+    versao : object, optional
+        Versão dos dados (ver `cache_previsao.assinatura_artefatos`)
+    """
+
+    def __init__(self, limite_bytes=LIMITE_BYTES_PADRAO, versao=None):
+        self.limite_bytes = limite_bytes
+        self.versao = versao
+        self._entradas = OrderedDict()
+        self._universos = {}
+        self._uso = Counter()
+        self._trava = threading.Lock()
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+
+    def chave(self, status_sel=None, estados_sel=None, cat_sel=None):
+        """Recorte canônico: uma tupla ordenada por dimensão do cubo."""
+        chave = []
+        for dim, selecao in zip(dimensoes_cubo, [status_sel, estados_sel, cat_sel]):
+            valores = tuple(sorted(set(selecao or ())))
+            universo = self._universos.get(dim)
+            if universo and universo.issubset(valores):
+                valores = ()
+            chave.append(valores)
+        return tuple(chave)
+
+    def _calcular(self, cubo, chave):
+        with self._trava:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return self._entradas[chave][0]
+            self.falhas += 1
+
+        # A agregação roda fora da trava: outras sessões seguem lendo o cache
+        painel = painel_cubo(filtrar_cubo(cubo, *chave))
+        tamanho = tamanho_bytes(painel)
+        with self._trava:
+            if chave not in self._entradas and tamanho <= self.limite_bytes:
+                self._entradas[chave] = (painel, tamanho)
+                self.bytes += tamanho
+                while self.bytes > self.limite_bytes:
+                    _, (_, liberado) = self._entradas.popitem(last=False)
+                    self.bytes -= liberado
+                    self.despejos += 1
+        return painel
+
+    def obter(self, cubo, status_sel=None, estados_sel=None, cat_sel=None):
+        """
+        Painel da Visão Geral para um recorte dos filtros.
+
+        Returns
+        -------
+        dict
+            'kpis' (dict) e as tabelas de cada gráfico (ver `painel_cubo`)
+        """
+        chave = self.chave(status_sel, estados_sel, cat_sel)
+        with self._trava:
+            self._uso[chave] += 1
+        return self._calcular(cubo, chave)
+
+    def combinacoes_frequentes(self, cubo, top=TOP_AQUECIMENTO):
+        """
+        Recortes a pré-calcular: os mais pedidos até agora neste processo,
+        o painel sem filtro e cada um dos `top` valores de maior volume de
+        pedidos em cada dimensão, isoladamente.
+        """
+        with self._trava:
+            combinacoes = [chave for chave, _ in self._uso.most_common(top)]
+        combinacoes.append(((), (), ()))
+        for posicao, dim in enumerate(dimensoes_cubo):
+            pedidos = somar_por(cubo, dim)['pedidos'].nlargest(top)
+            for valor in pedidos.index:
+                chave = [(), (), ()]
+                chave[posicao] = (valor,)
+                combinacoes.append(tuple(chave))
+        return list(dict.fromkeys(combinacoes))
+
+    def aquecer(self, cubo, combinacoes=None):
+        """Pré-calcula os recortes (default: `combinacoes_frequentes`)."""
+        if combinacoes is None:
+            combinacoes = self.combinacoes_frequentes(cubo)
+        # Do menos para o mais importante: com pouco espaço, o LRU preserva
+        # os primeiros da lista
+        for chave in reversed(combinacoes):
+            self._calcular(cubo, chave)
+        return len(combinacoes)
+
+    def sincronizar(self, versao, cubo=None):
+        """
+        Descarta os painéis se a versão dos dados mudou e, com `cubo`,
+        reaquece os recortes frequentes. Devolve True se houve troca.
+        """
+        with self._trava:
+            if versao == self.versao:
+                return False
+            self._entradas.clear()
+            self.bytes = 0
+            self.versao = versao
+            if cubo is not None and len(cubo):
+                # Só dimensões sem nulos: marcar todos os valores de uma
+                # dimensão com nulos não é o mesmo que não filtrar
+                self._universos = {dim: set(cubo[dim].unique())
+                                   for dim in dimensoes_cubo
+                                   if cubo[dim].notna().all()}
+        if cubo is not None and len(cubo):
+            self.aquecer(cubo)
+        return True
+
+    def invalidar(self):
+        with self._trava:
+            self._entradas.clear()
+            self.bytes = 0
+
+    def estatisticas(self):
+        """Contadores de acertos, falhas e despejos, e ocupação atual."""
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'despejos': self.despejos,
+                'tamanho': len(self._entradas),
+                'bytes': self.bytes,
+                'limite_bytes': self.limite_bytes,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0
+            }
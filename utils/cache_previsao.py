@@ -0,0 +1,175 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.features import feat_num, feat_cat
+from utils.modelo_compacto import prever_registro
+
+
+# CONSTANTES
+
+CAPACIDADE_PADRAO = 4096
+
+
+# VERSÃO DO ARTEFATO
+
+
+def assinatura_artefatos(*caminhos):
+    """
+    Impressão digital dos artefatos do modelo (mtime e tamanho).
+
+    Diretórios (formato compacto) contribuem com cada arquivo contido;
+    caminhos inexistentes são ignorados. Qualquer re-exportação ou novo
+    treino muda a assinatura.
+    """
+    partes = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            arquivos = sorted(os.path.join(caminho, nome)
+                              for nome in os.listdir(caminho))
+        elif os.path.exists(caminho):
+            arquivos = [caminho]
+        else:
+            continue
+        for arquivo in arquivos:
+            info = os.stat(arquivo)
+            partes.append((arquivo, info.st_mtime_ns, info.st_size))
+    return hash(tuple(partes))
+
+
+# CACHE LRU
+
+
+class CachePrevisoes:
+    """
+    Cache LRU de previsões do modelo, limitado em número de entradas.
+
+    A chave é a tupla normalizada das nove features (números como float,
+    categorias como str), de modo que cenários repetidos do Simulador não
+    passam de novo pelo pré-processamento e pelas árvores. É seguro entre
+    threads, podendo ser compartilhado por todas as sessões do Streamlit.
+
+    Parameters
+    ----------
+    capacidade : int, optional
+        Máximo de previsões guardadas (default 4096)
+    versao : object, optional
+        Assinatura do artefato do modelo (ver `assinatura_artefatos`)
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO, versao=None):
+        self.capacidade = capacidade
+        self.versao = versao
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+
+    @staticmethod
+    def chave(linha):
+        """Tupla normalizada das features de um pedido (dict ou Series)."""
+        numeros = tuple(None if pd.isna(linha[col]) else float(linha[col])
+                        for col in feat_num)
+        categorias = tuple(None if pd.isna(linha[col]) else str(linha[col])
+                           for col in feat_cat)
+        return numeros + categorias
+
+    def sincronizar(self, versao):
+        """Esvazia o cache se o artefato do modelo mudou desde a última versão."""
+        with self._trava:
+            if versao != self.versao:
+                self._entradas.clear()
+                self.versao = versao
+
+    def invalidar(self):
+        with self._trava:
+            self._entradas.clear()
+
+    def prever(self, modelo, X):
+        """
+        Previsões para as linhas de `X`, consultando o cache antes do modelo.
+
+        As linhas ausentes do cache são previstas em uma única chamada a
+        `modelo.predict` e inseridas; as menos usadas recentemente são
+        descartadas quando a capacidade é excedida.
+
+        Parameters
+        ----------
+        modelo : object
+            Qualquer objeto com `predict` (Pipeline sklearn ou ModeloCompacto)
+        X : pd.DataFrame
+            Pedidos com as nove features do modelo
+
+        Returns
+        -------
+        np.ndarray
+            Atraso previsto (dias) para cada linha
+        """
+        chaves = [self.chave(linha) for linha in X.to_dict('records')]
+        previsoes = np.empty(len(chaves))
+        faltantes = []
+
+        with self._trava:
+            for i, chave in enumerate(chaves):
+                if chave in self._entradas:
+                    self._entradas.move_to_end(chave)
+                    previsoes[i] = self._entradas[chave]
+                    self.acertos += 1
+                else:
+                    faltantes.append(i)
+                    self.falhas += 1
+
+        if faltantes:
+            # O modelo roda fora da trava: outras sessões seguem lendo o cache
+            novas = modelo.predict(X.iloc[faltantes])
+            previsoes[faltantes] = novas
+            with self._trava:
+                for i, valor in zip(faltantes, novas):
+                    self._entradas[chaves[i]] = float(valor)
+                    self._entradas.move_to_end(chaves[i])
+                while len(self._entradas) > self.capacidade:
+                    self._entradas.popitem(last=False)
+                    self.despejos += 1
+
+        return previsoes
+
+    def prever_registro(self, modelo, registro):
+        """
+        Previsão de um único pedido (dict), sem montar DataFrame.
+
+        Usa `modelo.prever_registro` quando disponível (ModeloCompacto e
+        ServidorInferencia); senão, `prever_registro` de `modelo_compacto`.
+        """
+        chave = self.chave(registro)
+        with self._trava:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return self._entradas[chave]
+            self.falhas += 1
+
+        valor = prever_registro(modelo, registro)
+        with self._trava:
+            self._entradas[chave] = valor
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+                self.despejos += 1
+        return valor
+
+    def estatisticas(self):
+        """Contadores de acertos, falhas e despejos, e ocupação atual."""
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'despejos': self.despejos,
+                'tamanho': len(self._entradas),
+                'capacidade': self.capacidade,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0
+            }
@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+
+
+# CONSTANTES (Dimensões e Medidas do Cubo)
+
+CAMINHO_CUBO_DASHBOARD = "data/dashboard_cubo.parquet"
+
+dimensoes_cubo = ['status_simplificado', 'uf_cliente', 'categoria_label']
+
+# Todas as medidas são aditivas: qualquer recorte do cubo é a soma das células
+medidas_cubo = [
+    'pedidos',
+    'faturamento',
+    'atrasos',
+    'dias_atraso_soma',
+    'cancelados',
+    'processamento_soma',
+    'processamento_qtd'
+]
+
+
+# CONSTRUÇÃO
+
+
+def medidas_linhas(df):
+    """Medidas aditivas (`medidas_cubo`) de cada linha da tabela do Dashboard."""
+    atrasado = df['dias_atraso'] > 0
+    processado = df['tempo_processamento'] >= 0
+
+    base = pd.DataFrame(index=df.index)
+    base['pedidos'] = 1
+    base['faturamento'] = df['faturamento_pedido'].fillna(0)
+    base['atrasos'] = atrasado.astype('int64')
+    base['dias_atraso_soma'] = df['dias_atraso'].where(atrasado, 0)
+    base['cancelados'] = (df['status_simplificado'] ==
+                          'Cancelado').astype('int64')
+    base['processamento_soma'] = df['tempo_processamento'].where(processado, 0)
+    base['processamento_qtd'] = processado.astype('int64')
+    return base
+
+
+def construir_cubo(df):
+    """
+    Agrega a tabela do Dashboard em um cubo (status, UF, categoria).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Tabela do Dashboard já enriquecida (ver `enriquecer_dados_dash`)
+
+    Returns
+    -------
+    pd.DataFrame
+        Uma linha por combinação observada das dimensões, com as
+        medidas aditivas de `medidas_cubo`
+    """
+    base = medidas_linhas(df)
+    for col in dimensoes_cubo:
+        base[col] = df[col]
+
+    cubo = base.groupby(dimensoes_cubo, observed=True,
+                        dropna=False)[medidas_cubo].sum().reset_index()
+    for col in dimensoes_cubo:
+        cubo[col] = cubo[col].astype('category')
+    return cubo
+
+
+def somar_cubos(cubos):
+    """
+    Soma células de vários cubos (mesmas dimensões), descartando as vazias.
+
+    Parameters
+    ----------
+    cubos : list of pd.DataFrame
+        Cubos (ver `construir_cubo`); medidas negativas subtraem células
+
+    Returns
+    -------
+    pd.DataFrame
+        Cubo com uma linha por combinação das dimensões
+    """
+    base = pd.concat(
+        [cubo.astype({col: object for col in dimensoes_cubo})
+         for cubo in cubos], ignore_index=True)
+    novo = base.groupby(dimensoes_cubo, dropna=False)[
+        medidas_cubo].sum().reset_index()
+    novo = novo[novo['pedidos'] > 0].reset_index(drop=True)
+    for col in dimensoes_cubo:
+        novo[col] = novo[col].astype('category')
+    return novo
+
+
+def atualizar_cubo(cubo, removidos, adicionados):
+    """
+    Atualiza o cubo de forma aditiva: subtrai as células das linhas
+    substituídas e soma as das novas, sem reagregar o histórico.
+
+    Parameters
+    ----------
+    cubo : pd.DataFrame
+        Cubo atual
+    removidos, adicionados : pd.DataFrame
+        Cubos (ver `construir_cubo`) das linhas que saem e das que entram
+
+    Returns
+    -------
+    pd.DataFrame
+        Cubo atualizado, sem as células que ficaram vazias
+    """
+    negativos = removidos.copy()
+    negativos[medidas_cubo] = -negativos[medidas_cubo]
+    return somar_cubos([cubo, adicionados, negativos])
+
+
+def salvar_cubo(cubo, destino=CAMINHO_CUBO_DASHBOARD):
+    cubo.to_parquet(destino, index=False)
+    return destino
+
+
+def carregar_cubo(caminho=CAMINHO_CUBO_DASHBOARD):
+    return pd.read_parquet(caminho)
+
+
+# CONSULTAS (Recortes e Agregações)
+
+
+def filtrar_cubo(cubo, status_sel=None, estados_sel=None, cat_sel=None):
+    """Seleciona as células do cubo que atendem aos filtros da sidebar."""
+    mascara = np.ones(len(cubo), dtype=bool)
+    if status_sel:
+        mascara &= cubo['status_simplificado'].isin(status_sel).to_numpy()
+    if estados_sel:
+        mascara &= cubo['uf_cliente'].isin(estados_sel).to_numpy()
+    if cat_sel:
+        mascara &= cubo['categoria_label'].isin(cat_sel).to_numpy()
+    return cubo[mascara]
+
+
+def _razao(numerador, denominador):
+    return numerador / denominador.where(denominador > 0)
+
+
+def kpis_cubo(cubo):
+    """Calcula os cinco KPIs do topo do Dashboard a partir do cubo."""
+    return kpis_totais(cubo[medidas_cubo].sum())
+
+
+def kpis_totais(totais):
+    """Os cinco KPIs a partir das medidas somadas (cubo ou série diária)."""
+    total_pedidos = int(totais['pedidos'])
+
+    if total_pedidos > 0:
+        taxa_atraso = totais['atrasos'] / total_pedidos * 100
+        taxa_cancel = totais['cancelados'] / total_pedidos * 100
+    else:
+        taxa_atraso = taxa_cancel = 0
+
+    if totais['atrasos'] > 0:
+        atraso_medio = totais['dias_atraso_soma'] / totais['atrasos']
+    else:
+        atraso_medio = np.nan
+
+    return {
+        'total_pedidos': total_pedidos,
+        'faturamento': totais['faturamento'],
+        'taxa_atraso': taxa_atraso,
+        'atraso_medio': atraso_medio,
+        'taxa_cancel': taxa_cancel
+    }
+
+
+def somar_por(cubo, dimensao):
+    return cubo.groupby(dimensao, observed=True)[medidas_cubo].sum()
+
+
+def pedidos_por_status(cubo):
+    df_status = somar_por(cubo, 'status_simplificado')['pedidos']
+    df_status = df_status[df_status > 0].sort_values(ascending=False)
+    df_status = df_status.reset_index()
+    df_status.columns = ["Status", "Pedidos"]
+    return df_status
+
+
+def atraso_por_estado(cubo):
+    agg = somar_por(cubo, 'uf_cliente')
+    agg = agg[agg['atrasos'] > 0]
+    return pd.DataFrame({
+        'pedidos': agg['atrasos'],
+        'atraso_medio': agg['dias_atraso_soma'] / agg['atrasos']
+    }).reset_index()
+
+
+def faturamento_por_estado(cubo, top=10):
+    agg = somar_por(cubo, 'uf_cliente')
+    return agg['faturamento'].rename('faturamento_pedido').reset_index(
+    ).sort_values('faturamento_pedido', ascending=False).head(top)
+
+
+def cancelamento_por_estado(cubo):
+    agg = somar_por(cubo, 'uf_cliente')
+    agg = agg[agg['pedidos'] > 0]
+    return _razao(agg['cancelados'], agg['pedidos']).rename(
+        'is_cancel').reset_index()
+
+
+def atraso_por_categoria(cubo, top=10):
+    agg = somar_por(cubo, 'categoria_label')
+    agg = agg[agg['atrasos'] > 0]
+    return _razao(agg['dias_atraso_soma'], agg['atrasos']).rename(
+        'dias_atraso').reset_index().sort_values(
+        'dias_atraso', ascending=False).head(top)
+
+
+def processamento_por_categoria(cubo, top=10):
+    agg = somar_por(cubo, 'categoria_label')
+    agg = agg[agg['processamento_qtd'] > 0]
+    return _razao(agg['processamento_soma'], agg['processamento_qtd']).rename(
+        'tempo_processamento').reset_index().sort_values(
+        'tempo_processamento', ascending=False).head(top)
+
+
+def painel_cubo(cubo):
+    """KPIs e tabelas de todos os gráficos da Visão Geral para um recorte."""
+    return {
+        'kpis': kpis_cubo(cubo),
+        'status': pedidos_por_status(cubo),
+        'atraso_estado': atraso_por_estado(cubo),
+        'faturamento_estado': faturamento_por_estado(cubo),
+        'cancelamento_estado': cancelamento_por_estado(cubo),
+        'atraso_categoria': atraso_por_categoria(cubo),
+        'processamento_categoria': processamento_por_categoria(cubo)
+    }
@@ -0,0 +1,247 @@
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from utils.cubo import (construir_cubo, salvar_cubo, carregar_cubo,
+                        atualizar_cubo, dimensoes_cubo, CAMINHO_CUBO_DASHBOARD)
+from utils.utils import enriquecer_dados_dash
+
+
+# CONSTANTES (Caminhos e Esquema do Dataset Colunar)
+
+CAMINHO_CSV_DASHBOARD = "data/data_dashboard_processed.csv"
+CAMINHO_DATASET_DASHBOARD = "data/dashboard"
+
+# Coluna de partição (mês da compra, formato 'AAAA-MM')
+COLUNA_PARTICAO = "mes_compra"
+
+colunas_categoricas = [
+    'status_simplificado',
+    'uf_cliente',
+    'categoria_label',
+    'categoria_produto'
+]
+
+# Colunas efetivamente utilizadas pelo Dashboard (app.py)
+colunas_dashboard = [
+    'status_simplificado',
+    'uf_cliente',
+    'categoria_label',
+    'categoria_produto',
+    'data_compra',
+    'faturamento_pedido',
+    'flag_atraso',
+    'dias_atraso',
+    'tempo_processamento'
+]
+
+# Colunas necessárias para construir o cubo
+colunas_cubo = dimensoes_cubo + ['faturamento_pedido', 'dias_atraso',
+                                 'tempo_processamento']
+
+
+# FUNÇÕES DE ESCRITA (Build)
+
+
+def preparar_tabela_dashboard(df):
+    """
+    Garante as colunas derivadas e a tipagem compacta do Dashboard.
+
+    Aplica `enriquecer_dados_dash` apenas quando as colunas derivadas
+    ainda não existem e converte as dimensões de filtro para `category`.
+    """
+    derivadas = ['status_simplificado', 'faturamento_pedido',
+                 'flag_atraso', 'tempo_processamento']
+    if any(col not in df.columns for col in derivadas):
+        df = enriquecer_dados_dash(df)
+
+    df['flag_atraso'] = df['flag_atraso'].astype(bool)
+
+    for col in colunas_categoricas:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    if 'data_compra' in df.columns:
+        df[COLUNA_PARTICAO] = pd.to_datetime(
+            df['data_compra']).dt.strftime('%Y-%m').fillna('desconhecido')
+    return df
+
+
+def remover_particoes(destino, meses):
+    """Apaga partições mensais inteiras (meses que ficaram sem pedidos)."""
+    for mes in meses:
+        shutil.rmtree(os.path.join(destino, f'{COLUNA_PARTICAO}={mes}'),
+                      ignore_errors=True)
+
+
+def salvar_dataset_dashboard(df, destino=CAMINHO_DATASET_DASHBOARD,
+                             incremental=False,
+                             destino_cubo=CAMINHO_CUBO_DASHBOARD, meses=None):
+    """
+    Grava a tabela do Dashboard como dataset Parquet particionado por mês.
+
+    Também grava o cubo pré-agregado (ver `utils.cubo`) usado pelos KPIs
+    e gráficos da aba "Visão Geral".
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Tabela processada do Dashboard (enriquecida ou não)
+    destino : str, optional
+        Diretório raiz do dataset (default 'data/dashboard')
+    incremental : bool, optional
+        Se True, substitui apenas os meses presentes em `df`; caso
+        contrário, recria o dataset inteiro (default False)
+    destino_cubo : str, optional
+        Arquivo Parquet do cubo (default 'data/dashboard_cubo.parquet')
+    meses : list, optional
+        Meses substituídos no modo incremental (default: os presentes em
+        `df`); um mês da lista sem linhas em `df` é apagado
+
+    Returns
+    -------
+    str
+        Caminho do dataset gravado
+    """
+    if not incremental and os.path.isdir(destino):
+        shutil.rmtree(destino)
+
+    df = preparar_tabela_dashboard(df)
+    presentes = df[COLUNA_PARTICAO].unique().tolist() \
+        if COLUNA_PARTICAO in df.columns else []
+    meses = presentes if meses is None else list(meses)
+
+    # Em modo incremental o cubo é atualizado de forma aditiva: as linhas
+    # dos meses substituídos saem e as novas entram
+    cubo = None
+    if incremental and os.path.exists(destino_cubo) and \
+            dataset_disponivel(destino) and COLUNA_PARTICAO in df.columns:
+        anteriores = carregar_dataset_dashboard(
+            destino, colunas=colunas_cubo, meses=meses)
+        cubo = atualizar_cubo(carregar_cubo(destino_cubo),
+                              construir_cubo(anteriores), construir_cubo(df))
+
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+
+    particoes = [COLUNA_PARTICAO] if COLUNA_PARTICAO in df.columns else None
+    if len(df) or not incremental:
+        pq.write_to_dataset(
+            tabela,
+            root_path=destino,
+            partition_cols=particoes,
+            existing_data_behavior='delete_matching'
+        )
+    if incremental:
+        # `delete_matching` só troca as partições gravadas
+        remover_particoes(destino, set(meses) - set(presentes))
+
+    if cubo is None:
+        # Sem cubo anterior: reagrega o histórico completo a partir do dataset
+        if incremental:
+            df = carregar_dataset_dashboard(destino, colunas=colunas_cubo)
+        cubo = construir_cubo(df)
+    salvar_cubo(cubo, destino_cubo)
+    return destino
+
+
+def anexar_dataset_dashboard(df, destino=CAMINHO_DATASET_DASHBOARD,
+                             prefixo='parte'):
+    """
+    Acrescenta um bloco de linhas ao dataset, sem substituir os meses.
+
+    Usado na carga em blocos do ETL: cada bloco grava seus próprios
+    arquivos (`prefixo`) nas partições mensais, e o cubo do bloco é
+    devolvido para ser somado aos demais (`somar_cubos`).
+
+    Returns
+    -------
+    pd.DataFrame
+        Cubo (ver `construir_cubo`) das linhas do bloco
+    """
+    df = preparar_tabela_dashboard(df)
+    pq.write_to_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        root_path=destino,
+        partition_cols=[COLUNA_PARTICAO],
+        basename_template=f'{prefixo}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore'
+    )
+    return construir_cubo(df)
+
+
+def construir_dataset_dashboard(origem=CAMINHO_CSV_DASHBOARD,
+                                destino=CAMINHO_DATASET_DASHBOARD,
+                                destino_cubo=CAMINHO_CUBO_DASHBOARD):
+    """Converte o CSV processado pelo ETL no dataset colunar do Dashboard."""
+    df = pd.read_csv(
+        origem,
+        parse_dates=["data_compra", "data_aprovacao", "data_postagem"]
+    )
+    return salvar_dataset_dashboard(df, destino, destino_cubo=destino_cubo)
+
+
+# FUNÇÕES DE LEITURA
+
+
+def dataset_disponivel(caminho=CAMINHO_DATASET_DASHBOARD):
+    return os.path.isdir(caminho) and any(os.scandir(caminho))
+
+
+def abrir_dataset(caminho=CAMINHO_DATASET_DASHBOARD):
+    """Abre o dataset particionado com leitura via memory-map."""
+    sistema_arquivos = fs.LocalFileSystem(use_mmap=True)
+    return ds.dataset(
+        os.path.abspath(caminho),
+        format='parquet',
+        partitioning='hive',
+        filesystem=sistema_arquivos
+    )
+
+
+def carregar_dataset_dashboard(caminho=CAMINHO_DATASET_DASHBOARD,
+                               colunas=colunas_dashboard, meses=None):
+    """
+    Lê apenas as colunas solicitadas do dataset colunar do Dashboard.
+
+    Parameters
+    ----------
+    caminho : str, optional
+        Diretório raiz do dataset (default 'data/dashboard')
+    colunas : list, optional
+        Colunas a projetar na leitura (default `colunas_dashboard`)
+    meses : list, optional
+        Restringe a leitura a estas partições ('AAAA-MM')
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame com as dimensões de filtro como `category`
+    """
+    dataset = abrir_dataset(caminho)
+    disponiveis = [col for col in colunas if col in dataset.schema.names]
+    filtro = None
+    if meses is not None:
+        filtro = ds.field(COLUNA_PARTICAO).isin(list(meses))
+    tabela = dataset.to_table(columns=disponiveis, filter=filtro)
+    return tabela.to_pandas(self_destruct=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Gera o dataset Parquet do Dashboard a partir do CSV processado.")
+    parser.add_argument("--origem", default=CAMINHO_CSV_DASHBOARD)
+    parser.add_argument("--destino", default=CAMINHO_DATASET_DASHBOARD)
+    parser.add_argument("--destino-cubo", default=CAMINHO_CUBO_DASHBOARD)
+    args = parser.parse_args()
+
+    caminho = construir_dataset_dashboard(
+        args.origem, args.destino, args.destino_cubo)
+    print(f"Dataset salvo em: {caminho}")
+    print(f"Cubo salvo em: {args.destino_cubo}")
@@ -0,0 +1,874 @@
+import json
+import math
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from utils.dados import (salvar_dataset_dashboard, carregar_dataset_dashboard,
+                         anexar_dataset_dashboard, dataset_disponivel,
+                         remover_particoes, COLUNA_PARTICAO,
+                         CAMINHO_DATASET_DASHBOARD)
+from utils.cubo import somar_cubos, salvar_cubo, CAMINHO_CUBO_DASHBOARD
+from utils.features import volume_cm3, peso_cubado_kg
+from utils.preprocessamento import (Preprocessador, CAMINHO_MEDIANAS,
+                                    CAMINHO_VOCABULARIO)
+
+
+# CONSTANTES (Fontes, Estado e Destinos)
+
+PASTA_DATA = "data"
+
+arquivos_olist = {
+    'pedidos': 'olist_orders_dataset.csv',
+    'itens_pedido': 'olist_order_items_dataset.csv',
+    'produtos': 'olist_products_dataset.csv',
+    'clientes': 'olist_customers_dataset.csv',
+    'vendedores': 'olist_sellers_dataset.csv'
+}
+
+# Tabelas de dimensão: mudam pouco e ficam em cache (Parquet)
+dimensoes_olist = ['produtos', 'clientes', 'vendedores']
+
+CAMINHO_ESTADO_ETL = "data/etl_estado.json"
+# Pedidos ainda abertos na última execução (relidos na próxima)
+CAMINHO_PEDIDOS_ABERTOS = "data/etl_pedidos_abertos.parquet"
+PASTA_DIMENSOES = "data/dimensoes"
+
+# Tabela logística processada (equivalente a `analise_logistica`)
+CAMINHO_DATASET_ANALISE = "data/analise"
+
+CAMINHO_CSV_DASHBOARD = "data/data_dashboard_processed.csv"
+CAMINHO_CSV_MODELO = "data/data_model_processed.csv"
+
+# Pedidos comprados até N dias antes da marca d'água são relidos a cada
+# execução (pedidos que chegam à fonte com atraso); mudanças de status e
+# datas de entrega vêm dos pedidos abertos, relidos qualquer que seja a data
+JANELA_REPROCESSAMENTO_DIAS = 30
+
+# Status que não mudam mais; os demais pedidos continuam abertos
+status_finais = ['delivered', 'canceled', 'unavailable']
+
+# Leitura dos CSVs de fatos em lotes do pyarrow (bytes de texto por lote)
+BYTES_BLOCO_CSV = 64 * 1024 ** 2
+
+# Carga em blocos: um balde (hash do pedido) a cada N bytes de CSV de fatos
+BYTES_POR_BALDE = 256 * 1024 ** 2
+
+# Tipos fixos dos CSVs de fatos: todos os lotes saem com o mesmo esquema
+# (datas em segundos, como na inferência do motor pyarrow do `read_csv`)
+tipos_csv = {
+    'pedidos': {
+        'order_id': pa.string(),
+        'customer_id': pa.string(),
+        'order_status': pa.string(),
+        'order_purchase_timestamp': pa.timestamp('s'),
+        'order_approved_at': pa.timestamp('s'),
+        'order_delivered_carrier_date': pa.timestamp('s'),
+        'order_delivered_customer_date': pa.timestamp('s'),
+        'order_estimated_delivery_date': pa.timestamp('s')
+    },
+    'itens_pedido': {
+        'order_id': pa.string(),
+        'order_item_id': pa.int64(),
+        'product_id': pa.string(),
+        'seller_id': pa.string(),
+        'shipping_limit_date': pa.timestamp('s'),
+        'price': pa.float64(),
+        'freight_value': pa.float64()
+    }
+}
+
+cols_data_pedidos = ['order_purchase_timestamp', 'order_approved_at',
+                     'order_delivered_carrier_date',
+                     'order_delivered_customer_date',
+                     'order_estimated_delivery_date']
+
+query_tabela_logistica = """
+SELECT
+    o.order_id AS pedido_id,
+    o.order_status AS status_pedido,
+    o.order_purchase_timestamp AS data_compra,
+    o.order_approved_at AS data_aprovacao,
+    o.order_delivered_carrier_date AS data_postagem,
+    o.order_delivered_customer_date AS data_entrega,
+    o.order_estimated_delivery_date AS data_estimada,
+
+    i.price AS preco_produto,
+    i.freight_value AS valor_frete,
+    i.shipping_limit_date AS data_limite_postagem,
+
+    p.product_weight_g AS peso_produto_g,
+    p.product_length_cm AS comprimento_produto_cm,
+    p.product_height_cm AS altura_produto_cm,
+    p.product_width_cm AS largura_produto_cm,
+    p.product_category_name AS categoria_produto,
+
+    c.customer_zip_code_prefix AS cep_cliente,
+    c.customer_city AS cidade_cliente,
+    c.customer_state AS uf_cliente,
+
+    v.seller_zip_code_prefix AS cep_vendedor,
+    v.seller_city AS cidade_vendedor,
+    v.seller_state AS uf_vendedor,
+
+    -- Cria Flag de Pickup
+    CASE
+        WHEN c.customer_city = v.seller_city AND c.customer_state = v.seller_state THEN 1
+        ELSE 0
+    END AS flag_pickup
+
+FROM pedidos o
+LEFT JOIN itens_pedido i ON o.order_id = i.order_id
+LEFT JOIN produtos p ON i.product_id = p.product_id
+LEFT JOIN clientes c ON o.customer_id = c.customer_id
+LEFT JOIN vendedores v ON i.seller_id = v.seller_id;
+"""
+
+# Ordem das colunas da `analise_logistica` (igual à da consulta SQL)
+colunas_analise = [
+    'pedido_id', 'status_pedido', 'data_compra', 'data_aprovacao',
+    'data_postagem', 'data_entrega', 'data_estimada',
+    'preco_produto', 'valor_frete', 'data_limite_postagem',
+    'peso_produto_g', 'comprimento_produto_cm', 'altura_produto_cm',
+    'largura_produto_cm', 'categoria_produto',
+    'cep_cliente', 'cidade_cliente', 'uf_cliente',
+    'cep_vendedor', 'cidade_vendedor', 'uf_vendedor',
+    'flag_pickup'
+]
+
+cols_data_analise = ['data_compra', 'data_aprovacao', 'data_postagem',
+                     'data_entrega', 'data_estimada', 'data_limite_postagem']
+
+
+# ESTADO (Marca d'água)
+
+
+def ler_estado(caminho=CAMINHO_ESTADO_ETL):
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def salvar_estado(estado, caminho=CAMINHO_ESTADO_ETL):
+    # Grava em arquivo temporário e renomeia: o estado nunca fica pela metade
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+
+def ler_pedidos_abertos(caminho=CAMINHO_PEDIDOS_ABERTOS):
+    if not os.path.exists(caminho):
+        return pd.Series([], dtype=object, name='order_id')
+    return pd.read_parquet(caminho)['order_id']
+
+
+def salvar_pedidos_abertos(ids, caminho=CAMINHO_PEDIDOS_ABERTOS):
+    temporario = caminho + '.tmp'
+    pd.DataFrame({'order_id': pd.Series(ids, dtype=object).unique()}).to_parquet(
+        temporario, index=False)
+    os.replace(temporario, caminho)
+
+
+def _assinatura_arquivo(caminho):
+    info = os.stat(caminho)
+    return [info.st_mtime_ns, info.st_size]
+
+
+# TRATAMENTO (mesmas regras do notebook de ETL)
+
+
+def tratar_produtos(produtos):
+    """Preenche categoria e colunas de marketing; remove produtos sem dimensões."""
+    produtos['product_category_name'] = produtos[
+        'product_category_name'].fillna('unknown')
+
+    col_mkt = ['product_description_lenght', 'product_name_lenght',
+               'product_photos_qty']
+    produtos[col_mkt] = produtos[col_mkt].fillna(0)
+
+    col_criticas = ['product_weight_g', 'product_length_cm',
+                    'product_height_cm', 'product_width_cm']
+    return produtos.dropna(subset=col_criticas)
+
+
+def tratar_pedidos(pedidos):
+    """Remove pedidos ruidosos/incompletos e converte as datas."""
+    ruidos = (pedidos['order_status'] == 'delivered') & \
+        (pedidos['order_delivered_customer_date'].isnull())
+    pedidos = pedidos[~ruidos].copy()
+
+    for col in cols_data_pedidos:
+        pedidos[col] = pd.to_datetime(pedidos[col], errors='coerce')
+
+    incompletos = (pedidos['order_status'] == 'delivered') & (
+        pedidos['order_approved_at'].isnull() |
+        pedidos['order_delivered_carrier_date'].isnull())
+    return pedidos[~incompletos]
+
+
+def situacao_pedidos(brutos, tratados):
+    """
+    Uma linha por pedido bruto: `order_id`, `data_compra` e `aberto`.
+
+    Aberto é o pedido cujo status ainda pode mudar, ou que foi descartado
+    pelo tratamento (ex.: entregue sem data de entrega, que pode ser
+    corrigida depois).
+    """
+    return pd.DataFrame({
+        'order_id': brutos['order_id'].to_numpy(),
+        'data_compra': pd.to_datetime(brutos['order_purchase_timestamp'],
+                                      errors='coerce').to_numpy(),
+        'aberto': (~brutos['order_status'].isin(status_finais) |
+                   ~brutos.index.isin(tratados.index)).to_numpy()
+    })
+
+
+def tratar_itens(itens):
+    itens['shipping_limit_date'] = pd.to_datetime(
+        itens['shipping_limit_date'], errors='coerce')
+    return itens
+
+
+# EXTRAÇÃO
+
+
+def carregar_dimensoes(pasta_origem=PASTA_DATA, estado=None,
+                       pasta_dimensoes=PASTA_DIMENSOES):
+    """
+    Dimensões (produtos, clientes, vendedores) com cache em Parquet.
+
+    O CSV só é relido (e o cache regravado) quando seu mtime/tamanho muda
+    em relação ao registrado no estado; nos demais casos a leitura é do
+    Parquet em cache.
+
+    Returns
+    -------
+    dict
+        Nome da dimensão -> DataFrame tratado
+    """
+    estado = {} if estado is None else estado
+    assinaturas = estado.setdefault('assinaturas', {})
+    os.makedirs(pasta_dimensoes, exist_ok=True)
+
+    dimensoes = {}
+    for nome in dimensoes_olist:
+        origem = os.path.join(pasta_origem, arquivos_olist[nome])
+        cache = os.path.join(pasta_dimensoes, f'{nome}.parquet')
+        assinatura = _assinatura_arquivo(origem)
+
+        if os.path.exists(cache) and assinaturas.get(nome) == assinatura:
+            dimensoes[nome] = pd.read_parquet(cache)
+            continue
+
+        df = pd.read_csv(origem)
+        if nome == 'produtos':
+            df = tratar_produtos(df)
+        df.to_parquet(cache, index=False)
+        assinaturas[nome] = assinatura
+        dimensoes[nome] = df
+    return dimensoes
+
+
+def ler_csv_em_blocos(caminho, tipos=None, bytes_bloco=BYTES_BLOCO_CSV):
+    """Lê um CSV em lotes do pyarrow: a memória fica limitada ao lote."""
+    leitor = pa_csv.open_csv(
+        caminho,
+        read_options=pa_csv.ReadOptions(block_size=bytes_bloco),
+        convert_options=pa_csv.ConvertOptions(column_types=tipos or {}))
+    for lote in leitor:
+        yield lote.to_pandas()
+
+
+def _concatenar(blocos, colunas):
+    if not blocos:
+        return pd.DataFrame(columns=colunas)
+    return pd.concat(blocos, ignore_index=True)
+
+
+def extrair_pedidos(pasta_origem=PASTA_DATA, desde=None, incluir=None,
+                    bytes_bloco=BYTES_BLOCO_CSV):
+    """
+    Pedidos e itens comprados a partir de `desde` (todos, se None), mais
+    os pedidos de `incluir` qualquer que seja a data da compra.
+
+    Os CSVs de fatos são lidos em lotes; o filtro pela marca d'água
+    acontece em cada lote, antes de qualquer tratamento, junção ou
+    imputação. Só os pedidos selecionados (e seus itens) ficam em memória.
+
+    Returns
+    -------
+    tuple
+        (pedidos, itens, lidos): `lidos` é a `situacao_pedidos` de todos
+        os pedidos selecionados, inclusive os descartados no tratamento
+    """
+    blocos, situacoes = [], []
+    for pedidos in ler_csv_em_blocos(
+            os.path.join(pasta_origem, arquivos_olist['pedidos']),
+            tipos_csv['pedidos'], bytes_bloco):
+        if desde is not None:
+            compra = pd.to_datetime(pedidos['order_purchase_timestamp'],
+                                    errors='coerce')
+            selecao = compra >= desde
+            if incluir is not None:
+                selecao |= pedidos['order_id'].isin(incluir)
+            pedidos = pedidos[selecao]
+        tratados = tratar_pedidos(pedidos)
+        situacoes.append(situacao_pedidos(pedidos, tratados))
+        blocos.append(tratados)
+    pedidos = _concatenar(blocos, list(tipos_csv['pedidos']))
+    lidos = _concatenar(situacoes, ['order_id', 'data_compra', 'aberto'])
+
+    blocos = [itens[itens['order_id'].isin(pedidos['order_id'])]
+              for itens in ler_csv_em_blocos(
+                  os.path.join(pasta_origem, arquivos_olist['itens_pedido']),
+                  tipos_csv['itens_pedido'], bytes_bloco)]
+    itens = _concatenar(blocos, list(tipos_csv['itens_pedido']))
+    return pedidos, tratar_itens(itens), lidos
+
+
+# TRANSFORMAÇÃO
+
+
+# Colunas de cada tabela na `analise_logistica` (origem -> destino)
+colunas_juncao = {
+    'pedidos': {
+        'order_id': 'pedido_id',
+        'order_status': 'status_pedido',
+        'order_purchase_timestamp': 'data_compra',
+        'order_approved_at': 'data_aprovacao',
+        'order_delivered_carrier_date': 'data_postagem',
+        'order_delivered_customer_date': 'data_entrega',
+        'order_estimated_delivery_date': 'data_estimada'
+    },
+    'itens_pedido': {
+        'price': 'preco_produto',
+        'freight_value': 'valor_frete',
+        'shipping_limit_date': 'data_limite_postagem'
+    },
+    'produtos': {
+        'product_weight_g': 'peso_produto_g',
+        'product_length_cm': 'comprimento_produto_cm',
+        'product_height_cm': 'altura_produto_cm',
+        'product_width_cm': 'largura_produto_cm',
+        'product_category_name': 'categoria_produto'
+    },
+    'clientes': {
+        'customer_zip_code_prefix': 'cep_cliente',
+        'customer_city': 'cidade_cliente',
+        'customer_state': 'uf_cliente'
+    },
+    'vendedores': {
+        'seller_zip_code_prefix': 'cep_vendedor',
+        'seller_city': 'cidade_vendedor',
+        'seller_state': 'uf_vendedor'
+    }
+}
+
+
+def _dimensao_unica(df, chave, colunas):
+    """Projeta a dimensão nas colunas usadas, com a chave sem duplicatas."""
+    return df[[chave] + list(colunas)].drop_duplicates(subset=chave)
+
+
+def juntar_tabelas(pedidos, itens, dimensoes):
+    """
+    Monta a tabela `analise_logistica` (LEFT JOINs) em memória colunar.
+
+    Mesmo resultado da consulta SQL `query_tabela_logistica`, mas com hash
+    joins do pandas sobre as chaves: nada é serializado para o SQLite e as
+    datas continuam tipadas (`datetime64`), sem serem reconvertidas.
+
+    Parameters
+    ----------
+    pedidos, itens : pd.DataFrame
+        Tabelas de fatos já tratadas (`tratar_pedidos`, `tratar_itens`)
+    dimensoes : dict
+        Produtos, clientes e vendedores (ver `carregar_dimensoes`)
+
+    Returns
+    -------
+    pd.DataFrame
+        Uma linha por item de pedido (ou por pedido sem itens)
+    """
+    produtos = dimensoes['produtos']
+    clientes = dimensoes['clientes']
+    vendedores = dimensoes['vendedores']
+
+    df = pedidos[list(colunas_juncao['pedidos']) + ['customer_id']].merge(
+        itens[['order_id', 'product_id', 'seller_id'] +
+              list(colunas_juncao['itens_pedido'])],
+        on='order_id', how='left')
+    df = df.merge(
+        _dimensao_unica(produtos, 'product_id', colunas_juncao['produtos']),
+        on='product_id', how='left')
+    df = df.merge(
+        _dimensao_unica(clientes, 'customer_id', colunas_juncao['clientes']),
+        on='customer_id', how='left')
+    df = df.merge(
+        _dimensao_unica(vendedores, 'seller_id', colunas_juncao['vendedores']),
+        on='seller_id', how='left')
+
+    renomear = {}
+    for colunas in colunas_juncao.values():
+        renomear.update(colunas)
+    df = df.rename(columns=renomear)
+
+    # Cria Flag de Pickup (comparações com nulo resultam em 0, como no SQL)
+    df['flag_pickup'] = ((df['cidade_cliente'] == df['cidade_vendedor']) &
+                         (df['uf_cliente'] == df['uf_vendedor'])).astype('int64')
+
+    df_analise = df[colunas_analise].copy()
+    for col in cols_data_analise:
+        if not pd.api.types.is_datetime64_any_dtype(df_analise[col]):
+            df_analise[col] = pd.to_datetime(df_analise[col], errors='coerce')
+    return df_analise
+
+
+def juntar_tabelas_sqlite(pedidos, itens, dimensoes):
+    """Versão original da junção (via SQLite em memória), mantida para benchmark."""
+    tabelas = {'pedidos': pedidos, 'itens_pedido': itens, **dimensoes}
+
+    conn = sqlite3.connect(':memory:')
+    for nome, df in tabelas.items():
+        df.to_sql(nome, conn, index=False, if_exists='replace')
+    df_analise = pd.read_sql_query(query_tabela_logistica, conn)
+    conn.close()
+
+    for col in cols_data_analise:
+        df_analise[col] = pd.to_datetime(df_analise[col], errors='coerce')
+    return df_analise
+
+
+def calcular_metricas(df_analise):
+    """Volume, peso cubado e métricas de SLA (tempos, prazo e atraso)."""
+    df_analise['vol_cm3'] = volume_cm3(df_analise['comprimento_produto_cm'],
+                                       df_analise['largura_produto_cm'],
+                                       df_analise['altura_produto_cm'])
+    df_analise['peso_cubado_kg'] = peso_cubado_kg(df_analise['vol_cm3'])
+
+    df_analise['tempo_aprovacao'] = (
+        (df_analise['data_aprovacao'] - df_analise['data_compra']
+         ).dt.total_seconds() / 86400).round(2)
+    df_analise['tempo_postagem'] = (
+        (df_analise['data_postagem'] - df_analise['data_aprovacao']
+         ).dt.total_seconds() / 86400).round(2).clip(lower=0)
+    df_analise['tempo_transporte'] = (
+        (df_analise['data_entrega'] - df_analise['data_postagem']
+         ).dt.total_seconds() / 86400).round(2)
+    df_analise['prazo_prometido'] = (
+        df_analise['data_estimada'] - df_analise['data_compra']).dt.days
+    df_analise['dias_atraso'] = (
+        df_analise['data_entrega'] - df_analise['data_estimada']).dt.days
+    df_analise['flag_atraso'] = np.where(df_analise['dias_atraso'] > 0, 1, 0)
+    return df_analise
+
+
+def preparar_dashboard(df_analise):
+    df_dash = df_analise.copy()
+    df_dash['status_cadastro'] = np.where(
+        df_dash['cep_vendedor'].isnull(),
+        'Incompleto (Sem Vendedor)',
+        'Completo'
+    )
+    return df_dash
+
+
+def preparar_modelo(df_analise):
+    return df_analise.dropna(subset=['cep_vendedor', 'data_entrega']).copy()
+
+
+# CARGA (Upsert por partição mensal)
+
+
+def _mes_compra(df):
+    return df['data_compra'].dt.strftime('%Y-%m').fillna('desconhecido')
+
+
+def gravar_analise(df_novo, destino=CAMINHO_DATASET_ANALISE, completo=False,
+                   lidos=None):
+    """
+    Grava (upsert) os pedidos processados no dataset Parquet mensal.
+
+    Apenas os meses presentes em `df_novo` (e em `lidos`) são relidos e
+    reescritos: as linhas antigas dos pedidos reprocessados são
+    substituídas. Um pedido relido que o tratamento passou a descartar
+    sai do seu mês, como sairia numa reconstrução completa.
+
+    Parameters
+    ----------
+    lidos : pd.DataFrame, optional
+        Pedidos relidos da fonte (ver `extrair_pedidos`)
+
+    Returns
+    -------
+    pd.DataFrame
+        Conteúdo completo dos meses afetados (já com os novos pedidos)
+    """
+    if completo and os.path.isdir(destino):
+        shutil.rmtree(destino)
+
+    df_novo = df_novo.copy()
+    df_novo[COLUNA_PARTICAO] = _mes_compra(df_novo)
+    meses = set(df_novo[COLUNA_PARTICAO])
+    substituidos = df_novo['pedido_id']
+    if lidos is not None and len(lidos):
+        meses |= set(_mes_compra(lidos))
+        substituidos = pd.concat([substituidos, lidos['order_id']])
+
+    if not completo and dataset_disponivel(destino):
+        anteriores = carregar_dataset_dashboard(
+            destino, colunas=list(df_novo.columns), meses=sorted(meses))
+        anteriores = anteriores[~anteriores['pedido_id'].isin(substituidos)]
+        df_novo = pd.concat([anteriores, df_novo], ignore_index=True)
+
+    if len(df_novo) or completo:
+        pq.write_to_dataset(
+            pa.Table.from_pandas(df_novo, preserve_index=False),
+            root_path=destino,
+            partition_cols=[COLUNA_PARTICAO],
+            existing_data_behavior='delete_matching'
+        )
+    # `delete_matching` só troca as partições gravadas
+    remover_particoes(destino, meses - set(df_novo[COLUNA_PARTICAO]))
+    return df_novo
+
+
+def exportar_csvs(origem=CAMINHO_DATASET_ANALISE,
+                  destino_dash=CAMINHO_CSV_DASHBOARD,
+                  destino_modelo=CAMINHO_CSV_MODELO):
+    """
+    Regrava os CSVs processados (notebooks e treino) a partir do dataset.
+
+    Lê um mês por vez, em ordem de compra: a memória fica limitada ao
+    maior mês, não ao histórico.
+    """
+    meses = sorted(pq.ParquetDataset(origem).partitioning.dictionaries[0]
+                   .to_pylist())
+    for destino in (destino_dash, destino_modelo):
+        if os.path.exists(destino):
+            os.remove(destino)
+
+    for i, mes in enumerate(meses):
+        df_mes = pd.read_parquet(
+            origem, filters=[(COLUNA_PARTICAO, '==', mes)]).drop(
+            columns=[COLUNA_PARTICAO])
+        df_mes = df_mes.sort_values('data_compra', kind='stable')
+        preparar_dashboard(df_mes).to_csv(
+            destino_dash, index=False, mode='a', header=i == 0)
+        preparar_modelo(df_mes).to_csv(
+            destino_modelo, index=False, mode='a', header=i == 0)
+
+
+# CARGA EM BLOCOS (Histórico maior que a memória)
+
+
+def _balde(ids, baldes):
+    """Balde de cada pedido: hash estável do `order_id` módulo `baldes`."""
+    return (pd.util.hash_pandas_object(ids, index=False).to_numpy()
+            % baldes).astype(np.int32)
+
+
+def _distribuir_em_baldes(pasta_origem, pasta_baldes, baldes, bytes_bloco):
+    """
+    1ª passada: lê pedidos e itens em lotes e grava cada lote, já tratado,
+    no balde do seu pedido. Pedido e itens caem sempre no mesmo balde.
+
+    Returns
+    -------
+    tuple
+        (pedidos lidos, maior data de compra, pedidos abertos)
+    """
+    total, marcas, abertos = 0, [], []
+    for nome, tratar in [('pedidos', tratar_pedidos),
+                         ('itens_pedido', tratar_itens)]:
+        destino = os.path.join(pasta_baldes, nome)
+        for lote in ler_csv_em_blocos(
+                os.path.join(pasta_origem, arquivos_olist[nome]),
+                tipos_csv[nome], bytes_bloco):
+            brutos, lote = lote, tratar(lote)
+            if nome == 'pedidos':
+                total += len(lote)
+                marcas.append(lote['order_purchase_timestamp'].max())
+                situacao = situacao_pedidos(brutos, lote)
+                abertos.append(situacao.loc[situacao['aberto'], 'order_id'])
+            lote['balde'] = _balde(lote['order_id'], baldes)
+            pq.write_to_dataset(pa.Table.from_pandas(lote, preserve_index=False),
+                                root_path=destino, partition_cols=['balde'])
+    return (total, pd.Series(marcas, dtype='datetime64[ns]').max(),
+            pd.concat(abertos, ignore_index=True) if abertos else [])
+
+
+def _ler_balde(pasta_baldes, nome, balde):
+    caminho = os.path.join(pasta_baldes, nome, f'balde={balde}')
+    if not os.path.isdir(caminho):
+        return None
+    return pd.read_parquet(caminho)
+
+
+def reconstruir_em_blocos(pasta_origem=PASTA_DATA, baldes=None,
+                          bytes_bloco=BYTES_BLOCO_CSV,
+                          caminho_estado=CAMINHO_ESTADO_ETL,
+                          destino_analise=CAMINHO_DATASET_ANALISE,
+                          destino_dashboard=CAMINHO_DATASET_DASHBOARD,
+                          destino_cubo=CAMINHO_CUBO_DASHBOARD,
+                          pasta_temporaria=None,
+                          caminho_abertos=CAMINHO_PEDIDOS_ABERTOS):
+    """
+    Carga completa fora da memória, para históricos maiores que a RAM.
+
+    Os CSVs de pedidos e itens são lidos em lotes e distribuídos em
+    `baldes` por hash do pedido (Parquet temporário em disco). Cada balde é
+    então juntado às dimensões (produtos, clientes e vendedores, que ficam
+    em memória), imputado, recebe as métricas de SLA e é acrescentado às
+    partições mensais do dataset processado e do Dashboard. O pico de
+    memória depende do lote e do tamanho do balde, não do histórico.
+
+    As medianas e o vocabulário do `Preprocessador` precisam do histórico
+    inteiro: a primeira passada pelos baldes só acumula contagens (somáveis
+    entre baldes) e grava a junção; a segunda imputa e grava.
+
+    Parameters
+    ----------
+    pasta_origem : str, optional
+        Pasta com os CSVs brutos da Olist (default 'data')
+    baldes : int, optional
+        Número de baldes (default: um a cada 256 MB de CSV de fatos)
+    bytes_bloco : int, optional
+        Bytes de CSV lidos por lote (default 64 MB)
+    pasta_temporaria : str, optional
+        Onde gravar os baldes (default: diretório temporário do sistema)
+
+    Returns
+    -------
+    dict
+        Mesmo resumo de `atualizar`, mais `baldes`
+    """
+    inicio = time.perf_counter()
+    estado = ler_estado(caminho_estado)
+    dimensoes = carregar_dimensoes(pasta_origem, estado)
+
+    if baldes is None:
+        tamanho = sum(os.path.getsize(os.path.join(pasta_origem,
+                                                   arquivos_olist[nome]))
+                      for nome in ['pedidos', 'itens_pedido'])
+        baldes = max(1, math.ceil(tamanho / BYTES_POR_BALDE))
+
+    for destino in (destino_analise, destino_dashboard):
+        if os.path.isdir(destino):
+            shutil.rmtree(destino)
+
+    preprocessador = Preprocessador()
+    linhas, meses, cubo = 0, set(), None
+    with tempfile.TemporaryDirectory(dir=pasta_temporaria) as pasta:
+        total, marca, abertos = _distribuir_em_baldes(
+            pasta_origem, pasta, baldes, bytes_bloco)
+
+        juntados = os.path.join(pasta, 'juntados')
+        os.makedirs(juntados)
+        itens_vazio = tratar_itens(
+            pd.DataFrame(columns=list(tipos_csv['itens_pedido'])))
+        for balde in range(baldes):
+            pedidos = _ler_balde(pasta, 'pedidos', balde)
+            if pedidos is None:
+                continue
+            itens = _ler_balde(pasta, 'itens_pedido', balde)
+            df_analise = juntar_tabelas(
+                pedidos, itens_vazio if itens is None else itens, dimensoes)
+            preprocessador.acumular(df_analise, preparar_modelo(df_analise[
+                ['categoria_produto', 'cep_vendedor', 'data_entrega']]))
+            df_analise.to_parquet(os.path.join(juntados, f'{balde}.parquet'),
+                                  index=False)
+        preprocessador.finalizar().salvar()
+
+        for arquivo in sorted(os.listdir(juntados)):
+            df_analise = calcular_metricas(preprocessador.imputar_dimensoes(
+                pd.read_parquet(os.path.join(juntados, arquivo))))
+            prefixo = f"balde{arquivo.split('.')[0]}"
+            df_analise[COLUNA_PARTICAO] = _mes_compra(df_analise)
+            pq.write_to_dataset(
+                pa.Table.from_pandas(df_analise, preserve_index=False),
+                root_path=destino_analise, partition_cols=[COLUNA_PARTICAO],
+                basename_template=f'{prefixo}-{{i}}.parquet')
+            meses.update(df_analise[COLUNA_PARTICAO].unique())
+            linhas += len(df_analise)
+
+            cubo_balde = anexar_dataset_dashboard(
+                preparar_dashboard(df_analise.drop(columns=[COLUNA_PARTICAO])),
+                destino_dashboard, prefixo)
+            cubo = cubo_balde if cubo is None else somar_cubos(
+                [cubo, cubo_balde])
+
+    if cubo is not None:
+        salvar_cubo(cubo, destino_cubo)
+
+    salvar_pedidos_abertos(abertos, caminho_abertos)
+    if pd.notna(marca):
+        estado['marca_dagua'] = marca.isoformat()
+    estado['ultima_execucao'] = pd.Timestamp.now().isoformat()
+    salvar_estado(estado, caminho_estado)
+
+    return {
+        'pedidos': total,
+        'linhas': linhas,
+        'meses': sorted(meses),
+        'marca_dagua': estado.get('marca_dagua'),
+        'segundos': time.perf_counter() - inicio,
+        'baldes': baldes
+    }
+
+
+# PIPELINE
+
+
+def atualizar(pasta_origem=PASTA_DATA, completo=False,
+              janela_dias=JANELA_REPROCESSAMENTO_DIAS,
+              caminho_estado=CAMINHO_ESTADO_ETL,
+              destino_analise=CAMINHO_DATASET_ANALISE,
+              destino_dashboard=CAMINHO_DATASET_DASHBOARD,
+              destino_cubo=CAMINHO_CUBO_DASHBOARD,
+              exportar_csv=False, em_blocos=False, baldes=None,
+              caminho_abertos=CAMINHO_PEDIDOS_ABERTOS):
+    """
+    Executa o ETL incremental da tabela logística.
+
+    Processa apenas os pedidos comprados a partir da marca d'água (menos a
+    janela de reprocessamento) e os pedidos que ainda estavam abertos na
+    execução anterior, qualquer que seja a data da compra: um pedido
+    em trânsito há meses ainda recebe a entrega ou o cancelamento. Junta-os
+    às dimensões em cache, aplica as mesmas imputações e métricas do
+    notebook de ETL e faz o upsert dos meses afetados no dataset
+    processado e no dataset do Dashboard (com atualização aditiva do cubo).
+
+    Parameters
+    ----------
+    pasta_origem : str, optional
+        Pasta com os CSVs brutos da Olist (default 'data')
+    completo : bool, optional
+        Ignora a marca d'água e reconstrói tudo, reajustando as medianas
+        de imputação e o vocabulário de categorias do modelo (default
+        False; forçado na primeira execução)
+    janela_dias : int, optional
+        Dias antes da marca d'água que são reprocessados, para pedidos que
+        chegam à fonte com atraso (default 30)
+    exportar_csv : bool, optional
+        Regrava também os CSVs processados do histórico (default False)
+    em_blocos : bool, optional
+        Faz a carga completa fora da memória (`reconstruir_em_blocos`),
+        para históricos maiores que a RAM (default False)
+    baldes : int, optional
+        Número de baldes da carga em blocos (default: pelo tamanho dos CSVs)
+
+    Returns
+    -------
+    dict
+        Resumo da execução (`pedidos`, `linhas`, `meses`, `marca_dagua`,
+        `segundos`)
+    """
+    inicio = time.perf_counter()
+    estado = ler_estado(caminho_estado)
+    completo = completo or 'marca_dagua' not in estado or \
+        not dataset_disponivel(destino_analise) or \
+        not os.path.exists(CAMINHO_MEDIANAS) or \
+        not os.path.exists(CAMINHO_VOCABULARIO) or \
+        not os.path.exists(caminho_abertos)
+
+    if completo and em_blocos:
+        resumo = reconstruir_em_blocos(
+            pasta_origem, baldes, caminho_estado=caminho_estado,
+            destino_analise=destino_analise,
+            destino_dashboard=destino_dashboard, destino_cubo=destino_cubo,
+            caminho_abertos=caminho_abertos)
+        if exportar_csv:
+            exportar_csvs(destino_analise)
+        return resumo
+
+    dimensoes = carregar_dimensoes(pasta_origem, estado)
+
+    desde = incluir = None
+    if not completo:
+        desde = pd.Timestamp(estado['marca_dagua']) - \
+            pd.Timedelta(days=janela_dias)
+        incluir = ler_pedidos_abertos(caminho_abertos)
+    pedidos, itens, lidos = extrair_pedidos(pasta_origem, desde, incluir)
+
+    df_analise = juntar_tabelas(pedidos, itens, dimensoes)
+
+    if completo:
+        # Vocabulário contado nas linhas da tabela de modelagem (treino)
+        linhas_modelo = preparar_modelo(df_analise[
+            ['categoria_produto', 'cep_vendedor', 'data_entrega']])
+        preprocessador = Preprocessador().ajustar(
+            df_analise, linhas_modelo).salvar()
+    else:
+        preprocessador = Preprocessador.carregar()
+    df_analise = calcular_metricas(
+        preprocessador.imputar_dimensoes(df_analise))
+
+    meses = pd.DataFrame()
+    if not lidos.empty or completo:
+        meses = gravar_analise(df_analise, destino_analise, completo, lidos)
+        salvar_dataset_dashboard(
+            preparar_dashboard(meses.drop(columns=[COLUNA_PARTICAO])),
+            destino_dashboard, incremental=not completo,
+            destino_cubo=destino_cubo,
+            meses=set(_mes_compra(lidos)) | set(meses[COLUNA_PARTICAO]))
+    # Os abertos de agora substituem os anteriores: quem não foi relido
+    # nesta execução já estava fechado
+    salvar_pedidos_abertos(lidos.loc[lidos['aberto'], 'order_id'],
+                           caminho_abertos)
+
+    marca = pedidos['order_purchase_timestamp'].max()
+    if pd.notna(marca):
+        anterior = estado.get('marca_dagua')
+        if anterior is None or marca > pd.Timestamp(anterior):
+            estado['marca_dagua'] = marca.isoformat()
+    estado['ultima_execucao'] = pd.Timestamp.now().isoformat()
+    salvar_estado(estado, caminho_estado)
+
+    if exportar_csv:
+        exportar_csvs(destino_analise)
+
+    return {
+        'pedidos': len(pedidos),
+        'linhas': len(df_analise),
+        'meses': sorted(meses[COLUNA_PARTICAO].unique()) if len(meses) else [],
+        'marca_dagua': estado.get('marca_dagua'),
+        'segundos': time.perf_counter() - inicio
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="ETL incremental: processa apenas os pedidos novos ou alterados.")
+    parser.add_argument("--origem", default=PASTA_DATA,
+                        help="Pasta com os CSVs brutos da Olist")
+    parser.add_argument("--completo", action="store_true",
+                        help="Reconstrói tudo, ignorando a marca d'água")
+    parser.add_argument("--janela-dias", type=int,
+                        default=JANELA_REPROCESSAMENTO_DIAS)
+    parser.add_argument("--csv", action="store_true",
+                        help="Regrava os CSVs processados do histórico")
+    parser.add_argument("--em-blocos", action="store_true",
+                        help="Carga completa fora da memória (histórico maior que a RAM)")
+    parser.add_argument("--baldes", type=int, default=None,
+                        help="Baldes da carga em blocos (default: pelo tamanho dos CSVs)")
+    args = parser.parse_args()
+
+    resumo = atualizar(args.origem, args.completo, args.janela_dias,
+                       exportar_csv=args.csv, em_blocos=args.em_blocos,
+                       baldes=args.baldes)
+    print(f"{resumo['pedidos']} pedidos ({resumo['linhas']} linhas) em "
+          f"{len(resumo['meses'])} meses, {resumo['segundos']:.2f}s. "
+          f"Marca d'água: {resumo['marca_dagua']}")
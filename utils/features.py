@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+
+
+# CONSTANTES
+
+feat_num = ['peso_cubado_kg', 'vol_cm3', 'peso_produto_g',
+            'tempo_aprovacao', 'prazo_prometido']
+feat_cat = ['uf_vendedor', 'uf_cliente', 'flag_pickup', 'categoria_produto']
+features_modelo = feat_num + feat_cat
+
+# Densidade de cubagem do frete (kg/m³), a mesma do notebook de modelagem
+FATOR_CUBAGEM = 300
+
+
+# DERIVAÇÃO DAS FEATURES
+
+
+def volume_cm3(comprimento, largura, altura):
+    """Volume do produto em cm³ (escalares, arrays ou Series)."""
+    return comprimento * largura * altura
+
+
+def peso_cubado_kg(vol_cm3):
+    """Peso cubado em kg a partir do volume em cm³."""
+    return vol_cm3 / 1_000_000 * FATOR_CUBAGEM
+
+
+def derivar_features(comprimento, largura, altura, peso, aprovacao, prazo,
+                     uf_vendedor, uf_cliente, pickup, categoria):
+    """
+    Monta as nove features do modelo para um único pedido.
+
+    É a mesma derivação usada pelo ETL (`etl.calcular_metricas`) ao gerar a
+    tabela de treino, então o simulador não pode divergir do modelo.
+
+    Parameters
+    ----------
+    comprimento, largura, altura : float
+        Dimensões do produto (cm)
+    peso : float
+        Peso do produto (g)
+    aprovacao, prazo : float
+        Tempo de aprovação e prazo prometido (dias)
+    uf_vendedor, uf_cliente : str
+        UFs de origem e destino
+    pickup : bool
+        Retirada em loja
+    categoria : str
+        Categoria técnica do produto (nome original da Olist)
+
+    Returns
+    -------
+    dict
+        Feature -> valor, na ordem de `features_modelo`
+    """
+    vol = volume_cm3(comprimento, largura, altura)
+    return {
+        'peso_cubado_kg': peso_cubado_kg(vol),
+        'vol_cm3': vol,
+        'peso_produto_g': peso,
+        'tempo_aprovacao': aprovacao,
+        'prazo_prometido': prazo,
+        'uf_vendedor': uf_vendedor,
+        'uf_cliente': uf_cliente,
+        'flag_pickup': 1 if pickup else 0,
+        'categoria_produto': categoria
+    }
+
+
+# CODIFICADOR COMPILADO
+
+
+def extrair_preprocessador(preprocessor):
+    """Colunas, vocabulários e parâmetros do scaler de um preprocessor treinado."""
+    transformadores = {nome: (trans, cols)
+                       for nome, trans, cols in preprocessor.transformers_}
+    scaler, feat_num = transformadores['num']
+    encoder, feat_cat = transformadores['cat']
+
+    if encoder.drop is not None or encoder.handle_unknown != 'ignore':
+        raise ValueError(
+            "OneHotEncoder suportado apenas com drop=None e handle_unknown='ignore'.")
+
+    n_num = len(feat_num)
+    media = scaler.mean_ if scaler.with_mean else np.zeros(n_num)
+    escala = scaler.scale_ if scaler.with_std else np.ones(n_num)
+
+    meta = {
+        'feat_num': list(feat_num),
+        'feat_cat': list(feat_cat),
+        'categorias': [np.asarray(cats).tolist() for cats in encoder.categories_]
+    }
+    return meta, np.asarray(media, np.float64), np.asarray(escala, np.float64)
+
+
+class CodificadorCompilado:
+    """
+    Réplica do ColumnTransformer (StandardScaler + OneHotEncoder) em arrays.
+
+    O scaler vira dois vetores (média e escala) e cada vocabulário do
+    OneHotEncoder vira um dict valor -> coluna de saída, já somado ao
+    deslocamento da sua coluna categórica. Codificar um pedido é uma
+    subtração, uma divisão e no máximo um acesso a dict por categórica,
+    sem montar DataFrame; categorias desconhecidas ficam zeradas, como no
+    `handle_unknown='ignore'`.
+
+    Parameters
+    ----------
+    feat_num, feat_cat : list of str
+        Colunas numéricas e categóricas, na ordem do preprocessor
+    categorias : list of list
+        Vocabulário de cada coluna categórica (`encoder.categories_`)
+    media, escala : np.ndarray
+        Parâmetros do StandardScaler
+    """
+
+    def __init__(self, feat_num, feat_cat, categorias, media, escala):
+        self.feat_num = list(feat_num)
+        self.feat_cat = list(feat_cat)
+        self.categorias = [pd.Index(cats) for cats in categorias]
+        self.media = np.asarray(media, dtype=np.float64)
+        self.escala = np.asarray(escala, dtype=np.float64)
+
+        tamanhos = [len(cats) for cats in self.categorias]
+        self.deslocamentos = len(self.feat_num) + np.concatenate(
+            [[0], np.cumsum(tamanhos)[:-1]]).astype(np.int64)
+        self.n_features = len(self.feat_num) + sum(tamanhos)
+
+        self._posicoes = []
+        self._posicao_nan = []
+        for cats, deslocamento in zip(self.categorias, self.deslocamentos):
+            ausentes = np.flatnonzero(pd.isna(cats))
+            self._posicoes.append({valor: int(deslocamento + i)
+                                   for i, valor in enumerate(cats)
+                                   if not pd.isna(valor)})
+            self._posicao_nan.append(
+                int(deslocamento + ausentes[0]) if len(ausentes) else None)
+
+    @classmethod
+    def de_preprocessador(cls, preprocessor):
+        """Compila um ColumnTransformer já treinado (passos 'num' e 'cat')."""
+        meta, media, escala = extrair_preprocessador(preprocessor)
+        return cls(meta['feat_num'], meta['feat_cat'], meta['categorias'],
+                   media, escala)
+
+    def codificar(self, registro):
+        """
+        Codifica um único pedido.
+
+        Parameters
+        ----------
+        registro : dict, np.void or pd.Series
+            Pedido com as features do modelo (um registro de array
+            estruturado NumPy também serve)
+
+        Returns
+        -------
+        np.ndarray
+            Vetor float64 de `n_features` posições
+        """
+        saida = np.zeros(self.n_features, dtype=np.float64)
+        n_num = len(self.feat_num)
+        saida[:n_num] = ([registro[col] for col in self.feat_num]
+                         - self.media) / self.escala
+
+        for col, posicoes, posicao_nan in zip(self.feat_cat, self._posicoes,
+                                              self._posicao_nan):
+            valor = registro[col]
+            posicao = posicao_nan if pd.isna(valor) else posicoes.get(valor)
+            if posicao is not None:
+                saida[posicao] = 1.0
+        return saida
+
+    def codificar_lote(self, X):
+        """
+        Codifica vários pedidos de uma vez.
+
+        Parameters
+        ----------
+        X : pd.DataFrame, np.ndarray estruturado or dict of arrays
+            Pedidos com as features do modelo
+
+        Returns
+        -------
+        np.ndarray
+            Matriz float64 (n, `n_features`)
+        """
+        num = np.column_stack([np.asarray(X[col], dtype=np.float64)
+                               for col in self.feat_num])
+        n = len(num)
+        saida = np.zeros((n, self.n_features), dtype=np.float64)
+        saida[:, :len(self.feat_num)] = (num - self.media) / self.escala
+
+        linhas = np.arange(n)
+        for col, cats, deslocamento in zip(self.feat_cat, self.categorias,
+                                           self.deslocamentos):
+            posicoes = cats.get_indexer(pd.Index(np.asarray(X[col])))
+            conhecidas = posicoes >= 0
+            saida[linhas[conhecidas], deslocamento + posicoes[conhecidas]] = 1.0
+        return saida
+
+
+def verificar_paridade_codificador(preprocessor, X, tolerancia=0.0):
+    """
+    Compara o codificador compilado com o `transform` do sklearn.
+
+    Confere o lote inteiro (`codificar_lote`) e cada linha isolada
+    (`codificar`, a partir de dicts), que é o caminho do simulador.
+
+    Returns
+    -------
+    float
+        Maior diferença absoluta observada
+
+    Raises
+    ------
+    AssertionError
+        Se alguma posição divergir além da tolerância
+    """
+    esperado = preprocessor.transform(X)
+    if hasattr(esperado, 'toarray'):
+        esperado = esperado.toarray()
+    esperado = np.asarray(esperado, dtype=np.float64)
+
+    codificador = CodificadorCompilado.de_preprocessador(preprocessor)
+    lote = codificador.codificar_lote(X)
+    linhas = np.vstack([codificador.codificar(registro)
+                        for registro in X.to_dict('records')]) \
+        if len(X) else lote
+    for obtido in (lote, linhas):
+        np.testing.assert_allclose(obtido, esperado, rtol=0, atol=tolerancia)
+    return float(np.nanmax(np.abs(linhas - esperado))) if len(X) else 0.0
@@ -0,0 +1,147 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# CONSTANTES
+
+dimensoes_filtro = ['status_simplificado', 'uf_cliente', 'categoria_label']
+
+ARQUIVO_INDICE = "indice.json"
+
+
+class IndiceFiltros:
+    """
+    Índice de filtros da sidebar, construído uma única vez no carregamento.
+
+    Para cada dimensão guarda os códigos inteiros das linhas e um bitmap
+    compactado (1 bit por linha) para cada valor. Uma combinação de
+    multiselects é resolvida com OR entre os valores de uma dimensão e
+    AND entre dimensões, sem copiar nem mascarar o DataFrame original.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Tabela do Dashboard
+    dimensoes : list, optional
+        Colunas indexadas (default `dimensoes_filtro`)
+    """
+
+    def __init__(self, df, dimensoes=dimensoes_filtro):
+        self.n_linhas = len(df)
+        self.dimensoes = list(dimensoes)
+        self.codigos = {}
+        self.valores = {}
+        self.bitmaps = {}
+
+        for dim in self.dimensoes:
+            categorias = pd.Categorical(df[dim])
+            codigos = categorias.codes
+            valores = list(categorias.categories)
+
+            self.codigos[dim] = codigos
+            self.valores[dim] = valores
+            tamanho_bitmap = (self.n_linhas + 7) // 8
+            if valores:
+                self.bitmaps[dim] = np.stack(
+                    [np.packbits(codigos == i) for i in range(len(valores))])
+            else:
+                self.bitmaps[dim] = np.zeros((0, tamanho_bitmap), np.uint8)
+        self._indexar_valores()
+
+    def _indexar_valores(self):
+        self._posicao_valor = {dim: {v: i for i, v in enumerate(valores)}
+                               for dim, valores in self.valores.items()}
+
+    def salvar(self, destino):
+        """Grava códigos e bitmaps em `.npy` (um par por dimensão)."""
+        os.makedirs(destino, exist_ok=True)
+        for posicao, dim in enumerate(self.dimensoes):
+            np.save(os.path.join(destino, f'codigos_{posicao}.npy'),
+                    np.asarray(self.codigos[dim]))
+            np.save(os.path.join(destino, f'bitmaps_{posicao}.npy'),
+                    self.bitmaps[dim])
+        with open(os.path.join(destino, ARQUIVO_INDICE), 'w',
+                  encoding='utf-8') as f:
+            json.dump({'n_linhas': self.n_linhas, 'dimensoes': self.dimensoes,
+                       'valores': [self.valores[dim] for dim in self.dimensoes]},
+                      f, ensure_ascii=False)
+        return destino
+
+    @classmethod
+    def abrir(cls, pasta):
+        """
+        Abre o índice gravado por `salvar` sem reconstruí-lo.
+
+        Códigos e bitmaps são memory-maps somente leitura: os workers que
+        abrem a mesma pasta compartilham as páginas em vez de manter, cada
+        um, uma cópia do tamanho da tabela.
+        """
+        with open(os.path.join(pasta, ARQUIVO_INDICE), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        indice = cls.__new__(cls)
+        indice.n_linhas = meta['n_linhas']
+        indice.dimensoes = meta['dimensoes']
+        indice.valores = dict(zip(indice.dimensoes, meta['valores']))
+        indice.codigos = {}
+        indice.bitmaps = {}
+        for posicao, dim in enumerate(indice.dimensoes):
+            for nome, destino in (('codigos', indice.codigos),
+                                  ('bitmaps', indice.bitmaps)):
+                destino[dim] = np.asarray(np.load(os.path.join(
+                    pasta, f'{nome}_{posicao}.npy'), mmap_mode='r'))
+        indice._indexar_valores()
+        return indice
+
+    def opcoes(self, dim):
+        """Valores distintos (ordenados) de uma dimensão, para o multiselect."""
+        return sorted(self.valores[dim])
+
+    def selecionar(self, **filtros):
+        """
+        Resolve os filtros em um bitmap compactado de linhas selecionadas.
+
+        Cada argumento nomeado é uma dimensão com a lista de valores
+        escolhidos; listas vazias (ou None) não restringem a seleção.
+
+        Returns
+        -------
+        np.ndarray or None
+            Bitmap `uint8` (1 bit por linha) ou None quando nenhum filtro
+            está ativo (todas as linhas)
+        """
+        selecao = None
+        for dim, escolhidos in filtros.items():
+            if not escolhidos:
+                continue
+            posicoes = [self._posicao_valor[dim][v] for v in escolhidos
+                        if v in self._posicao_valor[dim]]
+            if posicoes:
+                bitmap_dim = np.bitwise_or.reduce(
+                    self.bitmaps[dim][posicoes], axis=0)
+            else:
+                bitmap_dim = np.zeros(self.bitmaps[dim].shape[1], np.uint8)
+
+            selecao = bitmap_dim if selecao is None else selecao & bitmap_dim
+        return selecao
+
+    def contar(self, selecao):
+        """Quantidade de linhas de uma seleção (popcount do bitmap)."""
+        if selecao is None:
+            return self.n_linhas
+        return int(np.bitwise_count(selecao).sum())
+
+    def mascara(self, selecao):
+        """Máscara booleana (uma posição por linha) de uma seleção."""
+        if selecao is None:
+            return np.ones(self.n_linhas, dtype=bool)
+        return np.unpackbits(selecao, count=self.n_linhas).view(bool)
+
+    def posicoes(self, selecao):
+        """Posições (inteiras) das linhas selecionadas."""
+        if selecao is None:
+            return np.arange(self.n_linhas)
+        return np.flatnonzero(self.mascara(selecao))
@@ -0,0 +1,249 @@
+import json
+import os
+
+import numpy as np
+
+
+# CONSTANTES (Malha dos Estados)
+
+CAMINHO_GEOJSON = "data/brazil_states.geojson"
+CAMINHO_GEOMETRIA = "data/brazil_states_simplificado.npz"
+
+# Tolerância da simplificação, em graus (0.01° ~ 1,1 km)
+TOLERANCIA_PADRAO = 0.01
+
+# Casas decimais das coordenadas enviadas ao navegador
+CASAS_DECIMAIS = 4
+
+
+# SIMPLIFICAÇÃO (Douglas-Peucker com topologia preservada)
+
+
+def _douglas_peucker(pontos, tolerancia):
+    """Douglas-Peucker iterativo; mantém sempre o primeiro e o último ponto."""
+    n = len(pontos)
+    if n < 3:
+        return pontos
+    manter = np.zeros(n, dtype=bool)
+    manter[0] = manter[-1] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        i, j = pilha.pop()
+        if j <= i + 1:
+            continue
+        inicio, fim = pontos[i], pontos[j]
+        trecho = pontos[i + 1:j] - inicio
+        direcao = fim - inicio
+        comprimento = np.hypot(*direcao)
+        if comprimento == 0:
+            distancias = np.hypot(trecho[:, 0], trecho[:, 1])
+        else:
+            distancias = np.abs(direcao[0] * trecho[:, 1] -
+                                direcao[1] * trecho[:, 0]) / comprimento
+        k = int(np.argmax(distancias))
+        if distancias[k] > tolerancia:
+            meio = i + 1 + k
+            manter[meio] = True
+            pilha.append((i, meio))
+            pilha.append((meio, j))
+    return pontos[manter]
+
+
+def _aneis(geojson):
+    """Percorre os anéis de todas as feições: (feição, polígono, anel, pontos)."""
+    for f, feicao in enumerate(geojson['features']):
+        geometria = feicao['geometry']
+        poligonos = geometria['coordinates']
+        if geometria['type'] == 'Polygon':
+            poligonos = [poligonos]
+        for p, poligono in enumerate(poligonos):
+            for a, anel in enumerate(poligono):
+                yield f, p, a, [tuple(ponto) for ponto in anel]
+
+
+def simplificar_geojson(geojson, tolerancia=TOLERANCIA_PADRAO):
+    """
+    Simplifica os polígonos dos estados preservando a topologia.
+
+    Cada anel é quebrado em cadeias entre vértices de junção (onde muda
+    o conjunto de anéis que compartilham a aresta). Cada cadeia é
+    simplificada uma única vez, sempre no mesmo sentido, e o resultado é
+    reaproveitado por todos os anéis que a contêm: divisas entre estados
+    continuam coincidentes, sem frestas nem sobreposições.
+
+    Parameters
+    ----------
+    geojson : dict
+        FeatureCollection de (Multi)Polygons
+    tolerancia : float, optional
+        Desvio máximo admitido, em unidades das coordenadas (graus)
+
+    Returns
+    -------
+    dict
+        FeatureCollection com as mesmas propriedades e geometria
+        MultiPolygon simplificada
+    """
+    aneis = list(_aneis(geojson))
+
+    # Quais anéis usam cada aresta e cada vértice
+    aneis_aresta = {}
+    aneis_vertice = {}
+    for id_anel, (_, _, _, pontos) in enumerate(aneis):
+        for a, b in zip(pontos[:-1], pontos[1:]):
+            aneis_aresta.setdefault((min(a, b), max(a, b)), set()).add(id_anel)
+            aneis_vertice.setdefault(a, set()).add(id_anel)
+
+    cache_cadeias = {}
+
+    def simplificar_cadeia(cadeia):
+        invertida = cadeia[0] > cadeia[-1] or (
+            cadeia[0] == cadeia[-1] and len(cadeia) > 2 and
+            cadeia[1] > cadeia[-2])
+        chave = tuple(reversed(cadeia)) if invertida else tuple(cadeia)
+        if chave not in cache_cadeias:
+            cache_cadeias[chave] = _douglas_peucker(
+                np.array(chave, dtype=np.float64), tolerancia)
+        resultado = cache_cadeias[chave]
+        return resultado[::-1] if invertida else resultado
+
+    simplificados = []
+    for id_anel, (_, _, _, pontos) in enumerate(aneis):
+        pontos = pontos[:-1] if pontos[0] == pontos[-1] else pontos
+        n = len(pontos)
+        assinaturas = [frozenset(aneis_aresta[(min(a, b), max(a, b))])
+                       for a, b in zip(pontos, pontos[1:] + pontos[:1])]
+        juncoes = [i for i in range(n)
+                   if assinaturas[i - 1] != assinaturas[i] or
+                   len(aneis_vertice[pontos[i]]) != len(assinaturas[i])]
+
+        if not juncoes:
+            # Anel sem junções: começa no menor vértice (forma canônica)
+            inicio = pontos.index(min(pontos))
+            rotacionado = pontos[inicio:] + pontos[:inicio]
+            novo = simplificar_cadeia(rotacionado + rotacionado[:1])
+        else:
+            rotacionado = pontos[juncoes[0]:] + pontos[:juncoes[0]]
+            cortes = [j - juncoes[0] for j in juncoes] + [n]
+            partes = []
+            for ini, fim in zip(cortes[:-1], cortes[1:]):
+                cadeia = rotacionado[ini:fim + 1] if fim < n else \
+                    rotacionado[ini:] + rotacionado[:1]
+                partes.append(simplificar_cadeia(cadeia)[:-1])
+            novo = np.concatenate(partes + [partes[0][:1]])
+
+        # Anéis que degeneram (menos de 3 vértices distintos) são descartados
+        simplificados.append(novo if len(novo) >= 4 else None)
+
+    # Remonta as feições como MultiPolygon
+    estrutura = [[] for _ in geojson['features']]
+    for (f, p, a, _), novo in zip(aneis, simplificados):
+        poligonos = estrutura[f]
+        if a == 0:
+            poligonos.append([] if novo is not None else None)
+        if poligonos[-1] is not None and novo is not None:
+            poligonos[-1].append(novo.tolist())
+
+    features = []
+    for feicao, poligonos in zip(geojson['features'], estrutura):
+        features.append({
+            'type': 'Feature',
+            'properties': feicao['properties'],
+            'geometry': {
+                'type': 'MultiPolygon',
+                'coordinates': [p for p in poligonos if p]
+            }
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+# FORMATO BINÁRIO (arrays por sigla)
+
+
+def salvar_geometria(geojson, destino=CAMINHO_GEOMETRIA):
+    """
+    Grava a malha em `.npz`: coordenadas float32 e offsets de anéis,
+    polígonos e estados, indexados por `properties.sigla`.
+    """
+    siglas, nomes = [], []
+    coords, aneis, poligonos, estados = [], [0], [0], [0]
+    for feicao in geojson['features']:
+        siglas.append(feicao['properties']['sigla'])
+        nomes.append(feicao['properties'].get('name', ''))
+        for poligono in feicao['geometry']['coordinates']:
+            for anel in poligono:
+                coords.append(np.asarray(anel, dtype=np.float32))
+                aneis.append(aneis[-1] + len(anel))
+            poligonos.append(len(aneis) - 1)
+        estados.append(len(poligonos) - 1)
+
+    np.savez_compressed(
+        destino,
+        siglas=np.array(siglas),
+        nomes=np.array(nomes),
+        coords=np.concatenate(coords),
+        aneis=np.array(aneis, dtype=np.int32),
+        poligonos=np.array(poligonos, dtype=np.int32),
+        estados=np.array(estados, dtype=np.int32)
+    )
+    return destino
+
+
+def carregar_geometria(caminho=CAMINHO_GEOMETRIA, casas=CASAS_DECIMAIS):
+    """
+    Lê a malha compacta e devolve um FeatureCollection (id = sigla da UF).
+
+    As coordenadas são arredondadas em `casas` decimais para reduzir o
+    payload enviado ao navegador.
+    """
+    with np.load(caminho) as arquivo:
+        siglas = arquivo['siglas']
+        nomes = arquivo['nomes']
+        coords = arquivo['coords'].astype(np.float64).round(casas)
+        aneis = arquivo['aneis']
+        poligonos = arquivo['poligonos']
+        estados = arquivo['estados']
+
+    features = []
+    for e, sigla in enumerate(siglas):
+        multipoligono = []
+        for p in range(estados[e], estados[e + 1]):
+            multipoligono.append([
+                coords[aneis[a]:aneis[a + 1]].tolist()
+                for a in range(poligonos[p], poligonos[p + 1])
+            ])
+        features.append({
+            'type': 'Feature',
+            'id': str(sigla),
+            'properties': {'sigla': str(sigla), 'name': str(nomes[e])},
+            'geometry': {'type': 'MultiPolygon', 'coordinates': multipoligono}
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def construir_geometria(origem=CAMINHO_GEOJSON, destino=CAMINHO_GEOMETRIA,
+                        tolerancia=TOLERANCIA_PADRAO):
+    """Simplifica o GeoJSON dos estados e grava a malha compacta."""
+    with open(origem, "r", encoding="utf-8") as f:
+        geojson = json.load(f)
+    return salvar_geometria(simplificar_geojson(geojson, tolerancia), destino)
+
+
+def geometria_disponivel(caminho=CAMINHO_GEOMETRIA):
+    return os.path.exists(caminho)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Simplifica o GeoJSON dos estados (topologia preservada) "
+                    "e grava a malha compacta usada pelo mapa do Dashboard.")
+    parser.add_argument("--origem", default=CAMINHO_GEOJSON)
+    parser.add_argument("--destino", default=CAMINHO_GEOMETRIA)
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_PADRAO,
+                        help="Desvio máximo em graus (default 0.01 ~ 1,1 km)")
+    args = parser.parse_args()
+
+    caminho = construir_geometria(args.origem, args.destino, args.tolerancia)
+    print(f"Malha simplificada salva em: {caminho}")
@@ -0,0 +1,253 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# CONSTANTES (Logística Regional)
+
+CAMINHO_TABELA_ROTAS = "data/tabela_rotas.json"
+
+# Ordem canônica das 27 UFs (índices da tabela de rotas)
+UFS = ['AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG', 'MS',
+       'MT', 'PA', 'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR', 'RS', 'SC',
+       'SE', 'SP', 'TO']
+
+# Mapeamento de Macro-Regiões
+regioes_map = {
+    'AC': 'N', 'AL': 'NE', 'AP': 'N', 'AM': 'N', 'BA': 'NE',
+    'CE': 'NE', 'DF': 'CO', 'ES': 'SE', 'GO': 'CO', 'MA': 'NE',
+    'MT': 'CO', 'MS': 'CO', 'MG': 'SE', 'PA': 'N', 'PB': 'NE',
+    'PR': 'S', 'PE': 'NE', 'PI': 'NE', 'RJ': 'SE', 'RN': 'NE',
+    'RS': 'S', 'RO': 'N', 'RR': 'N', 'SC': 'S', 'SP': 'SE',
+    'SE': 'NE', 'TO': 'N'
+}
+
+# Códigos de tipo de rota (índice = código na tabela)
+TIPOS_ROTA = ["Local", "Regional", "Nacional (Difícil Acesso)", "Nacional"]
+ROTA_LOCAL, ROTA_REGIONAL, ROTA_NACIONAL_DIFICIL, ROTA_NACIONAL = range(4)
+
+# Tempo mínimo de transporte (SLA físico, em dias) por tipo de rota
+tempo_minimo_rota = {
+    ROTA_LOCAL: 1,
+    ROTA_REGIONAL: 4,
+    ROTA_NACIONAL_DIFICIL: 12,
+    ROTA_NACIONAL: 5
+}
+
+# UF fora da tabela: tratada como uma região à parte ('Outro')
+_IDX_DESCONHECIDA = len(UFS)
+
+
+# TABELA DE ROTAS (27 x 27)
+
+
+class TabelaRotas:
+    """
+    Tabela pré-computada UF x UF com o tempo mínimo de trânsito e o tipo
+    de rota, usada pelo guardrail regional.
+
+    Os arrays têm uma linha/coluna extra (índice 27) para UFs fora da
+    tabela, reproduzindo a regra original para regiões desconhecidas. Como
+    duas UFs desconhecidas caem no mesmo índice, a célula (27, 27) vale
+    para UFs diferentes; a mesma UF desconhecida na origem e no destino é
+    rota Local (`tempo_local`), resolvida a partir das UFs informadas
+    (ver `mesma_uf_desconhecida`).
+
+    Parameters
+    ----------
+    tempo_min : np.ndarray
+        Matriz (28, 28) de dias mínimos de transporte
+    tipo_rota : np.ndarray
+        Matriz (28, 28) com os códigos de `TIPOS_ROTA`
+    tempo_local : int, optional
+        Dias mínimos de uma rota Local entre UFs fora da tabela
+    """
+
+    def __init__(self, tempo_min, tipo_rota,
+                 tempo_local=tempo_minimo_rota[ROTA_LOCAL]):
+        self.tempo_min = np.asarray(tempo_min, dtype=np.int16)
+        self.tipo_rota = np.asarray(tipo_rota, dtype=np.int8)
+        self.tempo_local = int(tempo_local)
+        self._indice_uf = pd.Index(UFS)
+
+    @classmethod
+    def padrao(cls, regioes=regioes_map, tempos=tempo_minimo_rota):
+        """Constrói a tabela a partir das macro-regiões (regra original)."""
+        regiao = np.array([regioes.get(uf, 'Outro') for uf in UFS] + ['Outro'])
+        mesma_uf = np.eye(len(regiao), dtype=bool)
+        # Duas UFs desconhecidas diferentes caem em 'Regional' (mesma região
+        # 'Outro'); iguais são tratadas em `aplicar_guardrail_arrays`
+        mesma_uf[_IDX_DESCONHECIDA, _IDX_DESCONHECIDA] = False
+        mesma_regiao = regiao[:, None] == regiao[None, :]
+        envolve_norte = (regiao[:, None] == 'N') | (regiao[None, :] == 'N')
+
+        tipo_rota = np.select(
+            [mesma_uf, mesma_regiao, envolve_norte],
+            [ROTA_LOCAL, ROTA_REGIONAL, ROTA_NACIONAL_DIFICIL],
+            default=ROTA_NACIONAL
+        )
+        tempo_min = np.vectorize(tempos.get)(tipo_rota)
+        return cls(tempo_min, tipo_rota, tempos[ROTA_LOCAL])
+
+    @classmethod
+    def de_arquivo(cls, caminho):
+        """
+        Carrega a tabela de um arquivo JSON de configuração.
+
+        Formato aceito::
+
+            {
+              "tempo_minimo_rota": {"Local": 1, "Regional": 4, ...},
+              "regioes": {"AC": "N", ...},
+              "excecoes": [{"origem": "SP", "destino": "AM",
+                            "tempo_min": 15, "tipo_rota": "Nacional (Difícil Acesso)"}]
+            }
+
+        Todas as chaves são opcionais; o que não for informado usa a
+        regra padrão. `excecoes` sobrescreve pares UF x UF específicos.
+        """
+        with open(caminho, encoding='utf-8') as f:
+            config = json.load(f)
+
+        tempos = dict(tempo_minimo_rota)
+        for nome, dias in config.get('tempo_minimo_rota', {}).items():
+            tempos[TIPOS_ROTA.index(nome)] = int(dias)
+        regioes = {**regioes_map, **config.get('regioes', {})}
+
+        tabela = cls.padrao(regioes, tempos)
+        for excecao in config.get('excecoes', []):
+            i = UFS.index(excecao['origem'])
+            j = UFS.index(excecao['destino'])
+            if 'tipo_rota' in excecao:
+                tabela.tipo_rota[i, j] = TIPOS_ROTA.index(excecao['tipo_rota'])
+                tabela.tempo_min[i, j] = tempos[tabela.tipo_rota[i, j]]
+            if 'tempo_min' in excecao:
+                tabela.tempo_min[i, j] = int(excecao['tempo_min'])
+        return tabela
+
+    def indices(self, ufs):
+        """Converte UFs (escalar ou array) em índices da tabela."""
+        posicoes = self._indice_uf.get_indexer(np.atleast_1d(ufs))
+        posicoes[posicoes < 0] = _IDX_DESCONHECIDA
+        return posicoes
+
+
+TABELA_PADRAO = TabelaRotas.padrao()
+
+
+def carregar_tabela_rotas(caminho=CAMINHO_TABELA_ROTAS):
+    """Tabela configurada em arquivo, se existir; senão a regra padrão."""
+    if caminho and os.path.exists(caminho):
+        return TabelaRotas.de_arquivo(caminho)
+    return TABELA_PADRAO
+
+
+# FUNÇÕES
+
+
+def mesma_uf_desconhecida(origem, destino, idx_origem, idx_destino):
+    """
+    Pares com a mesma UF na origem e no destino, ambas fora da tabela.
+
+    Na regra original, `origem == destino` é rota Local para qualquer
+    texto de UF; na tabela, todas as UFs desconhecidas dividem o mesmo
+    índice e não se distinguem. Só compara os textos quando há pares
+    com as duas UFs desconhecidas.
+
+    Returns
+    -------
+    np.ndarray or None
+        Máscara booleana (no formato dos índices), ou None se não houver
+        nenhum par assim
+    """
+    desconhecidas = (np.asarray(idx_origem) == _IDX_DESCONHECIDA) & \
+        (np.asarray(idx_destino) == _IDX_DESCONHECIDA)
+    if not desconhecidas.any():
+        return None
+    mesma_uf = desconhecidas & np.atleast_1d(
+        np.asarray(origem, dtype=object) == np.asarray(destino, dtype=object))
+    return mesma_uf if mesma_uf.any() else None
+
+
+def aplicar_guardrail_arrays(dias_pred_modelo, idx_origem, idx_destino,
+                             aprovacao, prazo, tabela=TABELA_PADRAO,
+                             mesma_uf=None):
+    """
+    Núcleo vetorizado do guardrail, sobre índices de UF já resolvidos.
+
+    Parameters
+    ----------
+    mesma_uf : np.ndarray, optional
+        Pares com a mesma UF fora da tabela (`mesma_uf_desconhecida`),
+        tratados como rota Local
+
+    Returns
+    -------
+    tuple of np.ndarray
+        (dias_pred_final, tempo_transporte_min, codigo_rota)
+    """
+    tempo_transporte_min = tabela.tempo_min[idx_origem, idx_destino]
+    codigo_rota = tabela.tipo_rota[idx_origem, idx_destino]
+    if mesma_uf is not None:
+        tempo_transporte_min = np.where(
+            mesma_uf, tabela.tempo_local, tempo_transporte_min)
+        codigo_rota = np.where(mesma_uf, ROTA_LOCAL, codigo_rota)
+
+    # Cálculo do Tempo Total Mínimo Realista
+    atraso_fisico = np.asarray(aprovacao) + tempo_transporte_min - \
+        np.asarray(prazo)
+
+    # A "Previsão Final" é o maior valor entre o que o modelo achou e a física
+    dias_pred_final = np.maximum(dias_pred_modelo, atraso_fisico)
+    return dias_pred_final, tempo_transporte_min, codigo_rota
+
+
+def aplicar_guardrail(dias_pred_modelo, origem, destino, aprovacao, prazo,
+                      tabela=TABELA_PADRAO):
+    """
+    Aplica a regra logística regional (SLA físico) às previsões do modelo.
+
+    Todos os argumentos podem ser escalares ou arrays do mesmo tamanho; a
+    regra é resolvida por consulta à tabela UF x UF, sem laço em Python.
+
+    Parameters
+    ----------
+    dias_pred_modelo : array-like
+        Atraso previsto pelo modelo (dias)
+    origem, destino : array-like
+        UF do vendedor e do cliente
+    aprovacao : array-like
+        Tempo de aprovação (dias)
+    prazo : array-like
+        Prazo prometido (dias)
+    tabela : TabelaRotas, optional
+        Tabela de rotas (default: regra regional padrão)
+
+    Returns
+    -------
+    pd.DataFrame
+        Colunas `dias_pred_final` (maior valor entre modelo e física),
+        `tempo_transporte_min`, `tipo_rota` e `foi_ajustado`
+    """
+    dias_pred_modelo = np.atleast_1d(np.asarray(dias_pred_modelo, dtype=float))
+    idx_origem = tabela.indices(origem)
+    idx_destino = tabela.indices(destino)
+
+    dias_pred_final, tempo_transporte_min, codigo_rota = aplicar_guardrail_arrays(
+        dias_pred_modelo,
+        idx_origem,
+        idx_destino,
+        aprovacao,
+        prazo,
+        tabela,
+        mesma_uf_desconhecida(origem, destino, idx_origem, idx_destino)
+    )
+
+    return pd.DataFrame({
+        'dias_pred_final': dias_pred_final,
+        'tempo_transporte_min': tempo_transporte_min,
+        'tipo_rota': pd.Categorical.from_codes(codigo_rota, TIPOS_ROTA),
+        'foi_ajustado': dias_pred_final > dias_pred_modelo
+    })
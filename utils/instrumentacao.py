@@ -0,0 +1,231 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+
+# CONSTANTES
+
+ARQUIVO_METRICAS_JSON = "metricas_app.json"
+ARQUIVO_METRICAS_PROM = "metricas_app.prom"
+CAMINHO_METRICAS_JSON = os.path.join("data", ARQUIVO_METRICAS_JSON)
+CAMINHO_METRICAS_PROM = os.path.join("data", ARQUIVO_METRICAS_PROM)
+
+# Quantas medições recentes de cada etapa entram nos percentis
+JANELA_PADRAO = 500
+
+# Intervalo mínimo entre duas exportações automáticas (segundos)
+INTERVALO_EXPORTACAO = 10
+
+_TAMANHO_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes():
+    """Memória residente do processo (/proc/self/statm); None fora do Linux."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _TAMANHO_PAGINA
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# COLETOR DE TEMPOS
+
+
+class Instrumentacao:
+    """
+    Coletor leve de tempo de parede e variação de memória por etapa.
+
+    Cada etapa nomeada guarda as últimas `janela` medições num deque, e os
+    percentis (p50/p95) são calculados só na leitura. É seguro entre
+    threads: uma instância em `st.cache_resource` agrega todas as sessões
+    do Streamlit.
+
+    Parameters
+    ----------
+    janela : int, optional
+        Medições mantidas por etapa (default 500)
+
+    Examples
+    --------
+    >>> inst = Instrumentacao()
+    >>> with inst.etapa("filtros"):
+    ...     aplicar_filtros()
+    >>> @inst.medir("guardrail")
+    ... def aplicar(...): ...
+    """
+
+    def __init__(self, janela=JANELA_PADRAO):
+        self.janela = janela
+        self._medicoes = {}
+        self._totais = {}
+        self._trava = threading.Lock()
+        self._ultima_exportacao = 0.0
+
+    def registrar(self, nome, segundos, delta_bytes=None):
+        """Acrescenta uma medição (segundos, variação de RSS) à etapa."""
+        with self._trava:
+            if nome not in self._medicoes:
+                self._medicoes[nome] = deque(maxlen=self.janela)
+                self._totais[nome] = [0, 0.0]
+            self._medicoes[nome].append(
+                (segundos, np.nan if delta_bytes is None else delta_bytes))
+            self._totais[nome][0] += 1
+            self._totais[nome][1] += segundos
+
+    @contextmanager
+    def etapa(self, nome):
+        """Mede o bloco `with` (também quando ele levanta exceção)."""
+        memoria_antes = rss_bytes()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            memoria_depois = rss_bytes()
+            delta = None if memoria_antes is None or memoria_depois is None \
+                else memoria_depois - memoria_antes
+            self.registrar(nome, segundos, delta)
+
+    def medir(self, nome=None):
+        """Decorador: mede cada chamada da função (nome padrão = `__name__`)."""
+        def decorador(funcao):
+            rotulo = nome or funcao.__name__
+
+            @functools.wraps(funcao)
+            def envoltorio(*args, **kwargs):
+                with self.etapa(rotulo):
+                    return funcao(*args, **kwargs)
+            return envoltorio
+        return decorador
+
+    def resumo(self):
+        """
+        Percentis por etapa sobre a janela corrente.
+
+        Returns
+        -------
+        pd.DataFrame
+            Uma linha por etapa: chamadas (total acumulado), p50/p95/máximo
+            em ms e p50/p95 da variação de memória em MB, ordenadas pelo p95
+        """
+        with self._trava:
+            copia = {nome: np.array(medicoes, dtype=np.float64)
+                     for nome, medicoes in self._medicoes.items()}
+            totais = {nome: tuple(total) for nome, total in self._totais.items()}
+
+        linhas = []
+        for nome, valores in copia.items():
+            tempos_ms = valores[:, 0] * 1000
+            memoria_mb = valores[:, 1] / 1024 ** 2
+            tem_memoria = not np.isnan(memoria_mb).all()
+            linhas.append({
+                'etapa': nome,
+                'chamadas': totais[nome][0],
+                'segundos_total': totais[nome][1],
+                'p50_ms': np.percentile(tempos_ms, 50),
+                'p95_ms': np.percentile(tempos_ms, 95),
+                'max_ms': tempos_ms.max(),
+                'memoria_p50_mb': np.nanpercentile(memoria_mb, 50)
+                if tem_memoria else np.nan,
+                'memoria_p95_mb': np.nanpercentile(memoria_mb, 95)
+                if tem_memoria else np.nan
+            })
+        colunas = ['etapa', 'chamadas', 'segundos_total', 'p50_ms', 'p95_ms',
+                   'max_ms', 'memoria_p50_mb', 'memoria_p95_mb']
+        return pd.DataFrame(linhas, columns=colunas).sort_values(
+            'p95_ms', ascending=False, ignore_index=True)
+
+    def limpar(self):
+        with self._trava:
+            self._medicoes.clear()
+            self._totais.clear()
+
+    # EXPORTAÇÃO
+
+    def exportar_json(self, caminho=CAMINHO_METRICAS_JSON):
+        resumo = self.resumo()
+        conteudo = {
+            'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'janela': self.janela,
+            'rss_mb': (rss_bytes() or 0) / 1024 ** 2,
+            'etapas': resumo.replace({np.nan: None}).to_dict('records')
+        }
+        _gravar_atomico(caminho, json.dumps(
+            conteudo, ensure_ascii=False, indent=2, default=float))
+        return caminho
+
+    def exportar_prometheus(self, caminho=CAMINHO_METRICAS_PROM):
+        """
+        Formato texto do Prometheus (coletor `textfile` do node_exporter):
+        um summary de segundos por etapa e um gauge do p95 de memória.
+        """
+        resumo = self.resumo()
+        linhas = [
+            '# HELP olist_app_etapa_segundos Tempo de parede por etapa do App.',
+            '# TYPE olist_app_etapa_segundos summary'
+        ]
+        for linha in resumo.itertuples(index=False):
+            rotulo = _rotulo_prometheus(linha.etapa)
+            linhas += [
+                f'olist_app_etapa_segundos{{etapa="{rotulo}",quantile="0.5"}} '
+                f'{linha.p50_ms / 1000:.6f}',
+                f'olist_app_etapa_segundos{{etapa="{rotulo}",quantile="0.95"}} '
+                f'{linha.p95_ms / 1000:.6f}',
+                f'olist_app_etapa_segundos_sum{{etapa="{rotulo}"}} '
+                f'{linha.segundos_total:.6f}',
+                f'olist_app_etapa_segundos_count{{etapa="{rotulo}"}} '
+                f'{linha.chamadas}'
+            ]
+        linhas += [
+            '# HELP olist_app_etapa_memoria_p95_bytes Variação de RSS (p95) por etapa.',
+            '# TYPE olist_app_etapa_memoria_p95_bytes gauge'
+        ]
+        for linha in resumo.dropna(subset=['memoria_p95_mb']).itertuples(index=False):
+            linhas.append(
+                f'olist_app_etapa_memoria_p95_bytes{{etapa="{_rotulo_prometheus(linha.etapa)}"}} '
+                f'{linha.memoria_p95_mb * 1024 ** 2:.0f}')
+        _gravar_atomico(caminho, '\n'.join(linhas) + '\n')
+        return caminho
+
+    def exportar(self, caminho_json=CAMINHO_METRICAS_JSON,
+                 caminho_prom=CAMINHO_METRICAS_PROM,
+                 intervalo=INTERVALO_EXPORTACAO):
+        """
+        Grava JSON e Prometheus, no máximo uma vez a cada `intervalo`
+        segundos (chamado ao fim de cada rerun). Devolve True se gravou.
+        """
+        agora = time.monotonic()
+        with self._trava:
+            if agora - self._ultima_exportacao < intervalo:
+                return False
+            self._ultima_exportacao = agora
+        self.exportar_json(caminho_json)
+        self.exportar_prometheus(caminho_prom)
+        return True
+
+
+def _rotulo_prometheus(nome):
+    return nome.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _gravar_atomico(caminho, texto):
+    """
+    Grava via arquivo temporário + rename (o coletor nunca lê pela metade).
+
+    O temporário leva o pid: workers do App que exportam para a mesma
+    pasta não escrevem no mesmo arquivo temporário.
+    """
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(temporario, caminho)
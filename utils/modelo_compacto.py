@@ -0,0 +1,324 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from utils.features import (CodificadorCompilado, extrair_preprocessador,
+                            verificar_paridade_codificador)
+
+
+# CONSTANTES
+
+CAMINHO_MODELO_PKL = "models/modelo_previsao_atraso_olist.pkl"
+CAMINHO_MODELO_COMPACTO = "models/modelo_compacto"
+
+# Arrays da floresta (um arquivo .npy por array, todos memory-mappable)
+arrays_floresta = ['raizes', 'direita', 'feature', 'limiar', 'valor',
+                   'nan_esquerda']
+
+
+# EXPORTAÇÃO (Pipeline sklearn -> Arrays)
+
+
+def _limiar_float32(limiar):
+    """
+    Converte limiares float64 para float32 sem alterar nenhuma decisão.
+
+    O sklearn compara `X` em float32 com o limiar em float64. Para um `x`
+    float32, `x <= t` equivale a `x <= t32`, onde `t32` é o maior float32
+    menor ou igual a `t`; por isso arredondamos sempre para baixo.
+    """
+    limiar32 = limiar.astype(np.float32)
+    acima = limiar32.astype(np.float64) > limiar
+    limiar32[acima] = np.nextafter(limiar32[acima], np.float32(-np.inf))
+    return limiar32
+
+
+def _achatar_floresta(modelo):
+    """Concatena os nós de todas as árvores em arrays planos globais."""
+    if not hasattr(modelo, 'estimators_'):
+        raise TypeError(
+            f"Exportação compacta suporta apenas florestas sklearn, não {type(modelo).__name__}.")
+
+    raizes, esquerdas, direitas, features, limiares, valores = [], [], [], [], [], []
+    nan_esquerdas = []
+    deslocamento = 0
+    for estimador in modelo.estimators_:
+        arvore = estimador.tree_
+        n_nos = arvore.node_count
+        ids = np.arange(n_nos)
+        folha = arvore.children_left == -1
+
+        esquerda = np.where(folha, ids, arvore.children_left) + deslocamento
+        direita = np.where(folha, ids, arvore.children_right) + deslocamento
+        # Folhas: limiar -inf faz a travessia "seguir à direita" para si mesma
+        limiar = np.where(folha, -np.inf, arvore.threshold)
+
+        raizes.append(deslocamento)
+        esquerdas.append(esquerda)
+        direitas.append(direita)
+        features.append(np.where(folha, 0, arvore.feature))
+        limiares.append(limiar)
+        valores.append(arvore.value[:, 0, 0])
+        # Destino de valores ausentes (NaN) em cada nó de decisão
+        nan_esquerdas.append(getattr(arvore, 'missing_go_to_left',
+                                     np.zeros(n_nos, np.uint8)) & ~folha)
+        deslocamento += n_nos
+
+    n_features = modelo.n_features_in_
+    tipo_feature = np.uint8 if n_features <= np.iinfo(np.uint8).max else np.int32
+
+    arrays = {
+        'raizes': np.asarray(raizes, dtype=np.int32),
+        'direita': np.concatenate(direitas).astype(np.int32),
+        'feature': np.concatenate(features).astype(tipo_feature),
+        'limiar': _limiar_float32(np.concatenate(limiares)),
+        'valor': np.concatenate(valores).astype(np.float64),
+        'nan_esquerda': np.concatenate(nan_esquerdas).astype(bool)
+    }
+
+    # O construtor depth-first do sklearn numera o filho esquerdo como nó + 1;
+    # nesse caso não precisamos gravar o array de filhos à esquerda.
+    esquerda = np.concatenate(esquerdas)
+    internos = arrays['limiar'] != -np.inf
+    if not np.array_equal(esquerda[internos], np.flatnonzero(internos) + 1):
+        arrays['esquerda'] = esquerda.astype(np.int32)
+
+    profundidade = max(e.tree_.max_depth for e in modelo.estimators_)
+    return arrays, profundidade
+
+
+def exportavel(pipeline):
+    """Se o Pipeline tem uma floresta sklearn (o único formato exportável)."""
+    return hasattr(pipeline.named_steps['model'], 'estimators_')
+
+
+def exportar_modelo_compacto(pipeline, destino=CAMINHO_MODELO_COMPACTO,
+                             X_validacao=None):
+    """
+    Exporta o Pipeline (preprocessor + floresta) em formato compacto.
+
+    Grava um diretório com `meta.json` (features, vocabulários do
+    OneHotEncoder) e arrays `.npy` (StandardScaler e nós da floresta),
+    que o `ModeloCompacto` carrega via memory-map.
+
+    Parameters
+    ----------
+    pipeline : sklearn.pipeline.Pipeline
+        Pipeline com os passos 'preprocessor' e 'model' (RandomForest)
+    destino : str, optional
+        Diretório de saída (default 'models/modelo_compacto')
+    X_validacao : pd.DataFrame, optional
+        Amostra de holdout; se informada, a paridade da codificação e das
+        previsões com o Pipeline original é verificada após a exportação
+
+    Returns
+    -------
+    str
+        Caminho do diretório exportado
+    """
+    meta, media, escala = extrair_preprocessador(
+        pipeline.named_steps['preprocessor'])
+    arrays, profundidade = _achatar_floresta(pipeline.named_steps['model'])
+
+    os.makedirs(destino, exist_ok=True)
+    np.save(os.path.join(destino, 'scaler_media.npy'), media)
+    np.save(os.path.join(destino, 'scaler_escala.npy'), escala)
+    for nome, array in arrays.items():
+        np.save(os.path.join(destino, f'{nome}.npy'), array)
+
+    meta['n_arvores'] = int(len(arrays['raizes']))
+    meta['profundidade_max'] = int(profundidade)
+    with open(os.path.join(destino, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    if X_validacao is not None:
+        verificar_paridade_codificador(
+            pipeline.named_steps['preprocessor'], X_validacao)
+        verificar_paridade(pipeline, ModeloCompacto(destino), X_validacao)
+    return destino
+
+
+# CARREGAMENTO E PREVISÃO
+
+
+class ModeloCompacto:
+    """
+    Modelo de atraso em formato compacto, com a mesma interface `predict`.
+
+    Os arrays são mapeados em memória já no carregamento: o mapeamento
+    não lê os arquivos, então continua praticamente instantâneo, e apenas
+    as páginas dos nós efetivamente visitados passam a ocupar memória
+    residente. Mapear tudo de uma vez também mantém o modelo utilizável
+    se a versão publicada for apagada depois (ver `utils.publicacao`).
+    """
+
+    def __init__(self, caminho=CAMINHO_MODELO_COMPACTO, tamanho_bloco=10_000):
+        self.caminho = caminho
+        self.tamanho_bloco = tamanho_bloco
+        with open(os.path.join(caminho, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+
+        self.feat_num = self.meta['feat_num']
+        self.feat_cat = self.meta['feat_cat']
+        self.categorias = [pd.Index(cats) for cats in self.meta['categorias']]
+        self.profundidade_max = self.meta['profundidade_max']
+        self._codificador = None
+
+        nomes = arrays_floresta + ['scaler_media', 'scaler_escala']
+        if os.path.exists(os.path.join(caminho, 'esquerda.npy')):
+            nomes.append('esquerda')
+        # np.asarray mantém o buffer mapeado, sem o overhead de np.memmap
+        self.arrays = {
+            nome: np.asarray(np.load(
+                os.path.join(caminho, f'{nome}.npy'), mmap_mode='r'))
+            for nome in nomes
+        }
+
+    @property
+    def n_features(self):
+        return len(self.feat_num) + sum(len(cats) for cats in self.categorias)
+
+    @property
+    def codificador(self):
+        if self._codificador is None:
+            self._codificador = CodificadorCompilado(
+                self.feat_num, self.feat_cat, self.meta['categorias'],
+                self.arrays['scaler_media'], self.arrays['scaler_escala'])
+        return self._codificador
+
+    def transformar(self, X):
+        """Replica o ColumnTransformer (StandardScaler + OneHotEncoder)."""
+        return self.codificador.codificar_lote(X)
+
+    def _percorrer(self, X):
+        """
+        Percorre todas as árvores em paralelo (vetorizado por nível).
+
+        Cada par (árvore, linha) avança um nível por iteração; os pares que
+        chegam a uma folha saem do conjunto ativo, então o custo total é a
+        soma das profundidades percorridas e não `profundidade_max`.
+        """
+        a = self.arrays
+        # Mesma precisão do sklearn: features em float32 comparadas ao limiar
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        tem_nan = bool(np.isnan(X).any())
+        n, n_features = X.shape
+        n_arvores = len(a['raizes'])
+        X_plano = X.ravel()
+
+        # Pares (árvore, linha) em ordem árvore-major
+        nos = np.repeat(a['raizes'].astype(np.int64), n)
+        inicio_linha = np.tile(np.arange(n) * n_features, n_arvores)
+        ativos = np.arange(n_arvores * n)
+        folhas = np.empty_like(nos)
+
+        for _ in range(self.profundidade_max + 1):
+            limiar = a['limiar'][nos]
+            # Folhas têm limiar -inf: o par sai do conjunto ativo
+            chegou = limiar == -np.inf
+            if chegou.any():
+                folhas[ativos[chegou]] = nos[chegou]
+                continua = ~chegou
+                ativos, nos = ativos[continua], nos[continua]
+                inicio_linha, limiar = inicio_linha[continua], limiar[continua]
+                if len(ativos) == 0:
+                    break
+
+            valores = X_plano[inicio_linha + a['feature'][nos]]
+            vai_esquerda = valores <= limiar
+            if tem_nan:
+                vai_esquerda |= np.isnan(valores) & a['nan_esquerda'][nos]
+            esquerda = a['esquerda'][nos] if 'esquerda' in a else nos + 1
+            nos = np.where(vai_esquerda, esquerda, a['direita'][nos])
+
+        valores_folha = a['valor'][folhas].reshape(n_arvores, n)
+        return valores_folha.sum(axis=0) / n_arvores
+
+    def predict(self, X):
+        Xt = self.transformar(X)
+        blocos = [self._percorrer(Xt[i:i + self.tamanho_bloco])
+                  for i in range(0, len(Xt), self.tamanho_bloco)]
+        return np.concatenate(blocos) if blocos else np.zeros(0)
+
+    def prever_registro(self, registro):
+        """Previsão de um único pedido (dict ou registro NumPy), sem DataFrame."""
+        return float(self._percorrer(self.codificador.codificar(registro)[None, :])[0])
+
+
+def carregar_modelo(caminho_compacto=CAMINHO_MODELO_COMPACTO,
+                    caminho_pkl=CAMINHO_MODELO_PKL):
+    """
+    Carrega o modelo de atraso, priorizando o formato compacto.
+
+    Returns
+    -------
+    ModeloCompacto, sklearn.pipeline.Pipeline or None
+        None quando nenhum dos artefatos existe
+    """
+    if os.path.exists(os.path.join(caminho_compacto, 'meta.json')):
+        return ModeloCompacto(caminho_compacto)
+    if os.path.exists(caminho_pkl):
+        return joblib.load(caminho_pkl)
+    return None
+
+
+def prever_registro(modelo, registro):
+    """
+    Previsão de um único pedido com qualquer modelo de `carregar_modelo`.
+
+    O formato compacto codifica o dict direto nos arrays; o Pipeline sklearn
+    recebe um DataFrame de uma linha.
+    """
+    if hasattr(modelo, 'prever_registro'):
+        return modelo.prever_registro(registro)
+    return float(modelo.predict(pd.DataFrame([registro]))[0])
+
+
+def verificar_paridade(pipeline, modelo_compacto, X, tolerancia=1e-9):
+    """
+    Compara as previsões do Pipeline sklearn com as do modelo compacto.
+
+    A única diferença admitida é de arredondamento na média das árvores
+    (o sklearn soma as árvores em ordem de término das threads).
+
+    Returns
+    -------
+    float
+        Maior diferença absoluta observada
+
+    Raises
+    ------
+    AssertionError
+        Se alguma previsão divergir além da tolerância
+    """
+    esperado = pipeline.predict(X)
+    obtido = modelo_compacto.predict(X)
+    np.testing.assert_allclose(obtido, esperado, rtol=0, atol=tolerancia)
+    return float(np.max(np.abs(obtido - esperado))) if len(X) else 0.0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Exporta o modelo .pkl para o formato compacto (arrays .npy).")
+    parser.add_argument("--origem", default=CAMINHO_MODELO_PKL)
+    parser.add_argument("--destino", default=CAMINHO_MODELO_COMPACTO)
+    parser.add_argument("--validacao", default="data/data_model_processed.csv",
+                        help="CSV de holdout usado na verificação de paridade")
+    parser.add_argument("--amostra", type=int, default=5_000)
+    args = parser.parse_args()
+
+    pipeline = joblib.load(args.origem)
+    X_validacao = None
+    if os.path.exists(args.validacao):
+        X_validacao = pd.read_csv(args.validacao).sample(
+            frac=1.0, random_state=42).head(args.amostra)
+
+    exportar_modelo_compacto(pipeline, args.destino, X_validacao)
+    tamanho = sum(os.path.getsize(os.path.join(args.destino, f))
+                  for f in os.listdir(args.destino))
+    print(f"Modelo compacto salvo em: {args.destino} ({tamanho / 1024**2:.1f} MB)")
@@ -0,0 +1,264 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.utils import map_cat_correcao, remapear_categorias
+
+
+# CONSTANTES
+
+CAMINHO_MEDIANAS = "data/dimensoes/medianas.parquet"
+CAMINHO_VOCABULARIO = "data/dimensoes/vocabulario_categorias.json"
+
+cols_dimensao_produto = ['comprimento_produto_cm', 'altura_produto_cm',
+                         'largura_produto_cm', 'peso_produto_g']
+
+# Categorias com menos pedidos que isso viram 'outros' (como no notebook)
+LIMITE_CORTE_CATEGORIA = 500
+
+CATEGORIA_DESCONHECIDA = 'desconhecido'
+CATEGORIA_RARA = 'outros'
+
+# Linha da tabela de medianas com a mediana geral (fallback)
+LINHA_GERAL = '__geral__'
+
+
+# PRÉ-PROCESSADOR AJUSTADO
+
+
+class Preprocessador:
+    """
+    Estado ajustado da preparação dos dados: medianas e vocabulário.
+
+    Guarda a tabela de medianas das dimensões do produto por categoria
+    (imputação do ETL) e o vocabulário de categorias mantidas pelo modelo
+    (as demais viram 'outros'). É ajustado uma vez, na carga completa do
+    ETL, e reutilizado nas cargas incrementais, no treino, no Simulador e
+    no scoring em lote. Tudo roda sobre códigos de categoria: os
+    mapeamentos em Python tocam cada categoria distinta uma vez, nunca
+    cada linha.
+
+    Parameters
+    ----------
+    limite_corte : int, optional
+        Pedidos mínimos para uma categoria entrar no vocabulário
+        (default 500)
+    """
+
+    def __init__(self, limite_corte=LIMITE_CORTE_CATEGORIA):
+        self.limite_corte = limite_corte
+        self.medianas = None
+        self.categorias_mantidas = None
+        # Contagens somadas bloco a bloco (ver `acumular`)
+        self._contagens = {}
+        self._contagem_categorias = None
+        self._categorias_vistas = set()
+
+    # AJUSTE
+
+    def ajustar_medianas(self, df_analise):
+        """Medianas das dimensões por categoria (e a geral, em '__geral__')."""
+        codigos, categorias = pd.factorize(
+            df_analise['categoria_produto'].fillna(CATEGORIA_DESCONHECIDA),
+            sort=True)
+        medianas = df_analise[cols_dimensao_produto].groupby(codigos).median()
+        medianas.index = categorias[medianas.index]
+        medianas.loc[LINHA_GERAL] = df_analise[cols_dimensao_produto].median()
+        medianas.index.name = 'categoria_produto'
+        self.medianas = medianas
+        return self
+
+    def ajustar_vocabulario(self, categorias):
+        """
+        Categorias (já corrigidas) com ao menos `limite_corte` linhas.
+
+        Parameters
+        ----------
+        categorias : pd.Series
+            `categoria_produto` da tabela de modelagem
+        """
+        return self._vocabulario_de_contagem(contar_categorias(categorias))
+
+    def _vocabulario_de_contagem(self, contagem):
+        self.categorias_mantidas = sorted(
+            contagem.index[contagem >= self.limite_corte])
+        return self
+
+    def ajustar(self, df_analise, df_modelo=None):
+        """
+        Ajusta medianas (sobre `df_analise`) e vocabulário (sobre `df_modelo`).
+
+        O vocabulário é contado na tabela de modelagem, a mesma que o treino
+        lê; sem `df_modelo`, usa `df_analise`.
+        """
+        self.ajustar_medianas(df_analise)
+        modelo = df_analise if df_modelo is None else df_modelo
+        return self.ajustar_vocabulario(
+            modelo['categoria_produto'].fillna(CATEGORIA_DESCONHECIDA))
+
+    def acumular(self, df_analise, df_modelo=None):
+        """
+        Soma as contagens de um bloco da tabela (ajuste fora da memória).
+
+        Em vez dos valores, guarda quantas linhas têm cada valor de cada
+        dimensão por categoria; o tamanho depende dos valores distintos, não
+        do número de linhas. `finalizar` calcula as mesmas medianas e o
+        mesmo vocabulário de `ajustar` sobre a tabela inteira.
+        """
+        self._categorias_vistas.update(
+            df_analise['categoria_produto'].fillna(CATEGORIA_DESCONHECIDA)
+            .unique())
+        for col, contagem in contar_dimensoes(df_analise).items():
+            anterior = self._contagens.get(col)
+            self._contagens[col] = contagem if anterior is None else \
+                anterior.add(contagem, fill_value=0)
+
+        modelo = df_analise if df_modelo is None else df_modelo
+        contagem = contar_categorias(
+            modelo['categoria_produto'].fillna(CATEGORIA_DESCONHECIDA))
+        self._contagem_categorias = contagem \
+            if self._contagem_categorias is None else \
+            self._contagem_categorias.add(contagem, fill_value=0)
+        return self
+
+    def finalizar(self):
+        """Medianas e vocabulário a partir das contagens de `acumular`."""
+        # Categorias sem nenhuma dimensão preenchida ficam com NaN (como no
+        # groupby): a imputação cai na mediana geral
+        medianas = pd.DataFrame({col: _mediana_contagens(self._contagens[col])
+                                 for col in cols_dimensao_produto}).reindex(
+            sorted(self._categorias_vistas))
+        medianas.loc[LINHA_GERAL] = [
+            _mediana_contagens(pd.concat(
+                {LINHA_GERAL: self._contagens[col].groupby(level=1).sum()}
+            )).iloc[0] for col in cols_dimensao_produto]
+        medianas.index.name = 'categoria_produto'
+        self.medianas = medianas
+        self._vocabulario_de_contagem(self._contagem_categorias)
+        self._contagens, self._contagem_categorias = {}, None
+        self._categorias_vistas = set()
+        return self
+
+    # TRANSFORMAÇÃO
+
+    def imputar_dimensoes(self, df_analise):
+        """Imputa as dimensões faltantes com as medianas da categoria (ou gerais)."""
+        df_analise['categoria_produto'] = df_analise[
+            'categoria_produto'].fillna(CATEGORIA_DESCONHECIDA)
+        # Uma busca na tabela por categoria distinta; as linhas usam os códigos
+        codigos, categorias = pd.factorize(df_analise['categoria_produto'])
+        tabela = self.medianas.reindex(categorias)[cols_dimensao_produto]
+        tabela = tabela.fillna(self.medianas.loc[LINHA_GERAL]).to_numpy()
+        for i, col in enumerate(cols_dimensao_produto):
+            df_analise[col] = df_analise[col].fillna(
+                pd.Series(tabela[codigos, i], index=df_analise.index))
+        return df_analise
+
+    def agrupar_raras(self, serie):
+        """
+        Corrige as categorias e agrupa as fora do vocabulário em 'outros'.
+
+        Sem vocabulário ajustado, aplica só a correção de nomes.
+
+        Returns
+        -------
+        pd.Series
+            Coluna `category` com o mesmo índice
+        """
+        if self.categorias_mantidas is None:
+            return corrigir_categorias(serie)
+        mantidas = set(self.categorias_mantidas)
+        return remapear_categorias(
+            serie, lambda cat: _agrupar(map_cat_correcao.get(cat, cat), mantidas))
+
+    def categoria_modelo(self, categoria):
+        """Categoria que o modelo recebe para um único pedido (Simulador)."""
+        if pd.isna(categoria):
+            return categoria
+        categoria = map_cat_correcao.get(categoria, categoria)
+        if self.categorias_mantidas is None:
+            return categoria
+        return _agrupar(categoria, self.categorias_mantidas)
+
+    # PERSISTÊNCIA
+
+    def salvar(self, caminho_medianas=CAMINHO_MEDIANAS,
+               caminho_vocabulario=CAMINHO_VOCABULARIO):
+        if self.medianas is not None:
+            os.makedirs(os.path.dirname(caminho_medianas) or '.', exist_ok=True)
+            self.medianas.to_parquet(caminho_medianas)
+        if self.categorias_mantidas is not None:
+            os.makedirs(os.path.dirname(caminho_vocabulario) or '.',
+                        exist_ok=True)
+            with open(caminho_vocabulario, 'w', encoding='utf-8') as f:
+                json.dump({'limite_corte': self.limite_corte,
+                           'categorias_mantidas': self.categorias_mantidas},
+                          f, ensure_ascii=False, indent=2)
+        return self
+
+    @classmethod
+    def carregar(cls, caminho_medianas=CAMINHO_MEDIANAS,
+                 caminho_vocabulario=CAMINHO_VOCABULARIO):
+        """
+        Lê o estado salvo. Partes ausentes ficam como None (medianas ou
+        vocabulário não ajustados).
+        """
+        preprocessador = cls()
+        if os.path.exists(caminho_medianas):
+            preprocessador.medianas = pd.read_parquet(caminho_medianas)
+        if os.path.exists(caminho_vocabulario):
+            with open(caminho_vocabulario, encoding='utf-8') as f:
+                vocabulario = json.load(f)
+            preprocessador.limite_corte = vocabulario['limite_corte']
+            preprocessador.categorias_mantidas = vocabulario[
+                'categorias_mantidas']
+        return preprocessador
+
+
+def _agrupar(categoria, mantidas):
+    return categoria if categoria in mantidas else CATEGORIA_RARA
+
+
+def contar_dimensoes(df_analise):
+    """Linhas por (categoria, valor) de cada dimensão do produto (sem nulos)."""
+    categoria = df_analise['categoria_produto'].fillna(
+        CATEGORIA_DESCONHECIDA).astype(object)
+    return {col: df_analise[col].groupby([categoria, df_analise[col]]).size()
+            for col in cols_dimensao_produto}
+
+
+def contar_categorias(categorias):
+    """Linhas por categoria (já corrigida), com índice simples (object)."""
+    contagem = corrigir_categorias(categorias).value_counts()
+    contagem.index = contagem.index.astype(object)
+    return contagem
+
+
+def _mediana_contagens(contagem):
+    """
+    Mediana por grupo (nível 0) a partir de contagens por (grupo, valor).
+
+    Mesmo resultado do `median` do pandas: com total par, a média dos dois
+    valores centrais.
+    """
+    contagem = contagem[contagem > 0].sort_index()
+    grupos = contagem.index.get_level_values(0)
+    valores = contagem.index.get_level_values(1).to_numpy(dtype=np.float64)
+    acumulado = contagem.groupby(level=0).cumsum().to_numpy()
+    total = contagem.groupby(level=0).transform('sum').to_numpy()
+
+    # Valor na posição k (base 0): a primeira linha com acumulado > k
+    centrais = []
+    for posicao in ((total - 1) // 2, total // 2):
+        alcancou = acumulado > posicao
+        centrais.append(pd.Series(valores[alcancou], index=grupos[alcancou])
+                        .groupby(level=0).first())
+    return (centrais[0] + centrais[1]) / 2
+
+
+def corrigir_categorias(serie):
+    """Aplica `map_cat_correcao` por categoria distinta (coluna `category`)."""
+    return remapear_categorias(
+        serie, lambda cat: map_cat_correcao.get(cat, cat))
@@ -0,0 +1,244 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.features import features_modelo
+from utils.guardrails import (aplicar_guardrail, carregar_tabela_rotas,
+                              CAMINHO_TABELA_ROTAS, TABELA_PADRAO)
+from utils.preprocessamento import Preprocessador, CAMINHO_VOCABULARIO
+from utils.modelo_compacto import (carregar_modelo, CAMINHO_MODELO_COMPACTO,
+                                   CAMINHO_MODELO_PKL)
+
+
+# CONSTANTES
+
+TAMANHO_BLOCO = 50_000
+
+
+# LEITURA E ESCRITA EM BLOCOS
+
+
+def _eh_parquet(caminho):
+    return caminho.lower().endswith(('.parquet', '.pq'))
+
+
+def ler_em_blocos(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    """Lê um CSV ou Parquet de pedidos em blocos de `tamanho_bloco` linhas."""
+    if _eh_parquet(caminho):
+        arquivo = pq.ParquetFile(caminho)
+        for lote in arquivo.iter_batches(batch_size=tamanho_bloco):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(caminho, chunksize=tamanho_bloco)
+
+
+class EscritorBlocos:
+    """Grava blocos de previsões em CSV (append) ou Parquet (row groups)."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._parquet = _eh_parquet(caminho)
+        self._escritor = None
+        self._schema = None
+        self._primeiro = True
+
+    def escrever(self, df):
+        if self._parquet:
+            tabela = pa.Table.from_pandas(df, schema=self._schema,
+                                          preserve_index=False)
+            if self._escritor is None:
+                self._schema = tabela.schema
+                self._escritor = pq.ParquetWriter(self.caminho, self._schema)
+            self._escritor.write_table(tabela)
+        else:
+            df.to_csv(self.caminho, mode='w' if self._primeiro else 'a',
+                      header=self._primeiro, index=False)
+        self._primeiro = False
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+# PREVISÃO
+
+
+def prever_bloco(df, modelo, tabela_rotas=TABELA_PADRAO, preprocessador=None):
+    """
+    Aplica o modelo e o guardrail regional a um bloco de pedidos.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Pedidos com as nove features do modelo (`features_modelo`)
+    modelo : object
+        Qualquer objeto com `predict` (Pipeline sklearn ou ModeloCompacto)
+    tabela_rotas : TabelaRotas, optional
+        Tabela UF x UF do guardrail (default: regra regional padrão)
+    preprocessador : Preprocessador, optional
+        Vocabulário de categorias do treino; as raras viram 'outros' antes
+        do modelo (a saída mantém a categoria original)
+
+    Returns
+    -------
+    pd.DataFrame
+        Bloco original acrescido de `dias_pred_modelo`, `dias_pred_final`,
+        `tipo_rota` e `foi_ajustado`
+    """
+    faltantes = [col for col in features_modelo if col not in df.columns]
+    if faltantes:
+        raise ValueError(f"Colunas ausentes no arquivo de pedidos: {faltantes}")
+
+    X = df[features_modelo]
+    if preprocessador is not None:
+        X = X.assign(categoria_produto=preprocessador.agrupar_raras(
+            X['categoria_produto']))
+    dias_pred_modelo = modelo.predict(X)
+    guardrail = aplicar_guardrail(
+        dias_pred_modelo,
+        df['uf_vendedor'].to_numpy(),
+        df['uf_cliente'].to_numpy(),
+        df['tempo_aprovacao'].to_numpy(),
+        df['prazo_prometido'].to_numpy(),
+        tabela_rotas
+    )
+
+    saida = df.reset_index(drop=True)
+    saida['dias_pred_modelo'] = dias_pred_modelo
+    saida['dias_pred_final'] = guardrail['dias_pred_final']
+    saida['tipo_rota'] = guardrail['tipo_rota']
+    saida['foi_ajustado'] = guardrail['foi_ajustado']
+    return saida
+
+
+# Estado de cada processo worker (um modelo carregado por processo)
+_modelo_worker = None
+_tabela_worker = TABELA_PADRAO
+_preprocessador_worker = None
+
+
+def _inicializar_worker(caminho_compacto, caminho_pkl, caminho_tabela,
+                        caminho_vocabulario):
+    global _modelo_worker, _tabela_worker, _preprocessador_worker
+    _modelo_worker = carregar_modelo(caminho_compacto, caminho_pkl)
+    _tabela_worker = carregar_tabela_rotas(caminho_tabela)
+    _preprocessador_worker = Preprocessador.carregar(
+        caminho_vocabulario=caminho_vocabulario)
+    # Evita oversubscription: o paralelismo já está nos processos
+    if hasattr(_modelo_worker, 'set_params'):
+        try:
+            _modelo_worker.set_params(model__n_jobs=1)
+        except ValueError:
+            pass
+
+
+def _prever_bloco_worker(df):
+    return prever_bloco(df, _modelo_worker, _tabela_worker,
+                        _preprocessador_worker)
+
+
+def prever_arquivo(entrada, saida, tamanho_bloco=TAMANHO_BLOCO, workers=None,
+                   caminho_compacto=CAMINHO_MODELO_COMPACTO,
+                   caminho_pkl=CAMINHO_MODELO_PKL,
+                   caminho_tabela=CAMINHO_TABELA_ROTAS,
+                   caminho_vocabulario=CAMINHO_VOCABULARIO):
+    """
+    Pontua um arquivo inteiro de pedidos em streaming, em paralelo.
+
+    Os blocos são distribuídos entre `workers` processos (cada um com sua
+    cópia do modelo; no formato compacto os arrays são compartilhados via
+    page cache) e gravados na ordem original. No máximo `2 * workers`
+    blocos ficam em memória ao mesmo tempo.
+
+    Parameters
+    ----------
+    entrada : str
+        CSV ou Parquet de pedidos
+    saida : str
+        CSV ou Parquet de saída (definido pela extensão)
+    tamanho_bloco : int, optional
+        Linhas por bloco (default 50.000)
+    workers : int, optional
+        Processos paralelos (default: todos os núcleos)
+    caminho_tabela : str, optional
+        JSON da tabela de rotas; se não existir, usa a regra padrão
+    caminho_vocabulario : str, optional
+        JSON do vocabulário de categorias salvo pelo ETL; se não existir,
+        as categorias seguem sem agrupamento
+
+    Returns
+    -------
+    dict
+        `linhas`, `segundos` e `linhas_por_segundo`
+    """
+    compacto = os.path.join(caminho_compacto, 'meta.json')
+    if not os.path.exists(compacto) and not os.path.exists(caminho_pkl):
+        raise FileNotFoundError("Modelo não encontrado. Verifique a pasta 'models'.")
+
+    workers = workers or os.cpu_count() or 1
+    inicio = time.perf_counter()
+    total = 0
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_inicializar_worker,
+        initargs=(caminho_compacto, caminho_pkl, caminho_tabela,
+                  caminho_vocabulario)
+    ) as executor, EscritorBlocos(saida) as escritor:
+        pendentes = []
+        for bloco in ler_em_blocos(entrada, tamanho_bloco):
+            pendentes.append(executor.submit(_prever_bloco_worker, bloco))
+            if len(pendentes) >= 2 * workers:
+                resultado = pendentes.pop(0).result()
+                escritor.escrever(resultado)
+                total += len(resultado)
+        for futuro in pendentes:
+            resultado = futuro.result()
+            escritor.escrever(resultado)
+            total += len(resultado)
+
+    segundos = time.perf_counter() - inicio
+    return {
+        'linhas': total,
+        'segundos': segundos,
+        'linhas_por_segundo': total / segundos if segundos > 0 else 0.0
+    }
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Pontua um arquivo de pedidos (CSV/Parquet) com o modelo de atraso.")
+    parser.add_argument("entrada", help="CSV ou Parquet com as nove features do modelo")
+    parser.add_argument("saida", help="Arquivo de saída (.csv ou .parquet)")
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processos paralelos (default: todos os núcleos)")
+    parser.add_argument("--modelo-compacto", default=CAMINHO_MODELO_COMPACTO)
+    parser.add_argument("--modelo-pkl", default=CAMINHO_MODELO_PKL)
+    parser.add_argument("--tabela-rotas", default=CAMINHO_TABELA_ROTAS,
+                        help="JSON com a tabela de rotas do guardrail (opcional)")
+    parser.add_argument("--vocabulario", default=CAMINHO_VOCABULARIO,
+                        help="JSON do vocabulário de categorias do treino (opcional)")
+    args = parser.parse_args(argv)
+
+    stats = prever_arquivo(args.entrada, args.saida, args.tamanho_bloco,
+                           args.workers, args.modelo_compacto, args.modelo_pkl,
+                           args.tabela_rotas, args.vocabulario)
+    print(f"{stats['linhas']} pedidos pontuados em {stats['segundos']:.2f}s "
+          f"({stats['linhas_por_segundo']:,.0f} linhas/s) -> {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.cache_previsao import assinatura_artefatos
+from utils.cubo import CAMINHO_CUBO_DASHBOARD
+from utils.dados import (carregar_dataset_dashboard, dataset_disponivel,
+                         colunas_dashboard, CAMINHO_DATASET_DASHBOARD)
+from utils.filtros import IndiceFiltros
+from utils.modelo_compacto import (exportar_modelo_compacto, exportavel,
+                                   CAMINHO_MODELO_COMPACTO, CAMINHO_MODELO_PKL)
+from utils.preprocessamento import CAMINHO_VOCABULARIO
+from utils.serie_temporal import IndiceTemporal, ordenar_por_data, COLUNA_DATA
+
+
+# CONSTANTES
+
+# Raiz das versões publicadas; em /dev/shm as páginas ficam só em memória
+CAMINHO_PUBLICACAO = "data/publicado"
+
+# Ponteiro para a versão atual (trocado de forma atômica)
+ARQUIVO_ATUAL = "atual.json"
+ARQUIVO_COLUNAS = "colunas.json"
+# Marca, dentro de cada versão, o instante em que ela passou a ser a atual
+ARQUIVO_PUBLICADA = "publicada.json"
+
+# Versões mantidas em disco (a atual e as anteriores ainda em uso)
+MANTER_VERSOES = 2
+
+# Intervalo entre verificações do observador; também é a carência mínima
+# antes de apagar uma versão que deixou de ser a atual (segundos)
+INTERVALO_OBSERVACAO = 30
+
+
+# TABELA EM COLUNAS (.npy)
+
+
+def salvar_colunas(df, destino):
+    """
+    Grava cada coluna da tabela como um `.npy` (categorias como códigos).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Tabela do Dashboard
+    destino : str
+        Diretório de saída (um arquivo por coluna e `colunas.json`)
+    """
+    os.makedirs(destino, exist_ok=True)
+    esquema = []
+    for posicao, col in enumerate(df.columns):
+        serie = df[col]
+        if serie.dtype == object:
+            serie = serie.astype('category')
+        arquivo = f'{posicao:03d}.npy'
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(destino, arquivo),
+                    np.asarray(serie.cat.codes))
+            esquema.append({'coluna': col, 'arquivo': arquivo,
+                            'categorias': serie.cat.categories.tolist()})
+        else:
+            np.save(os.path.join(destino, arquivo), serie.to_numpy())
+            esquema.append({'coluna': col, 'arquivo': arquivo})
+
+    with open(os.path.join(destino, ARQUIVO_COLUNAS), 'w',
+              encoding='utf-8') as f:
+        json.dump({'linhas': len(df), 'colunas': esquema}, f,
+                  ensure_ascii=False, indent=2)
+    return destino
+
+
+def abrir_colunas(pasta):
+    """
+    Abre a tabela gravada por `salvar_colunas` sem copiar os dados.
+
+    Cada coluna é um memory-map somente leitura: todos os processos que
+    abrem a mesma versão compartilham as páginas do cache do sistema, e
+    só as páginas lidas passam a ocupar memória.
+
+    Returns
+    -------
+    pd.DataFrame
+        Tabela somente leitura (não alterar as colunas no lugar)
+    """
+    with open(os.path.join(pasta, ARQUIVO_COLUNAS), encoding='utf-8') as f:
+        esquema = json.load(f)
+
+    colunas = {}
+    for item in esquema['colunas']:
+        # np.asarray mantém o buffer mapeado, sem o overhead de np.memmap
+        valores = np.asarray(np.load(os.path.join(pasta, item['arquivo']),
+                                     mmap_mode='r'))
+        if 'categorias' in item:
+            valores = pd.Categorical.from_codes(
+                valores, categories=item['categorias'], validate=False)
+        colunas[item['coluna']] = valores
+    # copy=False: um bloco por coluna, sem consolidar (e copiar) os arrays
+    return pd.DataFrame(colunas, copy=False)
+
+
+# PUBLICAÇÃO (Processo Preparador)
+
+
+def ler_publicacao(raiz=CAMINHO_PUBLICACAO):
+    """
+    Versão atual publicada e os caminhos dos seus artefatos.
+
+    Returns
+    -------
+    dict or None
+        'versao', 'dataset', 'indice_filtros', 'indice_temporal', 'cubo',
+        'modelo' (compacto), 'modelo_pkl' (modelos sem formato compacto) e
+        'vocabulario'; None quando nada foi publicado
+    """
+    try:
+        with open(os.path.join(raiz, ARQUIVO_ATUAL), encoding='utf-8') as f:
+            atual = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    pasta = os.path.join(raiz, atual['versao'])
+    return {
+        'versao': atual['versao'],
+        'dataset': os.path.join(pasta, 'dashboard'),
+        'indice_filtros': os.path.join(pasta, 'indice_filtros'),
+        'indice_temporal': os.path.join(pasta, 'indice_temporal'),
+        'cubo': os.path.join(pasta, 'dashboard_cubo.parquet'),
+        'modelo': os.path.join(pasta, 'modelo_compacto'),
+        'modelo_pkl': os.path.join(pasta, 'modelo.pkl'),
+        'vocabulario': os.path.join(pasta, 'vocabulario_categorias.json')
+    }
+
+
+def _versoes(raiz):
+    if not os.path.isdir(raiz):
+        return []
+    return sorted(nome for nome in os.listdir(raiz)
+                  if nome.startswith('v') and nome[1:].isdigit())
+
+
+def _apontar(raiz, versao):
+    """Troca o ponteiro de versão (escrita em arquivo temporário + rename)."""
+    temporario = os.path.join(raiz, f'.{ARQUIVO_ATUAL}.{os.getpid()}')
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({'versao': versao,
+                   'publicado_em': time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, os.path.join(raiz, ARQUIVO_ATUAL))
+
+
+def _publicada_em(raiz, versao):
+    pasta = os.path.join(raiz, versao)
+    marca = os.path.join(pasta, ARQUIVO_PUBLICADA)
+    return os.path.getmtime(marca if os.path.exists(marca) else pasta)
+
+
+def limpar_versoes(raiz=CAMINHO_PUBLICACAO, manter=MANTER_VERSOES,
+                   carencia=INTERVALO_OBSERVACAO):
+    """
+    Apaga as versões além das `manter` mais recentes.
+
+    Uma versão só é apagada depois de `carencia` segundos desde que deixou
+    de ser a atual (a publicação da versão seguinte): um worker que ainda
+    não fez o rerun da troca continua encontrando os arquivos.
+
+    Returns
+    -------
+    list of str
+        Versões apagadas
+    """
+    versoes = _versoes(raiz)
+    agora = time.time()
+    apagadas = []
+    for posicao, antiga in enumerate(versoes[:-manter] if manter > 0 else []):
+        if agora - _publicada_em(raiz, versoes[posicao + 1]) < carencia:
+            # As seguintes foram substituídas ainda mais recentemente
+            break
+        shutil.rmtree(os.path.join(raiz, antiga), ignore_errors=True)
+        apagadas.append(antiga)
+    return apagadas
+
+
+def publicar(raiz=CAMINHO_PUBLICACAO,
+             caminho_dataset=CAMINHO_DATASET_DASHBOARD,
+             caminho_cubo=CAMINHO_CUBO_DASHBOARD,
+             caminho_compacto=CAMINHO_MODELO_COMPACTO,
+             caminho_pkl=CAMINHO_MODELO_PKL,
+             caminho_vocabulario=CAMINHO_VOCABULARIO,
+             manter=MANTER_VERSOES, carencia=INTERVALO_OBSERVACAO):
+    """
+    Publica dados e modelo em uma nova versão imutável.
+
+    A versão é montada em um diretório temporário: a tabela do Dashboard
+    já ordenada pela data da compra, em colunas `.npy`; os índices de
+    filtros e da data (bitmaps e medidas por linha, que os workers mapeiam
+    em vez de reconstruir cada um a sua cópia); o cubo; os arrays
+    do modelo compacto (exportado do `.pkl` se preciso) ou, para modelos
+    sem floresta sklearn (ex.: XGBoost), o próprio `.pkl`; e o vocabulário
+    de categorias. Depois o diretório é renomeado e o ponteiro
+    `atual.json` é trocado com `os.replace`, então um worker nunca vê uma
+    versão pela metade. Versões antigas além de `manter` são apagadas
+    (`limpar_versoes`), mas só `carencia` segundos depois de deixarem de
+    ser a atual. Um worker que já abriu uma versão apagada continua
+    lendo: tabela e modelo são mapeados por inteiro na abertura, e no
+    Linux o mapeamento sobrevive à remoção dos arquivos.
+
+    Parameters
+    ----------
+    raiz : str, optional
+        Diretório das versões (default 'data/publicado'; use um diretório
+        em /dev/shm para manter tudo em memória compartilhada)
+    manter : int, optional
+        Versões mantidas em disco, contando a nova (default 2)
+    carencia : float, optional
+        Segundos mínimos entre deixar de ser a atual e ser apagada
+        (default: o intervalo do observador)
+
+    Returns
+    -------
+    str
+        Nome da versão publicada ('v000001', 'v000002', ...)
+    """
+    if not dataset_disponivel(caminho_dataset):
+        raise FileNotFoundError(
+            f"Dataset do Dashboard não encontrado em {caminho_dataset}. Rode o ETL.")
+
+    os.makedirs(raiz, exist_ok=True)
+    anteriores = _versoes(raiz)
+    versao = f'v{int(anteriores[-1][1:]) + 1 if anteriores else 1:06d}'
+    temporario = os.path.join(raiz, f'.{versao}.{os.getpid()}')
+    shutil.rmtree(temporario, ignore_errors=True)
+
+    # Uma falha no meio não deixa a versão temporária para trás
+    try:
+        df = ordenar_por_data(carregar_dataset_dashboard(
+            caminho_dataset, colunas=colunas_dashboard))
+        salvar_colunas(df, os.path.join(temporario, 'dashboard'))
+        IndiceFiltros(df).salvar(os.path.join(temporario, 'indice_filtros'))
+        if COLUNA_DATA in df.columns:
+            IndiceTemporal(df).salvar(
+                os.path.join(temporario, 'indice_temporal'))
+        if os.path.exists(caminho_cubo):
+            shutil.copy2(caminho_cubo,
+                         os.path.join(temporario, 'dashboard_cubo.parquet'))
+
+        # Cópia (não hard link): uma nova exportação reescreve os mesmos arquivos
+        destino_modelo = os.path.join(temporario, 'modelo_compacto')
+        if os.path.exists(os.path.join(caminho_compacto, 'meta.json')):
+            shutil.copytree(caminho_compacto, destino_modelo)
+        elif os.path.exists(caminho_pkl):
+            import joblib
+            pipeline = joblib.load(caminho_pkl)
+            if exportavel(pipeline):
+                exportar_modelo_compacto(pipeline, destino_modelo)
+            else:
+                shutil.copy2(caminho_pkl,
+                             os.path.join(temporario, 'modelo.pkl'))
+        if os.path.exists(caminho_vocabulario):
+            shutil.copy2(caminho_vocabulario, os.path.join(
+                temporario, 'vocabulario_categorias.json'))
+
+        os.rename(temporario, os.path.join(raiz, versao))
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+    _apontar(raiz, versao)
+    with open(os.path.join(raiz, versao, ARQUIVO_PUBLICADA), 'w',
+              encoding='utf-8') as f:
+        json.dump({'publicado_em': time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+
+    limpar_versoes(raiz, manter, carencia)
+    return versao
+
+
+def observar(raiz=CAMINHO_PUBLICACAO, intervalo=INTERVALO_OBSERVACAO,
+             manter=MANTER_VERSOES):
+    """
+    Republica sempre que o ETL, o treino ou a exportação gravam artefatos.
+
+    Compara a assinatura (mtime e tamanho) dos artefatos de origem a cada
+    `intervalo` segundos; os workers trocam de versão no próximo rerun.
+    Uma publicação que falha é registrada e tentada de novo na próxima
+    verificação, sem encerrar o laço. A cada verificação também apaga as
+    versões antigas cuja carência (`intervalo`) já passou.
+    """
+    origens = (CAMINHO_DATASET_DASHBOARD, CAMINHO_CUBO_DASHBOARD,
+               CAMINHO_MODELO_COMPACTO, CAMINHO_MODELO_PKL, CAMINHO_VOCABULARIO)
+    assinatura = None
+    while True:
+        atual = assinatura_artefatos(*origens)
+        if atual != assinatura:
+            try:
+                versao = publicar(raiz, manter=manter, carencia=intervalo)
+            except Exception as erro:
+                print(f"Falha ao publicar ({type(erro).__name__}: {erro}); "
+                      f"nova tentativa em {intervalo:g}s", flush=True)
+            else:
+                print(f"Versão publicada: {versao}", flush=True)
+                assinatura = atual
+        else:
+            limpar_versoes(raiz, manter, intervalo)
+        time.sleep(intervalo)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Publica dados e modelo em versões compartilhadas pelos workers do App.")
+    parser.add_argument("--raiz", default=CAMINHO_PUBLICACAO,
+                        help="Diretório das versões (ex.: /dev/shm/olist)")
+    parser.add_argument("--manter", type=int, default=MANTER_VERSOES)
+    parser.add_argument("--observar", action="store_true",
+                        help="Republica a cada nova carga do ETL ou do modelo")
+    parser.add_argument("--intervalo", type=float,
+                        default=INTERVALO_OBSERVACAO)
+    args = parser.parse_args()
+
+    if args.observar:
+        observar(args.raiz, args.intervalo, args.manter)
+    else:
+        versao = publicar(args.raiz, manter=args.manter)
+        print(f"Versão publicada: {versao} em {args.raiz}")
@@ -0,0 +1,271 @@
+import json
+import os
+import pickle
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from utils.treino import (carregar_dados_modelo, criar_preprocessador,
+                          buscar_hiperparametros, publicar_versao,
+                          param_grid_xgb, XGBRegressor, CAMINHO_DADOS_MODELO,
+                          PASTA_VERSOES)
+from utils.modelo_compacto import (exportar_modelo_compacto, exportavel,
+                                   ModeloCompacto)
+
+
+# CONSTANTES (Candidatos e Objetivos)
+
+# Florestas com profundidade/folhas limitadas (nome -> hiperparâmetros)
+florestas_limitadas = {
+    'RF produção (100 árvores, sem limite)': dict(n_estimators=100),
+    'RF 100 árvores, prof. 16, folha 4': dict(
+        n_estimators=100, max_depth=16, min_samples_leaf=4),
+    'RF 100 árvores, prof. 12, folha 8': dict(
+        n_estimators=100, max_depth=12, min_samples_leaf=8),
+    'RF 50 árvores, prof. 10, folha 8': dict(
+        n_estimators=50, max_depth=10, min_samples_leaf=8),
+    'RF 30 árvores, prof. 8, folha 16': dict(
+        n_estimators=30, max_depth=8, min_samples_leaf=16),
+}
+
+# Modelos pequenos treinados sobre as previsões da floresta de produção
+florestas_destiladas = {
+    'Destilado: 1 árvore, prof. 10': dict(
+        n_estimators=1, max_depth=10, min_samples_leaf=8, bootstrap=False),
+    'Destilado: 10 árvores, prof. 8': dict(
+        n_estimators=10, max_depth=8, min_samples_leaf=8),
+}
+
+# Objetivos da fronteira de Pareto (coluna -> True se maior é melhor)
+objetivos_pareto = {
+    'mae': False,
+    'tamanho_mb': False,
+    'latencia_ms': False,
+    'vazao_linhas_s': True
+}
+
+# Tolerância padrão: até 0,05 dia acima do melhor MAE
+TOLERANCIA_MAE = 0.05
+
+
+# MEDIÇÃO
+
+
+def _pipeline_floresta(semente=42, **params):
+    return Pipeline([
+        ('preprocessor', criar_preprocessador(esparso=False)),
+        ('model', RandomForestRegressor(random_state=semente, n_jobs=1,
+                                        **params))
+    ])
+
+
+def _tamanho_mb(pipeline):
+    """Tamanho do pipeline serializado (pickle, sem compressão)."""
+    return len(pickle.dumps(pipeline, protocol=pickle.HIGHEST_PROTOCOL)) / 1024 ** 2
+
+
+def medir_desempenho(modelo, X_test, n_latencia=200, linhas_vazao=50_000):
+    """
+    Latência de uma linha (mediana, ms) e vazão em lote (linhas/s).
+
+    A latência usa `n_latencia` pedidos individuais do holdout; a vazão,
+    um lote de `linhas_vazao` linhas (holdout repetido).
+    """
+    amostras = [X_test.iloc[[i]] for i in range(min(n_latencia, len(X_test)))]
+    modelo.predict(amostras[0])
+    tempos = []
+    for linha in amostras:
+        inicio = time.perf_counter()
+        modelo.predict(linha)
+        tempos.append(time.perf_counter() - inicio)
+
+    repeticoes = int(np.ceil(linhas_vazao / len(X_test)))
+    lote = pd.concat([X_test] * repeticoes, ignore_index=True).iloc[:linhas_vazao]
+    inicio = time.perf_counter()
+    modelo.predict(lote)
+    segundos = time.perf_counter() - inicio
+
+    return float(np.median(tempos)) * 1000, len(lote) / segundos
+
+
+def avaliar_candidato(nome, pipeline, X_test, y_test, segundos_treino,
+                      pasta_compacto=None):
+    """
+    Métricas de erro e de custo de um candidato já treinado.
+
+    Florestas sklearn também são medidas no formato compacto (arrays
+    `.npy`), que é o que o App e o scoring em lote servem.
+    """
+    y_pred = pipeline.predict(X_test)
+    latencia_ms, vazao = medir_desempenho(pipeline, X_test)
+    linha = {
+        'modelo': nome,
+        'mae': mean_absolute_error(y_test, y_pred),
+        'rmse': float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        'r2': r2_score(y_test, y_pred),
+        'tamanho_mb': _tamanho_mb(pipeline),
+        'latencia_ms': latencia_ms,
+        'vazao_linhas_s': vazao,
+        'segundos_treino': segundos_treino,
+        'formato': 'pkl'
+    }
+
+    if pasta_compacto is not None and exportavel(pipeline):
+        destino = exportar_modelo_compacto(
+            pipeline, os.path.join(pasta_compacto, str(abs(hash(nome)))))
+        compacto = ModeloCompacto(destino)
+        latencia_ms, vazao = medir_desempenho(compacto, X_test)
+        tamanho = sum(os.path.getsize(os.path.join(destino, f))
+                      for f in os.listdir(destino))
+        linha.update({
+            'tamanho_mb': tamanho / 1024 ** 2,
+            'latencia_ms': latencia_ms,
+            'vazao_linhas_s': vazao,
+            'formato': 'compacto'
+        })
+    return linha
+
+
+# FRONTEIRA DE PARETO E ESCOLHA
+
+
+def fronteira_pareto(resultados, objetivos=objetivos_pareto):
+    """
+    Marca os candidatos não dominados (coluna `pareto`).
+
+    Um candidato é dominado quando outro é melhor ou igual em todos os
+    objetivos e estritamente melhor em pelo menos um.
+    """
+    valores = np.column_stack([
+        -resultados[col].to_numpy() if maior else resultados[col].to_numpy()
+        for col, maior in objetivos.items()])
+    melhor_igual = (valores[:, None, :] <= valores[None, :, :]).all(axis=2)
+    estrito = (valores[:, None, :] < valores[None, :, :]).any(axis=2)
+    dominado = (melhor_igual & estrito).any(axis=0)
+
+    resultados = resultados.copy()
+    resultados['pareto'] = ~dominado
+    return resultados
+
+
+def escolher_modelo(resultados, tolerancia_mae=TOLERANCIA_MAE):
+    """O candidato de menor latência com MAE até `melhor MAE + tolerância`."""
+    limite = resultados['mae'].min() + tolerancia_mae
+    elegiveis = resultados[resultados['mae'] <= limite]
+    return elegiveis.sort_values(['latencia_ms', 'mae']).iloc[0]['modelo']
+
+
+# EXECUÇÃO
+
+
+def selecionar(caminho_dados=CAMINHO_DADOS_MODELO, pasta_versoes=PASTA_VERSOES,
+               tolerancia_mae=TOLERANCIA_MAE, nucleos=None, semente=42,
+               publicar=False):
+    """
+    Treina os candidatos, calcula a fronteira de Pareto e grava o escolhido.
+
+    Candidatos: florestas com profundidade/folhas limitadas (incluindo a
+    configuração de produção), XGBoost ajustado por halving (se
+    instalado) e florestas pequenas destiladas da floresta de produção.
+
+    Parameters
+    ----------
+    tolerancia_mae : float, optional
+        Folga de MAE (dias) em relação ao melhor candidato (default 0.05)
+    publicar : bool, optional
+        Se True, promove o escolhido para `models/` (usado pelo App)
+
+    Returns
+    -------
+    tuple
+        (diretório da versão, DataFrame com métricas e fronteira,
+        nome do escolhido)
+    """
+    X, y = carregar_dados_modelo(caminho_dados)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.20, random_state=semente)
+
+    treinados = {}
+    for nome, params in florestas_limitadas.items():
+        print(f" Treinando: {nome}...")
+        inicio = time.perf_counter()
+        treinados[nome] = (_pipeline_floresta(semente, **params).fit(
+            X_train, y_train), time.perf_counter() - inicio)
+
+    if XGBRegressor is not None:
+        inicio = time.perf_counter()
+        busca = buscar_hiperparametros(
+            'XGBoost', XGBRegressor(random_state=semente, n_jobs=1),
+            param_grid_xgb, X_train, y_train, nucleos, semente=semente)
+        treinados['XGBoost ajustado'] = (
+            busca.best_estimator_, time.perf_counter() - inicio)
+
+    # Destilação: o aluno aprende a previsão (suave) da floresta de produção
+    professor = treinados['RF produção (100 árvores, sem limite)'][0]
+    y_professor = professor.predict(X_train)
+    for nome, params in florestas_destiladas.items():
+        print(f" Destilando: {nome}...")
+        inicio = time.perf_counter()
+        treinados[nome] = (_pipeline_floresta(semente, **params).fit(
+            X_train, y_professor), time.perf_counter() - inicio)
+
+    with tempfile.TemporaryDirectory() as pasta_compacto:
+        resultados = pd.DataFrame([
+            avaliar_candidato(nome, pipeline, X_test, y_test, segundos,
+                              pasta_compacto)
+            for nome, (pipeline, segundos) in treinados.items()])
+    resultados = fronteira_pareto(resultados)
+    escolhido = escolher_modelo(resultados, tolerancia_mae)
+
+    versao = time.strftime('v%Y%m%d-%H%M%S')
+    destino = os.path.join(pasta_versoes, versao)
+    os.makedirs(destino, exist_ok=True)
+
+    pipeline = treinados[escolhido][0]
+    joblib.dump(pipeline, os.path.join(destino, 'modelo.pkl'), compress=3)
+    resultados.to_csv(os.path.join(destino, 'pareto.csv'), index=False)
+    with open(os.path.join(destino, 'metricas.json'), 'w',
+              encoding='utf-8') as f:
+        json.dump({
+            'versao': versao,
+            'vencedor': escolhido,
+            'criterio': f'menor latência com MAE <= melhor + {tolerancia_mae}',
+            'candidatos': resultados.to_dict('records')
+        }, f, ensure_ascii=False, indent=2, default=float)
+
+    if publicar:
+        publicar_versao(destino, pipeline)
+    return destino, resultados, escolhido
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Seleção de modelo por erro, tamanho, latência e vazão "
+                    "(fronteira de Pareto).")
+    parser.add_argument("--dados", default=CAMINHO_DADOS_MODELO)
+    parser.add_argument("--destino", default=PASTA_VERSOES)
+    parser.add_argument("--tolerancia-mae", type=float, default=TOLERANCIA_MAE,
+                        help="Folga de MAE (dias) sobre o melhor candidato")
+    parser.add_argument("--nucleos", type=int, default=None)
+    parser.add_argument("--publicar", action="store_true",
+                        help="Promove o escolhido para models/ (usado pelo App)")
+    args = parser.parse_args()
+
+    caminho, resultados, escolhido = selecionar(args.dados, args.destino,
+                                     args.tolerancia_mae, args.nucleos,
+                                     publicar=args.publicar)
+    colunas = ['modelo', 'mae', 'rmse', 'r2', 'tamanho_mb', 'latencia_ms',
+               'vazao_linhas_s', 'formato', 'pareto']
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(resultados[colunas].round(3).to_string(index=False))
+    print(f"\nEscolhido: {escolhido}")
+    print(f"Versão salva em: {caminho}")
@@ -0,0 +1,335 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.cubo import medidas_linhas, medidas_cubo, kpis_totais
+
+
+# CONSTANTES
+
+COLUNA_DATA = 'data_compra'
+
+ARQUIVO_INDICE = "indice.json"
+
+# Janelas móveis oferecidas no Dashboard (dias)
+janelas_moveis = [7, 30, 90]
+
+
+def ordenar_por_data(df, coluna=COLUNA_DATA):
+    """
+    Ordena a tabela pela data (estável, datas ausentes no fim).
+
+    Feito uma vez no carregamento: com as linhas em ordem cronológica, um
+    intervalo de datas é uma faixa contígua de linhas (ver `IndiceTemporal`).
+    """
+    if coluna not in df.columns or df[coluna].is_monotonic_increasing:
+        return df
+    ordem = np.argsort(df[coluna].to_numpy('datetime64[ns]'), kind='stable')
+    if (ordem == np.arange(len(df))).all():
+        return df
+    return df.take(ordem).reset_index(drop=True)
+
+
+def _dia(data):
+    return np.datetime64(pd.Timestamp(data).date(), 'D')
+
+
+# ÍNDICE TEMPORAL
+
+
+class IndiceTemporal:
+    """
+    Índice da tabela ordenada pela data da compra.
+
+    Guarda os instantes (int64, em ns) das linhas, o dia de cada linha
+    (contado a partir do primeiro dia da base) e as medidas aditivas do
+    cubo por linha. Um intervalo de datas vira uma fatia de linhas por
+    busca binária (`fatiar`), sem máscara sobre a tabela inteira, e os
+    KPIs por dia de um recorte dos filtros saem de um único `bincount`
+    (`serie`).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Tabela do Dashboard já ordenada (ver `ordenar_por_data`)
+    coluna : str, optional
+        Coluna de data (default 'data_compra')
+    """
+
+    def __init__(self, df, coluna=COLUNA_DATA):
+        instantes = df[coluna].to_numpy('datetime64[ns]')
+        validas = ~np.isnat(instantes)
+        n_validas = int(validas.sum())
+        if not validas[:n_validas].all() or \
+                (np.diff(instantes[:n_validas].view(np.int64)) < 0).any():
+            raise ValueError(
+                f"Tabela fora de ordem: use ordenar_por_data(df, '{coluna}').")
+
+        self.n_linhas = len(df)
+        self.n_validas = n_validas
+        self.instantes = instantes[:self.n_validas].view(np.int64)
+
+        dias = instantes[:self.n_validas].astype('datetime64[D]')
+        self.primeiro_dia = dias[0] if self.n_validas else np.datetime64(
+            'NaT', 'D')
+        self.dias = (dias - self.primeiro_dia).astype(np.int64)
+        self.n_dias = int(self.dias[-1]) + 1 if self.n_validas else 0
+
+        self.medidas = medidas_linhas(df.iloc[:self.n_validas])[
+            medidas_cubo].to_numpy(np.float64)
+
+    def salvar(self, destino):
+        """Grava instantes, dias e medidas por linha em `.npy`."""
+        os.makedirs(destino, exist_ok=True)
+        for nome in ('instantes', 'dias', 'medidas'):
+            np.save(os.path.join(destino, f'{nome}.npy'), getattr(self, nome))
+        with open(os.path.join(destino, ARQUIVO_INDICE), 'w',
+                  encoding='utf-8') as f:
+            json.dump({'n_linhas': self.n_linhas, 'n_validas': self.n_validas,
+                       'n_dias': self.n_dias,
+                       'primeiro_dia': str(self.primeiro_dia)}, f)
+        return destino
+
+    @classmethod
+    def abrir(cls, pasta):
+        """
+        Abre o índice gravado por `salvar` sem reconstruí-lo.
+
+        Os arrays por linha são memory-maps somente leitura, compartilhados
+        entre os workers que abrem a mesma pasta.
+        """
+        with open(os.path.join(pasta, ARQUIVO_INDICE), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        indice = cls.__new__(cls)
+        indice.n_linhas = meta['n_linhas']
+        indice.n_validas = meta['n_validas']
+        indice.n_dias = meta['n_dias']
+        indice.primeiro_dia = np.datetime64(meta['primeiro_dia'], 'D')
+        for nome in ('instantes', 'dias', 'medidas'):
+            setattr(indice, nome, np.asarray(np.load(
+                os.path.join(pasta, f'{nome}.npy'), mmap_mode='r')))
+        return indice
+
+    @property
+    def inicio(self):
+        """Primeira data da base (`datetime.date`)."""
+        return pd.Timestamp(self.primeiro_dia).date()
+
+    @property
+    def fim(self):
+        """Última data da base (`datetime.date`)."""
+        return pd.Timestamp(
+            self.primeiro_dia + np.timedelta64(self.n_dias - 1, 'D')).date()
+
+    def dia(self, data):
+        """Posição de uma data (0 = primeiro dia da base)."""
+        return int((_dia(data) - self.primeiro_dia).astype(np.int64))
+
+    def fatiar(self, inicio=None, fim=None):
+        """
+        Linhas com a data entre `inicio` e `fim` (dias inteiros, inclusive).
+
+        Returns
+        -------
+        slice
+            Faixa contígua de linhas da tabela ordenada
+        """
+        esquerda, direita = 0, self.n_validas
+        if inicio is not None:
+            limite = _dia(inicio).astype('datetime64[ns]').view(np.int64)
+            esquerda = int(np.searchsorted(self.instantes, limite, 'left'))
+        if fim is not None:
+            limite = (_dia(fim) + np.timedelta64(1, 'D')).astype(
+                'datetime64[ns]').view(np.int64)
+            direita = int(np.searchsorted(self.instantes, limite, 'left'))
+        return slice(esquerda, max(esquerda, direita))
+
+    def serie(self, mascara=None):
+        """
+        KPIs por dia das linhas selecionadas (uma passada sobre as linhas).
+
+        Parameters
+        ----------
+        mascara : np.ndarray, optional
+            Máscara booleana por linha (ver `IndiceFiltros.mascara`);
+            None usa todas as linhas
+
+        Returns
+        -------
+        SerieDiaria
+        """
+        dias, medidas = self.dias, self.medidas
+        if mascara is not None:
+            mascara = mascara[:self.n_validas]
+            dias, medidas = dias[mascara], medidas[mascara]
+        por_dia = np.column_stack([
+            np.bincount(dias, weights=medidas[:, i], minlength=self.n_dias)
+            for i in range(len(medidas_cubo))
+        ]) if self.n_dias else np.zeros((0, len(medidas_cubo)))
+        return SerieDiaria(por_dia, self.primeiro_dia)
+
+
+# SÉRIE DIÁRIA (SOMAS PREFIXADAS)
+
+
+class SerieDiaria:
+    """
+    Medidas do cubo somadas por dia, com somas prefixadas.
+
+    `acumulado[d]` é a soma dos dias anteriores a `d`, então qualquer
+    intervalo de dias custa uma subtração por medida: janelas móveis e
+    comparações entre períodos não voltam às linhas.
+
+    Parameters
+    ----------
+    por_dia : np.ndarray
+        Matriz (dias, `medidas_cubo`) com as somas de cada dia
+    primeiro_dia : np.datetime64
+        Data do dia 0
+    """
+
+    def __init__(self, por_dia, primeiro_dia):
+        self.primeiro_dia = primeiro_dia
+        self.n_dias = len(por_dia)
+        self.acumulado = np.vstack([np.zeros((1, len(medidas_cubo))),
+                                    np.cumsum(por_dia, axis=0)])
+
+    def _posicao(self, data):
+        posicao = int((_dia(data) - self.primeiro_dia).astype(np.int64))
+        return min(max(posicao, 0), self.n_dias)
+
+    def somar(self, inicio=None, fim=None):
+        """Medidas somadas entre duas datas (inclusive); None = sem limite."""
+        esquerda = 0 if inicio is None else self._posicao(inicio)
+        direita = self.n_dias if fim is None else self._posicao(
+            pd.Timestamp(fim) + pd.Timedelta(days=1))
+        direita = max(esquerda, direita)
+        return pd.Series(self.acumulado[direita] - self.acumulado[esquerda],
+                         index=medidas_cubo)
+
+    def kpis(self, inicio=None, fim=None):
+        """Os cinco KPIs da Visão Geral entre duas datas (ver `kpis_totais`)."""
+        return kpis_totais(self.somar(inicio, fim))
+
+    def comparar_periodos(self, fim, dias):
+        """
+        KPIs da janela de `dias` encerrada em `fim` e da janela anterior.
+
+        Returns
+        -------
+        tuple of dict
+            (atual, anterior); a anterior pode ter 0 pedidos quando cai
+            antes do início da base
+        """
+        fim = pd.Timestamp(fim)
+        inicio = fim - pd.Timedelta(days=dias - 1)
+        anterior_fim = inicio - pd.Timedelta(days=1)
+        anterior_inicio = anterior_fim - pd.Timedelta(days=dias - 1)
+        return (self.kpis(inicio, fim),
+                self.kpis(anterior_inicio, anterior_fim))
+
+    def movel(self, dias, inicio=None, fim=None):
+        """
+        Janela móvel de `dias` para cada dia entre `inicio` e `fim`.
+
+        Returns
+        -------
+        pd.DataFrame
+            Índice de datas; colunas 'pedidos', 'faturamento',
+            'taxa_atraso' e 'taxa_cancel' (%) da janela encerrada em cada dia
+        """
+        esquerda = 0 if inicio is None else self._posicao(inicio)
+        direita = self.n_dias if fim is None else self._posicao(
+            pd.Timestamp(fim) + pd.Timedelta(days=1))
+        fins = np.arange(esquerda, max(esquerda, direita)) + 1
+        somas = self.acumulado[fins] - self.acumulado[np.maximum(fins - dias, 0)]
+        somas = pd.DataFrame(somas, columns=medidas_cubo)
+
+        pedidos = somas['pedidos'].where(somas['pedidos'] > 0)
+        return pd.DataFrame({
+            'pedidos': somas['pedidos'].to_numpy(),
+            'faturamento': somas['faturamento'].to_numpy(),
+            'taxa_atraso': (somas['atrasos'] / pedidos * 100).to_numpy(),
+            'taxa_cancel': (somas['cancelados'] / pedidos * 100).to_numpy()
+        }, index=pd.DatetimeIndex(
+            self.primeiro_dia + (fins - 1).astype('timedelta64[D]'),
+            name='data'))
+
+
+def verificar_paridade_serie(df, indice, consultas=200, semente=0,
+                             coluna=COLUNA_DATA):
+    """
+    Compara fatias e somas prefixadas com máscaras booleanas sobre as linhas.
+
+    Sorteia intervalos de datas e confere, para cada um, que `fatiar`
+    devolve exatamente as linhas da máscara e que `SerieDiaria.somar`
+    bate com a soma direta das medidas.
+
+    Returns
+    -------
+    float
+        Maior diferença absoluta observada nas medidas
+
+    Raises
+    ------
+    AssertionError
+        Se alguma fatia ou soma divergir
+    """
+    rng = np.random.default_rng(semente)
+    datas = df[coluna]
+    medidas = medidas_linhas(df)[medidas_cubo]
+    serie = indice.serie()
+    diferenca = 0.0
+    for _ in range(consultas):
+        a, b = np.sort(rng.integers(-5, indice.n_dias + 5, 2))
+        inicio = pd.Timestamp(indice.primeiro_dia) + pd.Timedelta(days=int(a))
+        fim = pd.Timestamp(indice.primeiro_dia) + pd.Timedelta(days=int(b))
+        mascara = ((datas >= inicio) &
+                   (datas < fim + pd.Timedelta(days=1))).to_numpy()
+
+        fatia = indice.fatiar(inicio, fim)
+        esperado = np.flatnonzero(mascara)
+        assert np.array_equal(np.arange(fatia.start, fatia.stop), esperado), \
+            f"Fatia divergente em {inicio.date()}..{fim.date()}"
+
+        soma = serie.somar(inicio, fim).to_numpy()
+        direta = medidas[mascara].sum().to_numpy()
+        np.testing.assert_allclose(soma, direta, rtol=1e-9, atol=1e-6)
+        diferenca = max(diferenca, float(np.abs(soma - direta).max()))
+    return diferenca
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from utils.dados import (carregar_dataset_dashboard, colunas_dashboard,
+                             CAMINHO_DATASET_DASHBOARD)
+
+    parser = argparse.ArgumentParser(
+        description="Janelas móveis de KPIs e conferência das somas prefixadas.")
+    parser.add_argument("--dataset", default=CAMINHO_DATASET_DASHBOARD)
+    parser.add_argument("--consultas", type=int, default=200)
+    args = parser.parse_args()
+
+    df = ordenar_por_data(carregar_dataset_dashboard(
+        args.dataset, colunas=colunas_dashboard))
+    inicio = time.perf_counter()
+    indice = IndiceTemporal(df)
+    serie = indice.serie()
+    print(f"Índice e série diária: {indice.n_linhas} linhas, "
+          f"{indice.n_dias} dias ({time.perf_counter() - inicio:.3f}s)")
+
+    for dias in janelas_moveis:
+        atual, anterior = serie.comparar_periodos(indice.fim, dias)
+        print(f"Últimos {dias:>2} dias: {atual['total_pedidos']} pedidos, "
+              f"atraso {atual['taxa_atraso']:.1f}% "
+              f"(anterior: {anterior['total_pedidos']} pedidos, "
+              f"atraso {anterior['taxa_atraso']:.1f}%)")
+
+    diferenca = verificar_paridade_serie(df, indice, args.consultas)
+    print(f"Paridade com máscaras: OK ({args.consultas} intervalos, "
+          f"diferença máxima {diferenca:.2e})")
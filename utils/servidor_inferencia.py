@@ -0,0 +1,189 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+
+from utils.modelo_compacto import (carregar_modelo,
+                                   CAMINHO_MODELO_COMPACTO, CAMINHO_MODELO_PKL)
+
+
+# CONSTANTES
+
+JANELA_MS = 5
+TAMANHO_MAX_LOTE = 512
+
+# Sinal de parada colocado na fila
+_PARAR = object()
+
+
+class ServidorInferencia:
+    """
+    Serviço de inferência em processo com micro-lotes.
+
+    Uma única cópia do modelo atende todas as sessões do Streamlit. Cada
+    chamada a `submeter` entra em uma fila; uma thread dedicada junta as
+    requisições que chegam dentro de `janela_ms` (até `tamanho_max_lote`
+    linhas) e faz um único `predict` vetorizado por lote, devolvendo o
+    resultado de cada requisição pelo seu `Future`.
+
+    Expõe `predict`, então pode ser usado no lugar do modelo (por exemplo
+    atrás do `CachePrevisoes`).
+
+    Parameters
+    ----------
+    caminho_compacto, caminho_pkl : str, optional
+        Artefatos do modelo (ver `carregar_modelo`)
+    janela_ms : float, optional
+        Tempo máximo de espera para completar um lote (default 5 ms)
+    tamanho_max_lote : int, optional
+        Máximo de linhas por chamada ao modelo (default 512)
+    """
+
+    def __init__(self, caminho_compacto=CAMINHO_MODELO_COMPACTO,
+                 caminho_pkl=CAMINHO_MODELO_PKL, janela_ms=JANELA_MS,
+                 tamanho_max_lote=TAMANHO_MAX_LOTE, versao=None):
+        self.caminho_compacto = caminho_compacto
+        self.caminho_pkl = caminho_pkl
+        self.janela = janela_ms / 1000
+        self.tamanho_max_lote = tamanho_max_lote
+        self.versao = versao
+        self.modelo = carregar_modelo(caminho_compacto, caminho_pkl)
+
+        self.lotes = 0
+        self.requisicoes = 0
+        self.linhas = 0
+        self.requisicoes_diretas = 0
+
+        self._fila = queue.Queue()
+        self._trava_modelo = threading.Lock()
+        self._thread = threading.Thread(target=self._laco, daemon=True,
+                                        name="servidor-inferencia")
+        self._thread.start()
+
+    @property
+    def disponivel(self):
+        return self.modelo is not None
+
+    def sincronizar(self, versao, caminho_compacto=None, caminho_pkl=None):
+        """
+        Recarrega o modelo se o artefato mudou; lotes em curso terminam no antigo.
+
+        Com `caminho_compacto` e `caminho_pkl`, passa a ler os artefatos
+        desses caminhos (uma versão publicada, ver `utils.publicacao`).
+        """
+        if versao == self.versao:
+            return
+        if caminho_compacto is not None:
+            self.caminho_compacto = caminho_compacto
+        if caminho_pkl is not None:
+            self.caminho_pkl = caminho_pkl
+        modelo = carregar_modelo(self.caminho_compacto, self.caminho_pkl)
+        with self._trava_modelo:
+            self.modelo = modelo
+            self.versao = versao
+
+    # REQUISIÇÕES
+
+    def submeter(self, X):
+        """Enfileira um DataFrame de pedidos e devolve um `Future` com as previsões."""
+        futuro = Future()
+        self._fila.put((X, futuro))
+        return futuro
+
+    def predict(self, X, timeout=None):
+        return self.submeter(X).result(timeout)
+
+    def prever_registro(self, registro):
+        """
+        Previsão de um único pedido (dict).
+
+        Com o formato compacto, vai direto ao modelo atual, sem a fila: o
+        codificador compilado custa menos que a espera da janela e a
+        concatenação do micro-lote. O Pipeline sklearn continua passando
+        pela fila, onde as linhas de várias sessões viram um único `predict`.
+        """
+        with self._trava_modelo:
+            modelo = self.modelo
+            direto = hasattr(modelo, 'prever_registro')
+            if direto:
+                self.requisicoes_diretas += 1
+        if modelo is None:
+            raise FileNotFoundError(
+                "Modelo não encontrado. Verifique a pasta 'models'.")
+        if direto:
+            return modelo.prever_registro(registro)
+        return float(self.predict(pd.DataFrame([registro]))[0])
+
+    # LAÇO DE MICRO-LOTES
+
+    def _coletar_lote(self, primeiro):
+        """Junta requisições até a janela expirar ou o lote encher."""
+        lote = [primeiro]
+        linhas = len(primeiro[0])
+        limite = time.monotonic() + self.janela
+        while linhas < self.tamanho_max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                item = self._fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            if item is _PARAR:
+                # Reenfileira para encerrar após processar o lote atual
+                self._fila.put(_PARAR)
+                break
+            lote.append(item)
+            linhas += len(item[0])
+        return lote
+
+    def _processar(self, lote):
+        lote = [(X, futuro) for X, futuro in lote
+                if futuro.set_running_or_notify_cancel()]
+        if not lote:
+            return
+        try:
+            with self._trava_modelo:
+                modelo = self.modelo
+            if modelo is None:
+                raise FileNotFoundError(
+                    "Modelo não encontrado. Verifique a pasta 'models'.")
+
+            X = pd.concat([X for X, _ in lote], ignore_index=True)
+            previsoes = np.asarray(modelo.predict(X))
+            cortes = np.cumsum([len(X) for X, _ in lote])[:-1]
+            for (_, futuro), parte in zip(lote, np.split(previsoes, cortes)):
+                futuro.set_result(parte)
+        except Exception as erro:
+            for _, futuro in lote:
+                futuro.set_exception(erro)
+
+        self.lotes += 1
+        self.requisicoes += len(lote)
+        self.linhas += sum(len(X) for X, _ in lote)
+
+    def _laco(self):
+        while True:
+            item = self._fila.get()
+            if item is _PARAR:
+                return
+            self._processar(self._coletar_lote(item))
+
+    def parar(self):
+        self._fila.put(_PARAR)
+        self._thread.join()
+
+    def estatisticas(self):
+        """Lotes, requisições (em lote e diretas) e tamanho médio dos lotes."""
+        return {
+            'lotes': self.lotes,
+            'requisicoes': self.requisicoes,
+            'linhas': self.linhas,
+            'requisicoes_diretas': self.requisicoes_diretas,
+            'requisicoes_por_lote': (self.requisicoes / self.lotes
+                                     if self.lotes else 0.0),
+            'fila': self._fila.qsize()
+        }
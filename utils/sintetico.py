@@ -0,0 +1,374 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+from utils.etl import arquivos_olist, PASTA_DATA
+from utils.guardrails import (TABELA_PADRAO, ROTA_LOCAL, ROTA_REGIONAL,
+                              ROTA_NACIONAL_DIFICIL, ROTA_NACIONAL)
+
+
+# CONSTANTES (Perfil da base pública da Olist, 2016-2018)
+
+# Pedidos na base original: escala 1 reproduz o volume real
+PEDIDOS_BASE = 99_441
+
+PASTA_SINTETICA = "data/sintetico"
+
+# Clientes por UF (contagens da base original)
+clientes_por_uf = {
+    'SP': 41746, 'RJ': 12852, 'MG': 11635, 'RS': 5466, 'PR': 5045,
+    'SC': 3637, 'BA': 3380, 'DF': 2140, 'ES': 2033, 'GO': 2020, 'PE': 1652,
+    'CE': 1336, 'PA': 975, 'MT': 907, 'MA': 747, 'MS': 715, 'PB': 536,
+    'PI': 495, 'RN': 485, 'AL': 413, 'SE': 350, 'TO': 280, 'RO': 253,
+    'AM': 148, 'AC': 81, 'AP': 68, 'RR': 46
+}
+
+capitais = {
+    'AC': 'rio branco', 'AL': 'maceio', 'AP': 'macapa', 'AM': 'manaus',
+    'BA': 'salvador', 'CE': 'fortaleza', 'DF': 'brasilia', 'ES': 'vitoria',
+    'GO': 'goiania', 'MA': 'sao luis', 'MT': 'cuiaba', 'MS': 'campo grande',
+    'MG': 'belo horizonte', 'PA': 'belem', 'PB': 'joao pessoa',
+    'PR': 'curitiba', 'PE': 'recife', 'PI': 'teresina',
+    'RJ': 'rio de janeiro', 'RN': 'natal', 'RS': 'porto alegre',
+    'RO': 'porto velho', 'RR': 'boa vista', 'SC': 'florianopolis',
+    'SP': 'sao paulo', 'SE': 'aracaju', 'TO': 'palmas'
+}
+
+# Status dos pedidos (contagens da base original)
+status_pedidos = {
+    'delivered': 96478, 'shipped': 1107, 'canceled': 625,
+    'unavailable': 609, 'invoiced': 314, 'processing': 301,
+    'created': 5, 'approved': 2
+}
+
+# Itens por pedido: 1, 2, ..., 6
+prob_itens_pedido = [0.901, 0.076, 0.012, 0.005, 0.002, 0.004]
+
+# Trânsito médio (dias, transportadora -> cliente) por tipo de rota
+transito_medio_rota = {
+    ROTA_LOCAL: 5.0,
+    ROTA_REGIONAL: 9.0,
+    ROTA_NACIONAL: 12.5,
+    ROTA_NACIONAL_DIFICIL: 19.0
+}
+
+# Fator do frete por tipo de rota
+fator_frete_rota = {
+    ROTA_LOCAL: 1.0,
+    ROTA_REGIONAL: 1.3,
+    ROTA_NACIONAL: 1.7,
+    ROTA_NACIONAL_DIFICIL: 2.2
+}
+
+# Picos de atraso (mês -> multiplicador do trânsito): Black Friday/Natal e
+# a greve dos caminhoneiros de 2018
+choque_mensal = {11: 1.2, 12: 1.15, 2: 1.2, 3: 1.3, 5: 1.15}
+
+# Folga média do prazo prometido sobre o tempo típico de entrega (dias)
+FOLGA_PRAZO_DIAS = 12.5
+
+INICIO_COMPRAS = pd.Timestamp('2016-09-04')
+FIM_COMPRAS = pd.Timestamp('2018-09-03')
+
+# Pedidos gerados por lote ao gravar em disco (limita o pico de memória)
+PEDIDOS_POR_LOTE = 500_000
+
+_HEX = np.frombuffer(b'0123456789abcdef', dtype='S1')
+
+
+def _ids_hex(rng, n):
+    """`n` identificadores hexadecimais de 32 caracteres (formato da Olist)."""
+    bytes_ = rng.integers(0, 256, (n, 16), dtype=np.uint8)
+    caracteres = np.empty((n, 32), dtype='S1')
+    caracteres[:, 0::2] = _HEX[bytes_ >> 4]
+    caracteres[:, 1::2] = _HEX[bytes_ & 15]
+    return caracteres.view('S32').ravel().astype(str)
+
+
+def _probabilidades(contagens):
+    chaves = list(contagens)
+    valores = np.array([contagens[k] for k in chaves], dtype=np.float64)
+    return np.array(chaves), valores / valores.sum()
+
+
+# DIMENSÕES (amostradas dos arquivos reais)
+
+
+def gerar_dimensoes(escala=1.0, semente=42, pasta_referencia=PASTA_DATA):
+    """
+    Produtos e vendedores reamostrados dos CSVs reais da Olist.
+
+    Com `escala` > 1 os catálogos crescem na mesma proporção (linhas
+    reamostradas com IDs novos), mantendo a frequência das categorias, as
+    dimensões dos produtos e a distribuição dos vendedores por UF. Cada
+    produto pertence a um vendedor; a popularidade de ambos segue uma lei
+    de potência, como na base original.
+
+    Returns
+    -------
+    dict
+        'produtos' e 'vendedores' (colunas dos CSVs originais) e
+        'vendedor_produto' / 'peso_produto' / 'preco_produto' (arrays de
+        apoio à geração)
+    """
+    rng = np.random.default_rng([semente, 0])
+    produtos = pd.read_csv(
+        os.path.join(pasta_referencia, arquivos_olist['produtos']))
+    vendedores = pd.read_csv(
+        os.path.join(pasta_referencia, arquivos_olist['vendedores']),
+        dtype={'seller_zip_code_prefix': str})
+
+    def ampliar(df, chave):
+        n = int(round(len(df) * max(escala, 1.0)))
+        if n == len(df):
+            return df.reset_index(drop=True)
+        extra = df.iloc[rng.integers(0, len(df), n - len(df))].copy()
+        extra[chave] = _ids_hex(rng, len(extra))
+        return pd.concat([df, extra], ignore_index=True)
+
+    produtos = ampliar(produtos, 'product_id')
+    vendedores = ampliar(vendedores, 'seller_id')
+
+    # Popularidade: poucos vendedores/produtos concentram as vendas
+    popularidade_vendedor = rng.pareto(1.2, len(vendedores)) + 1
+    vendedor_produto = rng.choice(
+        len(vendedores), len(produtos),
+        p=popularidade_vendedor / popularidade_vendedor.sum())
+    peso_produto = rng.pareto(1.5, len(produtos)) + 1
+
+    return {
+        'produtos': produtos,
+        'vendedores': vendedores,
+        'vendedor_produto': vendedor_produto,
+        'peso_produto': peso_produto / peso_produto.sum(),
+        'preco_produto': np.exp(rng.normal(4.4, 0.9, len(produtos))).round(2)
+    }
+
+
+# FATOS (pedidos, itens e clientes)
+
+
+def _cidades_cliente(rng, ufs_cliente, vendedores):
+    """Capital da UF ou uma cidade com vendedores na UF (gera pickups)."""
+    cidades = np.array([capitais[uf] for uf in ufs_cliente], dtype=object)
+    por_uf = vendedores.groupby('seller_state')['seller_city']
+    sorteio = rng.random(len(ufs_cliente)) >= 0.4
+    for uf, grupo in por_uf:
+        alvo = np.flatnonzero(sorteio & (ufs_cliente == uf))
+        if len(alvo):
+            cidades[alvo] = grupo.to_numpy()[rng.integers(0, len(grupo), len(alvo))]
+    return cidades
+
+
+def gerar_pedidos(n, dimensoes, semente=42, lote=0):
+    """
+    Um lote de `n` pedidos com itens e clientes.
+
+    Compras crescem ao longo do período (como na base real); aprovação,
+    postagem e trânsito seguem distribuições assimétricas, com o trânsito
+    dependendo do tipo de rota UF x UF, do peso e de picos sazonais. A
+    data estimada é definida pela rota com folga, o que reproduz a taxa
+    de atraso (~8%) e o adiantamento médio (~11 dias) da base original.
+
+    Returns
+    -------
+    tuple
+        (pedidos, itens, clientes) com as colunas dos CSVs da Olist
+    """
+    rng = np.random.default_rng([semente, lote + 1])
+    produtos = dimensoes['produtos']
+    vendedores = dimensoes['vendedores']
+
+    # Clientes (um por pedido, como na base original)
+    ufs, prob_uf = _probabilidades(clientes_por_uf)
+    uf_cliente = ufs[rng.choice(len(ufs), n, p=prob_uf)]
+    clientes = pd.DataFrame({
+        'customer_id': _ids_hex(rng, n),
+        'customer_unique_id': _ids_hex(rng, n),
+        'customer_zip_code_prefix': rng.integers(1000, 99999, n),
+        'customer_city': _cidades_cliente(rng, uf_cliente, vendedores),
+        'customer_state': uf_cliente
+    })
+
+    # Itens: produto (popularidade) e seu vendedor
+    n_itens = rng.choice(len(prob_itens_pedido), n, p=prob_itens_pedido) + 1
+    pedido_item = np.repeat(np.arange(n), n_itens)
+    primeiro = np.repeat(np.cumsum(n_itens) - n_itens, n_itens)
+    ordem_item = np.arange(len(pedido_item)) - primeiro + 1
+    produto = rng.choice(len(produtos), len(pedido_item),
+                         p=dimensoes['peso_produto'])
+    vendedor = dimensoes['vendedor_produto'][produto]
+
+    # Rota e peso do primeiro item definem a logística do pedido
+    idx_primeiro = np.cumsum(n_itens) - n_itens
+    uf_vendedor = vendedores['seller_state'].to_numpy()[
+        vendedor[idx_primeiro]]
+    rota = TABELA_PADRAO.tipo_rota[TABELA_PADRAO.indices(uf_vendedor),
+                                   TABELA_PADRAO.indices(uf_cliente)]
+    peso_kg = np.nan_to_num(
+        produtos['product_weight_g'].to_numpy()[produto[idx_primeiro]],
+        nan=700.0) / 1000
+
+    # Datas: volume crescente no período (densidade linear)
+    periodo = (FIM_COMPRAS - INICIO_COMPRAS).total_seconds()
+    compra = INICIO_COMPRAS + pd.to_timedelta(
+        np.sqrt(rng.random(n)) * periodo, unit='s')
+    compra = compra.floor('s')
+    aprovacao = compra + pd.to_timedelta(
+        rng.exponential(0.45, n) * 86400, unit='s').floor('s')
+    postagem = aprovacao + pd.to_timedelta(
+        rng.gamma(1.5, 1.9, n) * 86400, unit='s').floor('s')
+
+    transito_medio = pd.Series(rota).map(transito_medio_rota).to_numpy()
+    choque = pd.Series(compra.month).map(choque_mensal).fillna(1.0).to_numpy()
+    transito = rng.gamma(3.0, 1 / 3.0, n) * transito_medio * choque * \
+        (1 + 0.02 * np.minimum(peso_kg, 30))
+    entrega = postagem + pd.to_timedelta(transito * 86400, unit='s').floor('s')
+
+    # Prazo prometido: trânsito típico da rota + aprovação/postagem + folga
+    prazo = np.maximum(np.round(
+        transito_medio + 3.3 + rng.normal(FOLGA_PRAZO_DIAS, 4.5, n)), 3)
+    estimada = compra.normalize() + pd.to_timedelta(prazo, unit='D')
+
+    # Status: apenas pedidos entregues têm todas as datas
+    status, prob_status = _probabilidades(status_pedidos)
+    status = status[rng.choice(len(status), n, p=prob_status)]
+    sem_aprovacao = np.isin(status, ['created']) | (
+        (status == 'canceled') & (rng.random(n) < 0.2))
+    sem_postagem = ~np.isin(status, ['delivered', 'shipped']) & \
+        ~((status == 'canceled') & (rng.random(n) < 0.1))
+
+    pedidos = pd.DataFrame({
+        'order_id': _ids_hex(rng, n),
+        'customer_id': clientes['customer_id'],
+        'order_status': status,
+        'order_purchase_timestamp': compra,
+        'order_approved_at': pd.Series(aprovacao).where(~sem_aprovacao),
+        'order_delivered_carrier_date': pd.Series(postagem).where(
+            ~sem_postagem & ~sem_aprovacao),
+        'order_delivered_customer_date': pd.Series(entrega).where(
+            status == 'delivered'),
+        'order_estimated_delivery_date': estimada
+    })
+
+    # Frete por peso e rota
+    peso_item = np.nan_to_num(
+        produtos['product_weight_g'].to_numpy()[produto], nan=700.0) / 1000
+    frete = (8 + 1.8 * peso_item) * \
+        pd.Series(np.repeat(rota, n_itens)).map(fator_frete_rota).to_numpy() * \
+        rng.lognormal(0, 0.25, len(pedido_item))
+
+    itens = pd.DataFrame({
+        'order_id': pedidos['order_id'].to_numpy()[pedido_item],
+        'order_item_id': ordem_item,
+        'product_id': produtos['product_id'].to_numpy()[produto],
+        'seller_id': vendedores['seller_id'].to_numpy()[vendedor],
+        'shipping_limit_date': np.repeat(
+            (aprovacao + pd.Timedelta(days=6)).to_numpy(), n_itens),
+        'price': dimensoes['preco_produto'][produto],
+        'freight_value': frete.round(2)
+    })
+    return pedidos, itens, clientes
+
+
+def gerar_olist(escala=1.0, semente=42, pasta_referencia=PASTA_DATA):
+    """
+    Base Olist sintética completa em memória.
+
+    Parameters
+    ----------
+    escala : float, optional
+        Múltiplo do volume original (1 = 99.441 pedidos)
+    semente : int, optional
+        Semente do gerador (mesma semente, mesma base)
+
+    Returns
+    -------
+    dict
+        Tabelas com as chaves de `arquivos_olist`
+    """
+    dimensoes = gerar_dimensoes(escala, semente, pasta_referencia)
+    pedidos, itens, clientes = gerar_pedidos(
+        int(round(PEDIDOS_BASE * escala)), dimensoes, semente)
+    return {
+        'pedidos': pedidos,
+        'itens_pedido': itens,
+        'produtos': dimensoes['produtos'],
+        'clientes': clientes,
+        'vendedores': dimensoes['vendedores']
+    }
+
+
+def _tabela_csv(df):
+    """Tabela Arrow com datas em segundos ('AAAA-MM-DD hh:mm:ss', como na Olist)."""
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    esquema = pa.schema([
+        campo.with_type(pa.timestamp('s')) if pa.types.is_timestamp(campo.type)
+        else campo for campo in tabela.schema])
+    return tabela.cast(esquema)
+
+
+def salvar_olist(escala=1.0, destino=PASTA_SINTETICA, semente=42,
+                 pasta_referencia=PASTA_DATA,
+                 pedidos_por_lote=PEDIDOS_POR_LOTE):
+    """
+    Grava a base sintética como os CSVs da Olist, em lotes.
+
+    Pedidos, itens e clientes são gerados e anexados lote a lote, de modo
+    que escalas de 100x (~10 milhões de pedidos) cabem em memória.
+
+    Returns
+    -------
+    dict
+        Nome da tabela -> número de linhas gravadas
+    """
+    os.makedirs(destino, exist_ok=True)
+    dimensoes = gerar_dimensoes(escala, semente, pasta_referencia)
+    for nome in ['produtos', 'vendedores']:
+        dimensoes[nome].to_csv(
+            os.path.join(destino, arquivos_olist[nome]), index=False)
+    linhas = {nome: len(dimensoes[nome]) for nome in ['produtos', 'vendedores']}
+
+    total = int(round(PEDIDOS_BASE * escala))
+    escritores = {}
+    try:
+        for lote, inicio in enumerate(range(0, total, pedidos_por_lote)):
+            tabelas = dict(zip(
+                ['pedidos', 'itens_pedido', 'clientes'],
+                gerar_pedidos(min(pedidos_por_lote, total - inicio),
+                              dimensoes, semente, lote)))
+            for nome, df in tabelas.items():
+                tabela = _tabela_csv(df)
+                if nome not in escritores:
+                    escritores[nome] = pacsv.CSVWriter(
+                        os.path.join(destino, arquivos_olist[nome]),
+                        tabela.schema)
+                escritores[nome].write_table(tabela)
+                linhas[nome] = linhas.get(nome, 0) + len(df)
+    finally:
+        for escritor in escritores.values():
+            escritor.close()
+    return linhas
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Gera uma base Olist sintética (CSVs) em qualquer escala.")
+    parser.add_argument("--escala", type=float, default=1.0,
+                        help="Múltiplo do volume original (1 = 99.441 pedidos)")
+    parser.add_argument("--destino", default=PASTA_SINTETICA)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--referencia", default=PASTA_DATA,
+                        help="Pasta com os CSVs reais de produtos e vendedores")
+    args = parser.parse_args()
+
+    linhas = salvar_olist(args.escala, args.destino, args.semente,
+                          args.referencia)
+    for nome, n in linhas.items():
+        print(f" {nome}: {n:,} linhas")
+    print(f"Base sintética salva em: {args.destino}")
@@ -0,0 +1,353 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import HalvingRandomSearchCV, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from utils.features import feat_num, feat_cat, features_modelo
+from utils.preprocessamento import Preprocessador, LIMITE_CORTE_CATEGORIA
+from utils.modelo_compacto import (exportar_modelo_compacto, exportavel,
+                                   CAMINHO_MODELO_COMPACTO, CAMINHO_MODELO_PKL)
+
+try:
+    from xgboost import XGBRegressor
+except ImportError:  # XGBoost é opcional: a busca segue só com a Random Forest
+    XGBRegressor = None
+
+
+# CONSTANTES (Dados, Busca e Artefatos)
+
+CAMINHO_DADOS_MODELO = "data/data_model_processed.csv"
+PASTA_VERSOES = "models/versoes"
+
+param_grid_rf = {
+    'n_estimators': [100, 200, 300],
+    'max_depth': [None, 10, 20, 30],
+    'min_samples_leaf': [1, 2, 4]
+}
+
+param_grid_xgb = {
+    'n_estimators': [100, 200, 500],
+    'learning_rate': [0.01, 0.05, 0.1, 0.2],
+    'max_depth': [3, 5, 7, 10],
+    'subsample': [0.7, 0.8, 1.0]
+}
+
+
+# DADOS
+
+
+def carregar_dados_modelo(caminho=CAMINHO_DADOS_MODELO,
+                          limite_corte=LIMITE_CORTE_CATEGORIA,
+                          preprocessador=None):
+    """
+    Lê a tabela de modelagem e aplica o tratamento de categorias do notebook.
+
+    As categorias raras viram 'outros' segundo o vocabulário salvo pelo ETL
+    (o mesmo do Simulador e do scoring em lote). Sem vocabulário salvo, ele
+    é ajustado aqui com `limite_corte`.
+
+    Returns
+    -------
+    tuple
+        (X, y): as nove features do modelo e `dias_atraso`
+    """
+    df_model = pd.read_csv(caminho, usecols=features_modelo + ['dias_atraso'])
+
+    if preprocessador is None:
+        preprocessador = Preprocessador.carregar()
+    if preprocessador.categorias_mantidas is None:
+        preprocessador = Preprocessador(limite_corte).ajustar_vocabulario(
+            df_model['categoria_produto'])
+    df_model['categoria_produto'] = preprocessador.agrupar_raras(
+        df_model['categoria_produto'])
+
+    return df_model[features_modelo], df_model['dias_atraso']
+
+
+def criar_preprocessador(esparso=True):
+    """
+    StandardScaler nas numéricas e One-Hot nas categóricas.
+
+    Com `esparso=True` a matriz final fica em CSR (XGBoost e a regressão
+    linear treinam direto sobre ela). As árvores do sklearn dividem
+    matrizes esparsas bem mais devagar que densas, então a Random Forest
+    usa `esparso=False` (~75 colunas densas, poucos MB).
+    """
+    return ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), feat_num),
+            ('cat', OneHotEncoder(handle_unknown='ignore',
+                                  sparse_output=esparso), feat_cat)
+        ],
+        sparse_threshold=1.0 if esparso else 0.0
+    )
+
+
+def modelos_candidatos(semente=42):
+    """
+    Estimadores, espaços de busca e formato da matriz (esparsa ou não).
+
+    Os estimadores usam n_jobs=1: o paralelismo fica na busca.
+    """
+    candidatos = {
+        'Random Forest': (
+            RandomForestRegressor(random_state=semente, n_jobs=1),
+            param_grid_rf, False)
+    }
+    if XGBRegressor is not None:
+        candidatos['XGBoost'] = (
+            XGBRegressor(random_state=semente, n_jobs=1), param_grid_xgb, True)
+    return candidatos
+
+
+def treinar_e_avaliar(nome_modelo, modelo_instancia, X_tr, y_tr, X_te, y_te):
+    """
+    Função genérica para treinar e avaliar qualquer modelo.
+    Recebe: Nome, Instância do Algoritmo e Dados Brutos.
+    Retorna: Dicionário com métricas.
+    """
+    print(f" Treinando: {nome_modelo}...")
+
+    inicio = time.perf_counter()
+    modelo_instancia.fit(X_tr, y_tr)
+    segundos = time.perf_counter() - inicio
+
+    y_pred = modelo_instancia.predict(X_te)
+
+    mae = mean_absolute_error(y_te, y_pred)
+    rmse = np.sqrt(mean_squared_error(y_te, y_pred))
+    r2 = r2_score(y_te, y_pred)
+
+    print(f'MAE: {mae:.2f} | RMSE: {rmse:.2f} | R2: {r2:.2%}\n')
+
+    return {
+        'Modelo': nome_modelo,
+        'MAE (Erro Médio)': mae,
+        'RMSE (Erro Quadrático)': rmse,
+        'R²': r2,
+        'Segundos (Treino)': segundos,
+        'Modelo_objeto': modelo_instancia
+    }
+
+
+# BUSCA
+
+
+def buscar_hiperparametros(nome, modelo, grid, X_train, y_train, nucleos=None,
+                           pasta_cache=None, n_candidatos=10, cv=3,
+                           semente=42, esparso=True):
+    """
+    Busca por halving sucessivo sobre o Pipeline (pré-processador + modelo).
+
+    Cada rodada avalia os candidatos restantes com 3x mais amostras e só
+    o terço melhor segue adiante (a última rodada usa o treino inteiro),
+    então configurações fracas são descartadas cedo. O pré-processador
+    ajustado em cada fold fica em cache (`Pipeline(memory=...)`) e é
+    reaproveitado por todos os candidatos daquela rodada. Os candidatos
+    rodam em `nucleos` processos.
+
+    Returns
+    -------
+    HalvingRandomSearchCV
+        Busca ajustada (`best_estimator_` é um Pipeline)
+    """
+    pipeline = Pipeline(steps=[
+        ('preprocessor', criar_preprocessador(esparso)),
+        ('model', modelo)
+    ], memory=pasta_cache)
+
+    busca = HalvingRandomSearchCV(
+        estimator=pipeline,
+        param_distributions={f'model__{k}': v for k, v in grid.items()},
+        n_candidates=n_candidatos,
+        factor=3,
+        min_resources='exhaust',
+        cv=cv,
+        scoring='neg_mean_absolute_error',
+        random_state=semente,
+        n_jobs=nucleos,
+        refit=True
+    )
+    print(f"\n--- Otimizando {nome}... ---")
+    busca.fit(X_train, y_train)
+    return busca
+
+
+def _resumo_busca(busca):
+    """Candidatos avaliados por rodada (iteração, amostras, params, MAE no CV)."""
+    resultados = pd.DataFrame(busca.cv_results_)
+    return [{
+        'rodada': int(linha['iter']),
+        'amostras': int(linha['n_resources']),
+        'params': {k.replace('model__', ''): v
+                   for k, v in linha['params'].items()},
+        'mae_cv': float(-linha['mean_test_score'])
+    } for _, linha in resultados.iterrows()]
+
+
+# TREINO COMPLETO
+
+
+def treinar(caminho_dados=CAMINHO_DADOS_MODELO, pasta_versoes=PASTA_VERSOES,
+            nucleos=None, n_candidatos=10, semente=42, publicar=False):
+    """
+    Roda a busca de modelos e grava o vencedor em um diretório versionado.
+
+    Passos: carga e tratamento dos dados, baseline linear, busca por
+    halving para cada candidato (Random Forest e, se instalado, XGBoost),
+    escolha pelo MAE no holdout e re-treino do vencedor com 100% dos
+    dados.
+
+    Parameters
+    ----------
+    caminho_dados : str, optional
+        CSV de modelagem gerado pelo ETL
+    pasta_versoes : str, optional
+        Raiz dos artefatos versionados (default 'models/versoes')
+    nucleos : int, optional
+        Orçamento de processos da busca e do re-treino (default: todos)
+    n_candidatos : int, optional
+        Configurações sorteadas na primeira rodada de cada busca
+    publicar : bool, optional
+        Se True, copia o vencedor para `models/` (pkl e formato compacto),
+        passando a ser o modelo usado pelo App
+
+    Returns
+    -------
+    str
+        Diretório da versão gravada (`modelo.pkl`, `metricas.json`,
+        `tempos.json`)
+    """
+    nucleos = nucleos or os.cpu_count() or 1
+    tempos = {}
+    inicio_total = time.perf_counter()
+
+    inicio = time.perf_counter()
+    X, y = carregar_dados_modelo(caminho_dados)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.20, random_state=semente)
+    tempos['carga'] = time.perf_counter() - inicio
+
+    resultados = []
+    baseline = treinar_e_avaliar(
+        "Baseline (Regressão Linear)",
+        Pipeline([('preprocessor', criar_preprocessador()),
+                  ('model', LinearRegression())]),
+        X_train, y_train, X_test, y_test)
+    resultados.append(baseline)
+    tempos['baseline'] = baseline['Segundos (Treino)']
+
+    buscas = {}
+    with tempfile.TemporaryDirectory() as pasta_cache:
+        memoria = joblib.Memory(pasta_cache, verbose=0)
+        for nome, (modelo, grid, esparso) in modelos_candidatos(semente).items():
+            inicio = time.perf_counter()
+            busca = buscar_hiperparametros(
+                nome, modelo, grid, X_train, y_train, nucleos, memoria,
+                n_candidatos, semente=semente, esparso=esparso)
+            tempos[f'busca {nome}'] = time.perf_counter() - inicio
+
+            melhor = busca.best_estimator_
+            melhor.set_params(memory=None)
+            y_pred = melhor.predict(X_test)
+            resultados.append({
+                'Modelo': f'{nome} (Tuned)',
+                'MAE (Erro Médio)': mean_absolute_error(y_test, y_pred),
+                'RMSE (Erro Quadrático)': np.sqrt(
+                    mean_squared_error(y_test, y_pred)),
+                'R²': r2_score(y_test, y_pred),
+                'Segundos (Treino)': tempos[f'busca {nome}'],
+                'Modelo_objeto': melhor
+            })
+            buscas[f'{nome} (Tuned)'] = busca
+            print(f" Melhor {nome}: MAE {resultados[-1]['MAE (Erro Médio)']:.4f}"
+                  f" | Params: {busca.best_params_}")
+
+    tunados = [r for r in resultados if r['Modelo'] in buscas]
+    vencedor = min(tunados, key=lambda r: r['MAE (Erro Médio)'])
+
+    # Re-treino do vencedor com 100% dos dados, agora com todos os núcleos
+    inicio = time.perf_counter()
+    pipeline_final = vencedor['Modelo_objeto']
+    pipeline_final.set_params(model__n_jobs=nucleos)
+    pipeline_final.fit(pd.concat([X_train, X_test]), pd.concat([y_train, y_test]))
+    tempos['refit'] = time.perf_counter() - inicio
+    tempos['total'] = time.perf_counter() - inicio_total
+
+    # Artefatos versionados
+    versao = time.strftime('v%Y%m%d-%H%M%S')
+    destino = os.path.join(pasta_versoes, versao)
+    os.makedirs(destino, exist_ok=True)
+    joblib.dump(pipeline_final, os.path.join(destino, 'modelo.pkl'), compress=3)
+
+    metricas = {
+        'versao': versao,
+        'vencedor': vencedor['Modelo'],
+        'params': {k.replace('model__', ''): v for k, v in
+                   buscas[vencedor['Modelo']].best_params_.items()},
+        'nucleos': nucleos,
+        'amostras_treino': int(len(X_train)),
+        'amostras_teste': int(len(X_test)),
+        'holdout': [{k: v for k, v in r.items() if k != 'Modelo_objeto'}
+                    for r in resultados],
+        'buscas': {nome: _resumo_busca(busca)
+                   for nome, busca in buscas.items()}
+    }
+    with open(os.path.join(destino, 'metricas.json'), 'w',
+              encoding='utf-8') as f:
+        json.dump(metricas, f, ensure_ascii=False, indent=2, default=float)
+    with open(os.path.join(destino, 'tempos.json'), 'w',
+              encoding='utf-8') as f:
+        json.dump(tempos, f, ensure_ascii=False, indent=2)
+
+    if publicar:
+        publicar_versao(destino, pipeline_final)
+    return destino
+
+
+def publicar_versao(destino, pipeline=None):
+    """
+    Promove uma versão a modelo do App: copia o pkl e regera o formato
+    compacto. Modelos sem floresta sklearn (ex.: XGBoost) removem o
+    compacto antigo, para o App não servir uma versão desatualizada.
+    """
+    pipeline = pipeline or joblib.load(os.path.join(destino, 'modelo.pkl'))
+    os.makedirs(os.path.dirname(CAMINHO_MODELO_PKL), exist_ok=True)
+    shutil.copyfile(os.path.join(destino, 'modelo.pkl'), CAMINHO_MODELO_PKL)
+
+    if exportavel(pipeline):
+        exportar_modelo_compacto(pipeline, CAMINHO_MODELO_COMPACTO)
+    elif os.path.isdir(CAMINHO_MODELO_COMPACTO):
+        shutil.rmtree(CAMINHO_MODELO_COMPACTO)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Busca de hiperparâmetros (halving) e treino do modelo de atraso.")
+    parser.add_argument("--dados", default=CAMINHO_DADOS_MODELO)
+    parser.add_argument("--destino", default=PASTA_VERSOES)
+    parser.add_argument("--nucleos", type=int, default=None,
+                        help="Processos para a busca e o re-treino (default: todos)")
+    parser.add_argument("--candidatos", type=int, default=10)
+    parser.add_argument("--publicar", action="store_true",
+                        help="Copia o vencedor para models/ (usado pelo App)")
+    args = parser.parse_args()
+
+    caminho = treinar(args.dados, args.destino, args.nucleos, args.candidatos,
+                      publicar=args.publicar)
+    print(f"Versão salva em: {caminho}")
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 
@@ -20,7 +21,8 @@ def formatar_datetime(df, prefixo="data"):
     """
     cols_data = [col for col in df.columns if col.startswith(prefixo)]
     for col in cols_data:
-        df[col] = pd.to_datetime(df[col], errors="coerce")
+        if not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
     return df
 
 
@@ -46,12 +48,62 @@ map_status_simplificado = {
 # FUNÇÕES DE TRATAMENTO
 
 
+def _como_categoria(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    return serie.astype('category')
+
+
+def remapear_categorias(serie, mapeamento):
+    """
+    Aplica `mapeamento` uma vez por valor distinto de uma coluna categórica.
+
+    A coluna é convertida para `category` (se ainda não for); o mapeamento
+    (dict ou função) roda apenas sobre as categorias, e os códigos das
+    linhas são reindexados sem tocar nos valores. Categorias que passam a
+    coincidir são fundidas; resultados nulos viram NaN.
+
+    Parameters
+    ----------
+    serie : pd.Series
+        Coluna de entrada (object ou category)
+    mapeamento : dict or callable
+        Tradução de cada categoria
+
+    Returns
+    -------
+    pd.Series
+        Coluna `category` com o mesmo índice
+    """
+    serie = _como_categoria(serie)
+    categorias = serie.cat.categories
+    if isinstance(mapeamento, dict):
+        novas = categorias.map(lambda valor: mapeamento.get(valor, np.nan))
+    else:
+        novas = categorias.map(mapeamento)
+
+    codigos_novos, valores = pd.factorize(novas, sort=True)
+    # Código -1 (nulo) continua nulo: indexa a posição extra ao final
+    codigos = np.append(codigos_novos, -1)[serie.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codigos, valores),
+                     index=serie.index, name=serie.name)
+
+
+def _rotulo_categoria(categoria):
+    return str(categoria).replace('_', ' ').title()
+
+
 def tratar_categorias(df, col_cat='categoria_produto'):
     if col_cat not in df.columns:
         return df
-    df[col_cat] = df[col_cat].replace(map_cat_correcao)
-    df['categoria_label'] = df[col_cat].astype(
-        str).str.replace('_', ' ').str.title()
+    df[col_cat] = remapear_categorias(
+        df[col_cat], lambda cat: map_cat_correcao.get(cat, cat))
+
+    rotulos = remapear_categorias(df[col_cat], _rotulo_categoria)
+    if df[col_cat].isna().any():
+        # Mesmo rótulo que `astype(str).str.title()` dá aos nulos
+        rotulos = rotulos.cat.add_categories('Nan').fillna('Nan')
+    df['categoria_label'] = rotulos
     return df
 
 
@@ -61,17 +113,39 @@ def tratar_status(df, col_status='order_status'):
         col_alvo = 'status_pedido'
 
     if col_alvo in df.columns:
-        df["status_simplificado"] = df[col_alvo].map(
-            map_status_simplificado)
+        df["status_simplificado"] = remapear_categorias(
+            df[col_alvo], map_status_simplificado)
     else:
         df["status_simplificado"] = "N/A"
     return df
 
 
-def enriquecer_dados_dash(df):
+def _garantir_datetime(df, col):
+    if not pd.api.types.is_datetime64_any_dtype(df[col]):
+        df[col] = pd.to_datetime(df[col])
+
+
+def enriquecer_dados_dash(df, inplace=False):
     """
     Pipeline completo de tratamento para o Dashboard.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Tabela processada pelo ETL
+    inplace : bool, optional
+        Se True, acrescenta as colunas no próprio `df`; caso contrário
+        trabalha sobre uma cópia rasa (sem duplicar os dados) (default False)
+
+    Returns
+    -------
+    pd.DataFrame
+        Tabela com categorias/status tratados (como `category`) e os KPIs
+        calculados
     """
+    if not inplace:
+        df = df.copy(deep=False)
+
     df = tratar_categorias(df)
     df = tratar_status(df)
 
@@ -85,9 +159,9 @@ def enriquecer_dados_dash(df):
     # --- AQUI ESTAVA FALTANDO O CÁLCULO DO TEMPO DE PROCESSAMENTO ---
     # Necessário para o gráfico de barras
     if 'data_postagem' in df.columns and 'data_aprovacao' in df.columns:
-        # Garante que são datas
-        df['data_postagem'] = pd.to_datetime(df['data_postagem'])
-        df['data_aprovacao'] = pd.to_datetime(df['data_aprovacao'])
+        # Garante que são datas (colunas já convertidas não são reprocessadas)
+        _garantir_datetime(df, 'data_postagem')
+        _garantir_datetime(df, 'data_aprovacao')
 
         # Calcula a diferença em dias
         df["tempo_processamento"] = (
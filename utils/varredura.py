@@ -0,0 +1,219 @@
+import numpy as np
+import pandas as pd
+
+from utils.features import features_modelo
+from utils.guardrails import (aplicar_guardrail, aplicar_guardrail_arrays,
+                              mesma_uf_desconhecida, TABELA_PADRAO,
+                              TIPOS_ROTA, UFS)
+from utils.modelo_compacto import prever_registro
+
+
+# CONSTANTES
+
+# Prazos prometidos varridos por padrão (dias)
+prazos_varredura = list(range(1, 31))
+
+# Categorias comparadas lado a lado no Simulador
+MAX_CATEGORIAS_VARREDURA = 4
+
+
+# GRADE DE CENÁRIOS
+
+
+def montar_grade(base, destinos=UFS, prazos=prazos_varredura,
+                 categorias=None):
+    """
+    Cenários (categoria x destino x prazo) a partir de um pedido base.
+
+    Só `categoria_produto`, `uf_cliente` e `prazo_prometido` variam; as
+    demais features são as do pedido base, repetidas sem laço em Python.
+
+    Parameters
+    ----------
+    base : dict
+        Pedido com as nove features (ver `features.derivar_features`)
+    destinos : list of str, optional
+        UFs de destino (default: as 27 UFs)
+    prazos : list of int, optional
+        Prazos prometidos, em dias (default 1 a 30)
+    categorias : list of str, optional
+        Categorias (nomes do modelo); None usa a do pedido base
+
+    Returns
+    -------
+    pd.DataFrame
+        Uma linha por cenário, em ordem categoria, destino, prazo
+    """
+    if not categorias:
+        categorias = [base['categoria_produto']]
+    n_cat, n_dest, n_prazo = len(categorias), len(destinos), len(prazos)
+    n = n_cat * n_dest * n_prazo
+
+    variaveis = {
+        'categoria_produto': np.repeat(np.asarray(categorias, dtype=object),
+                                       n_dest * n_prazo),
+        'uf_cliente': np.tile(np.repeat(np.asarray(destinos, dtype=object),
+                                        n_prazo), n_cat),
+        'prazo_prometido': np.tile(np.asarray(prazos, dtype=np.float64),
+                                   n_cat * n_dest)
+    }
+    return pd.DataFrame({col: variaveis.get(col, base[col])
+                         for col in features_modelo},
+                        index=pd.RangeIndex(n))
+
+
+def varrer(modelo, base, destinos=UFS, prazos=prazos_varredura,
+           categorias=None, tabela=TABELA_PADRAO):
+    """
+    Atraso previsto para toda a grade de cenários de um pedido.
+
+    A grade inteira passa por uma única chamada a `modelo.predict` e pelo
+    guardrail regional vetorizado; o custo cresce com o número de nós
+    visitados, não com o número de chamadas.
+
+    Parameters
+    ----------
+    modelo : object
+        Qualquer objeto com `predict` (ServidorInferencia, ModeloCompacto
+        ou Pipeline sklearn)
+    base : dict
+        Pedido base (ver `montar_grade`); a origem é `base['uf_vendedor']`
+    tabela : TabelaRotas, optional
+        Tabela de rotas do guardrail (default: regra regional padrão)
+
+    Returns
+    -------
+    dict
+        'destinos', 'prazos', 'categorias'; matrizes (categoria, destino,
+        prazo) 'dias_pred_modelo', 'dias_pred_final' e 'foi_ajustado';
+        'tipo_rota' por destino
+    """
+    if not categorias:
+        categorias = [base['categoria_produto']]
+    forma = (len(categorias), len(destinos), len(prazos))
+    grade = montar_grade(base, destinos, prazos, categorias)
+
+    dias_pred_modelo = np.asarray(modelo.predict(grade), dtype=np.float64)
+
+    idx_origem = tabela.indices(base['uf_vendedor'])
+    idx_destino = tabela.indices(destinos)
+    mesma_uf = mesma_uf_desconhecida(
+        base['uf_vendedor'], np.asarray(destinos, dtype=object),
+        idx_origem, idx_destino)
+    dias_pred_final, _, codigo_rota = aplicar_guardrail_arrays(
+        dias_pred_modelo.reshape(forma),
+        idx_origem[0],
+        idx_destino[None, :, None],
+        base['tempo_aprovacao'],
+        np.asarray(prazos)[None, None, :],
+        tabela,
+        None if mesma_uf is None else mesma_uf[None, :, None]
+    )
+    dias_pred_modelo = dias_pred_modelo.reshape(forma)
+    return {
+        'destinos': list(destinos),
+        'prazos': list(prazos),
+        'categorias': list(categorias),
+        'dias_pred_modelo': dias_pred_modelo,
+        'dias_pred_final': dias_pred_final,
+        'foi_ajustado': dias_pred_final > dias_pred_modelo,
+        'tipo_rota': [TIPOS_ROTA[c] for c in codigo_rota[0, :, 0]]
+    }
+
+
+def prazo_seguro(resultado):
+    """
+    Menor prazo da grade sem atraso previsto, por categoria e destino.
+
+    Returns
+    -------
+    pd.DataFrame
+        Destinos nas linhas e categorias nas colunas; NaN quando todos os
+        prazos varridos ficam em atraso
+    """
+    no_prazo = resultado['dias_pred_final'] <= 0
+    prazos = np.asarray(resultado['prazos'], dtype=np.float64)
+    primeiro = np.where(no_prazo.any(axis=2),
+                        prazos[no_prazo.argmax(axis=2)], np.nan)
+    return pd.DataFrame(primeiro.T, index=resultado['destinos'],
+                        columns=resultado['categorias'])
+
+
+def verificar_paridade_varredura(modelo, base, destinos=UFS,
+                                 prazos=prazos_varredura, categorias=None,
+                                 tabela=TABELA_PADRAO, tolerancia=1e-9):
+    """
+    Compara a varredura vetorizada com o Simulador célula a célula.
+
+    Cada cenário é refeito como um pedido isolado (`prever_registro` e
+    `aplicar_guardrail`), o caminho do formulário de pedido único.
+
+    Returns
+    -------
+    float
+        Maior diferença absoluta observada (dias)
+
+    Raises
+    ------
+    AssertionError
+        Se alguma célula divergir além da tolerância
+    """
+    resultado = varrer(modelo, base, destinos, prazos, categorias, tabela)
+    grade = montar_grade(base, destinos, prazos, resultado['categorias'])
+
+    esperado = np.empty(len(grade))
+    for i, registro in enumerate(grade.to_dict('records')):
+        dias = prever_registro(modelo, registro)
+        esperado[i] = aplicar_guardrail(
+            dias, registro['uf_vendedor'], registro['uf_cliente'],
+            registro['tempo_aprovacao'], registro['prazo_prometido'],
+            tabela)['dias_pred_final'].iloc[0]
+
+    obtido = resultado['dias_pred_final'].ravel()
+    np.testing.assert_allclose(obtido, esperado, rtol=0, atol=tolerancia)
+    return float(np.max(np.abs(obtido - esperado))) if len(grade) else 0.0
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from utils.features import derivar_features
+    from utils.modelo_compacto import (carregar_modelo, CAMINHO_MODELO_COMPACTO,
+                                       CAMINHO_MODELO_PKL)
+
+    parser = argparse.ArgumentParser(
+        description="Mede a varredura destino x prazo contra uma previsão única.")
+    parser.add_argument("--compacto", default=CAMINHO_MODELO_COMPACTO)
+    parser.add_argument("--pkl", default=CAMINHO_MODELO_PKL)
+    parser.add_argument("--origem", default="BA")
+    parser.add_argument("--categoria", default="cama_mesa_banho")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    modelo = carregar_modelo(args.compacto, args.pkl)
+    if modelo is None:
+        raise SystemExit("Modelo não encontrado. Verifique a pasta 'models'.")
+    base = derivar_features(20, 20, 10, 500, 0, 7, args.origem, 'RJ', False,
+                            args.categoria)
+
+    def mediana_ms(funcao):
+        funcao()
+        tempos = []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append(time.perf_counter() - inicio)
+        return np.median(tempos) * 1000
+
+    unica = mediana_ms(lambda: aplicar_guardrail(
+        prever_registro(modelo, base), base['uf_vendedor'], base['uf_cliente'],
+        base['tempo_aprovacao'], base['prazo_prometido']))
+    grade = mediana_ms(lambda: varrer(modelo, base))
+    celulas = len(UFS) * len(prazos_varredura)
+    print(f"Previsão única: {unica:.1f} ms | varredura {len(UFS)}x"
+          f"{len(prazos_varredura)} ({celulas} cenários): {grade:.1f} ms "
+          f"(um a um: ~{unica * celulas:.0f} ms)")
+
+    diferenca = verificar_paridade_varredura(modelo, base)
+    print(f"Paridade com o Simulador: OK (diferença máxima {diferenca:.2e})")